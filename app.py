@@ -1,6 +1,12 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash, send_file
+import time
+INICIO_APLICACAO = time.perf_counter()
+
+from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash, send_file, g
+from flask.json.provider import DefaultJSONProvider
 from datetime import datetime, timedelta
 import os
+import sys
+import threading
 import hashlib
 import json
 import tempfile
@@ -8,15 +14,14 @@ import csv
 from werkzeug.utils import secure_filename
 import io
 from dotenv import load_dotenv
-from models import init_mongodb, get_db, verificar_conexao, AlunoDAO, AtividadeDAO, TurmaDAO, UsuarioDAO, PresencaDAO, BuscaSalvaDAO, LogAtividadeDAO
-from database_integration_robusto import get_db_integration
-
-# Importar pandas para processamento de planilhas
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
+from models import init_mongodb, get_db, verificar_conexao, AlunoDAO, AtividadeDAO, TurmaDAO, UsuarioDAO, PresencaDAO, BuscaSalvaDAO, LogAtividadeDAO, EstatisticasDAO, ContadorDAO, ResumoPresencaDAO, cache_alunos
+from database_integration_robusto import get_db_integration, db_integration_robusto
+from indice_busca import IndiceBuscaAlunos, normalizar_texto
+from registro_aluno import RegistroAluno
+from importacao import LIMITES_CAMPOS_ALUNO, PANDAS_AVAILABLE, iniciar_importacao, obter_status_importacao, leitura_disponivel
+
+# pandas/openpyxl são importados sob demanda pelo módulo importacao
+if not PANDAS_AVAILABLE:
     print("⚠️ Pandas não disponível. Funcionalidade de planilhas Excel limitada.")
 
 # Carregar variáveis de ambiente
@@ -28,7 +33,17 @@ else:
     load_dotenv()
     print("Carregando variáveis de ambiente de desenvolvimento (.env)")
 
+class ProvedorJSON(DefaultJSONProvider):
+    """JSON do Flask que também serializa os alunos do cadastro em memória (RegistroAluno)"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, RegistroAluno):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
 app = Flask(__name__)
+app.json = ProvedorJSON(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'associacao_amigo_do_povo_2024_secure_key')
 app.config['SESSION_TYPE'] = 'filesystem'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
@@ -38,15 +53,9 @@ app.config['SESSION_FILE_DIR'] = tempfile.gettempdir()
 app.config['SESSION_FILE_THRESHOLD'] = 500
 app.config['SESSION_FILE_MODE'] = 384
 
-# Inicializar MongoDB
-try:
-    mongodb = init_mongodb()
-    if mongodb:
-        print("✅ MongoDB Atlas conectado e inicializado com sucesso!")
-    else:
-        print("❌ Falha ao conectar ao MongoDB Atlas")
-except Exception as e:
-    print(f"❌ Erro ao inicializar MongoDB: {e}")
+# MongoDB: a conexão é aberta no primeiro uso, em cada worker (models.BancoPreguicoso),
+# para não bloquear a inicialização do gunicorn esperando o Atlas
+mongodb = get_db()
 
 # Função para verificar conexão MongoDB
 def close_db(db):
@@ -153,26 +162,82 @@ class SistemaAcademia:
     def __init__(self):
         # Inicializar integração com banco de dados
         self.db_integration = get_db_integration()
+        # Resumos mensais de presença: montados uma vez, antes de qualquer $inc
+        self.db_integration.materializar_resumos_presenca()
+        # Histórico dos antigos presencas_*.csv vai para a coleção presencas (uma vez)
+        self.db_integration.migrar_presencas_csv()
         
         self.arquivo_dados = 'dados_alunos.json'
         self.arquivo_atividades = 'atividades_sistema.json'
         self.arquivo_turmas = 'turmas_sistema.json'
         self.alunos_reais = self.carregar_dados_reais()
+        self.reindexar_alunos()
         self.atividades_disponiveis = self.get_atividades_disponiveis()
         self.atividades_cadastradas = self.carregar_atividades()
         self.turmas_cadastradas = self.carregar_turmas()
         self.dados_presenca = self.carregar_dados_presenca()
+        self.reindexar_presencas()
         # Atualizar status de frequência com dados de presença
         self.atualizar_status_frequencia_informatica()
     
+    def reindexar_alunos(self):
+        """Reconstrói os índices nome→alunos e atividade→nomes a partir de alunos_reais"""
+        self._alunos_por_nome = {}
+        self._nomes_por_atividade = {}
+        for aluno in self.alunos_reais:
+            self._indexar_aluno(aluno)
+    
+    def _indexar_aluno(self, aluno):
+        """Inclui um aluno nos índices por nome e por atividade"""
+        nome = aluno.get('nome', '')
+        self._alunos_por_nome.setdefault(nome, []).append(aluno)
+        self._nomes_por_atividade.setdefault(aluno.get('atividade'), set()).add(nome)
+    
+    def _desindexar_aluno(self, aluno):
+        """Retira um aluno dos índices (homônimos na mesma atividade são preservados)"""
+        nome = aluno.get('nome', '')
+        atividade = aluno.get('atividade')
+        homonimos = [outro for outro in self._alunos_por_nome.get(nome, []) if outro is not aluno]
+        if homonimos:
+            self._alunos_por_nome[nome] = homonimos
+        else:
+            self._alunos_por_nome.pop(nome, None)
+        
+        if not any(outro.get('atividade') == atividade for outro in homonimos):
+            nomes = self._nomes_por_atividade.get(atividade)
+            if nomes is not None:
+                nomes.discard(nome)
+                if not nomes:
+                    del self._nomes_por_atividade[atividade]
+    
+    def buscar_aluno_por_nome(self, nome):
+        """Retorna o aluno com o nome exato informado (ou None)"""
+        alunos = self._alunos_por_nome.get(nome)
+        return alunos[0] if alunos else None
+    
+    def aluno_pertence_atividade(self, nome, atividade):
+        """Verifica se existe aluno com esse nome na atividade"""
+        return nome in self._nomes_por_atividade.get(atividade, ())
+    
+    def get_nomes_por_atividade(self, atividade):
+        """Conjunto de nomes de alunos de uma atividade"""
+        return self._nomes_por_atividade.get(atividade, set())
+    
+    def alterar_atividade_aluno(self, aluno, nova_atividade):
+        """Troca a atividade de um aluno em memória mantendo os índices"""
+        self._desindexar_aluno(aluno)
+        aluno['atividade'] = nova_atividade
+        self._indexar_aluno(aluno)
+    
     def carregar_dados_reais(self):
         """Carrega dados dos alunos do banco MongoDB"""
         try:
             alunos = self.db_integration.aluno_dao.listar_todos()
             
+            # RegistroAluno: slots + campos categóricos internados (ver registro_aluno.py)
             dados_alunos = []
             for aluno in alunos:
-                dados_alunos.append({
+                dados_alunos.append(RegistroAluno({
                     'id': aluno.get('_id', ''),
                     'nome': aluno.get('nome', ''),
                     'telefone': aluno.get('telefone', ''),
@@ -184,7 +249,7 @@ class SistemaAcademia:
                     'turma': aluno.get('turma', 'A definir'),
                     'status_frequencia': aluno.get('status_frequencia', 'Sem dados'),
                     'observacoes': aluno.get('observacoes', '')
-                })
+                }))
             
             print(f"📦 Carregados {len(dados_alunos)} alunos do banco MongoDB")
             return dados_alunos
@@ -192,7 +257,7 @@ class SistemaAcademia:
         except Exception as e:
             print(f"❌ Erro ao carregar dados do banco: {e}")
             # Fallback para dados embutidos se houver erro no banco
-            return self.get_dados_exemplo_basico()
+            return [RegistroAluno(aluno) for aluno in self.get_dados_exemplo_basico()]
     
     def get_dados_reais_embutidos(self):
         """Dados reais embutidos para funcionar no deploy do Render"""
@@ -470,12 +535,11 @@ class SistemaAcademia:
             if alunos_atividade:
                 for aluno in alunos_atividade:
                     # Encontrar o aluno na lista de alunos reais
-                    for aluno_real in self.alunos_reais:
-                        if aluno_real['nome'] == aluno['nome']:
-                            # Remover a atividade do aluno
-                            aluno_real['atividade'] = ''
-                            aluno_real['turma'] = ''
-                            break
+                    aluno_real = self.buscar_aluno_por_nome(aluno['nome'])
+                    if aluno_real:
+                        # Remover a atividade do aluno
+                        self.alterar_atividade_aluno(aluno_real, '')
+                        aluno_real['turma'] = ''
                 # Salvar alterações nos alunos
                 self.salvar_dados_reais()
             
@@ -525,9 +589,8 @@ class SistemaAcademia:
                 self.atividades_cadastradas[nome_novo] = atividade_atual
                 
                 # Atualizar a atividade nos alunos
-                for aluno in self.alunos_reais:
-                    if aluno.get('atividade') == nome_antigo:
-                        aluno['atividade'] = nome_novo
+                for aluno in self.get_alunos_por_atividade(nome_antigo):
+                    self.alterar_atividade_aluno(aluno, nome_novo)
                 
                 # Salvar alterações nos alunos
                 self.salvar_dados_reais()
@@ -698,7 +761,7 @@ class SistemaAcademia:
                         aluno['turma'] = ''
                         # Se a atividade for a mesma da turma, remover também
                         if aluno.get('atividade') == turma['atividade']:
-                            aluno['atividade'] = ''
+                            self.alterar_atividade_aluno(aluno, '')
                 # Salvar alterações nos alunos
                 self.salvar_dados_reais()
             
@@ -768,56 +831,47 @@ class SistemaAcademia:
     
     def get_estatisticas(self, filtro_atividade=None):
         """Estatísticas básicas com dados reais de presença"""
-        # Filtrar alunos se especificado
-        alunos_filtrados = self.alunos_reais
-        if filtro_atividade:
-            alunos_filtrados = [aluno for aluno in self.alunos_reais if aluno.get('atividade') == filtro_atividade]
-        
-        atividades_count = {}
-        for aluno in alunos_filtrados:
-            atividade = aluno['atividade']
-            atividades_count[atividade] = atividades_count.get(atividade, 0) + 1
+        # Contagem de alunos por atividade calculada no banco (aggregation)
+        resumo = EstatisticasDAO.resumo_alunos({'atividade': filtro_atividade} if filtro_atividade else None)
         
-        # Calcular presenças hoje baseado nos dados reais
-        data_hoje = datetime.now().strftime('%d/%m/%Y')
-        presencas_hoje = 0
+        if filtro_atividade:
+            nomes_atividade = self.get_nomes_por_atividade(filtro_atividade)
+            # Apenas os alunos da atividade que possuem registros de presença
+            nomes_com_presenca = [nome for nome in nomes_atividade if nome in self.dados_presenca]
+        else:
+            nomes_com_presenca = list(self.dados_presenca.keys())
         
-        # Se há filtro de atividade, contar apenas presenças dessa atividade
-        for nome, dados in self.dados_presenca.items():
-            # Verificar se o aluno pertence à atividade filtrada
+        if resumo is not None:
+            total_alunos = resumo['total_alunos']
+            atividades_count = resumo['atividades_count']
+        else:
+            # Fallback: contar sobre os alunos em memória
+            alunos_filtrados = self.alunos_reais
             if filtro_atividade:
-                aluno_encontrado = None
-                for aluno in self.alunos_reais:
-                    if aluno['nome'] == nome and aluno.get('atividade') == filtro_atividade:
-                        aluno_encontrado = aluno
-                        break
-                if not aluno_encontrado:
-                    continue
-            
-            for registro in dados['registros']:
-                if registro.get('data') == data_hoje and registro.get('status') == 'P':
-                    presencas_hoje += 1
+                alunos_filtrados = [aluno for nome in nomes_atividade
+                                    for aluno in self._alunos_por_nome.get(nome, [])
+                                    if aluno.get('atividade') == filtro_atividade]
+            total_alunos = len(alunos_filtrados)
+            atividades_count = {}
+            for aluno in alunos_filtrados:
+                atividade = aluno['atividade']
+                atividades_count[atividade] = atividades_count.get(atividade, 0) + 1
+        
+        # Calcular presenças hoje pelo índice por data
+        data_hoje = datetime.now().strftime('%d/%m/%Y')
+        presencas_hoje = len(self.get_presencas_por_data(
+            data_hoje, status='P', nomes=self.get_nomes_por_atividade(filtro_atividade) if filtro_atividade else None))
         
         # Calcular total de registros de presença (filtrados se necessário)
         total_registros = 0
         alunos_com_presenca = 0
         
-        for nome, dados in self.dados_presenca.items():
-            # Verificar se o aluno pertence à atividade filtrada
-            if filtro_atividade:
-                aluno_encontrado = None
-                for aluno in self.alunos_reais:
-                    if aluno['nome'] == nome and aluno.get('atividade') == filtro_atividade:
-                        aluno_encontrado = aluno
-                        break
-                if not aluno_encontrado:
-                    continue
-            
-            total_registros += len(dados['registros'])
+        for nome in nomes_com_presenca:
+            total_registros += len(self.dados_presenca[nome]['registros'])
             alunos_com_presenca += 1
         
         return {
-            'total_alunos': len(alunos_filtrados),
+            'total_alunos': total_alunos,
             'presencas_hoje': presencas_hoje,
             'presencas_semana': total_registros,
             'alunos_ativos': alunos_com_presenca,
@@ -1065,6 +1119,251 @@ class SistemaAcademia:
         """Retorna dados de presença de um aluno específico"""
         return self.dados_presenca.get(nome_aluno, None)
     
+    def reindexar_presencas(self):
+        """Reconstrói o índice data → registros de presença a partir de dados_presenca"""
+        self._presencas_por_data = {}
+        for nome, dados in self.dados_presenca.items():
+            if isinstance(dados, dict):
+                for registro in dados.get('registros', []):
+                    if isinstance(registro, dict):
+                        self._indexar_registro_presenca(nome, registro)
+    
+    def _indexar_registro_presenca(self, nome, registro):
+        """Inclui um registro no índice por data"""
+        self._presencas_por_data.setdefault(registro.get('data'), []).append((nome, registro))
+    
+    def _desindexar_registro_presenca(self, nome, registro, data=None):
+        """Retira um registro do índice por data (data antiga pode ser informada em edições)"""
+        data = registro.get('data') if data is None else data
+        entradas = self._presencas_por_data.get(data)
+        if not entradas:
+            return
+        restantes = [entrada for entrada in entradas if entrada[1] is not registro]
+        if restantes:
+            self._presencas_por_data[data] = restantes
+        else:
+            del self._presencas_por_data[data]
+    
+    @staticmethod
+    def _presenca_de_documento(documento):
+        """Documento da coleção presencas no formato dos registros de dados_presenca"""
+        data_presenca = documento.get('data_presenca')
+        return {
+            'nome': documento.get('nome_aluno', ''),
+            'data': data_presenca.strftime('%d/%m/%Y') if hasattr(data_presenca, 'strftime') else str(data_presenca or ''),
+            'horario': documento.get('horario', ''),
+            'turma': documento.get('turma') or '',
+            'atividade': documento.get('atividade', ''),
+            'status': documento.get('status', 'P'),
+            'observacoes': documento.get('observacoes', '')
+        }
+    
+    @staticmethod
+    def _chave_data_presenca(registro):
+        """Ordenação cronológica de registros com data dd/mm/aaaa (demais formatos ficam no início)"""
+        try:
+            return datetime.strptime(registro.get('data', ''), '%d/%m/%Y'), registro.get('horario', '')
+        except ValueError:
+            return datetime.min, registro.get('horario', '')
+    
+    def listar_presencas_periodo(self, inicio, fim, status=None, nomes=None):
+        """Presenças com data em [inicio, fim) numa consulta por faixa à coleção presencas.
+        
+        Registros que só existem em memória (planilhas de outros/ ou marcados com
+        o banco fora) completam o resultado, sem repetir aluno/dia. Retorna dicts
+        com nome, data, horario, turma, atividade, status e observacoes, em
+        ordem cronológica; `status` e `nomes` (conjunto) filtram o resultado.
+        """
+        presencas = {}
+        for documento in self.db_integration.listar_presencas_db(data_inicio=inicio, data_fim=fim, status=status):
+            presenca = self._presenca_de_documento(documento)
+            if nomes is None or presenca['nome'] in nomes:
+                presencas[(presenca['nome'], presenca['data'])] = presenca
+        
+        dia = inicio
+        while dia < fim:
+            data_str = dia.strftime('%d/%m/%Y')
+            for nome, registro in self._presencas_por_data.get(data_str, []):
+                if (nome, data_str) in presencas:
+                    continue
+                if status and registro.get('status') != status:
+                    continue
+                if nomes is not None and nome not in nomes:
+                    continue
+                presencas[(nome, data_str)] = {
+                    'nome': nome,
+                    'data': data_str,
+                    'horario': registro.get('horario', ''),
+                    'turma': registro.get('turma', ''),
+                    'atividade': self.dados_presenca.get(nome, {}).get('atividade', ''),
+                    'status': registro.get('status', 'P'),
+                    'observacoes': registro.get('observacoes', '')
+                }
+            dia += timedelta(days=1)
+        return sorted(presencas.values(), key=self._chave_data_presenca)
+    
+    def get_presencas_por_data(self, data_str, status=None, nomes=None):
+        """Registros de presença de uma data (dd/mm/aaaa); ver listar_presencas_periodo"""
+        try:
+            dia = datetime.strptime(data_str, '%d/%m/%Y')
+        except (TypeError, ValueError):
+            return []
+        return self.listar_presencas_periodo(dia, dia + timedelta(days=1), status=status, nomes=nomes)
+    
+    @staticmethod
+    def _periodo_mes(ano, mes):
+        """[início, fim) de um mês"""
+        return datetime(ano, mes, 1), datetime(ano + 1, 1, 1) if mes == 12 else datetime(ano, mes + 1, 1)
+    
+    def resumo_presencas_mes(self, ano, mes, atividade=None, turma=None):
+        """Totais do mês (opcionalmente de uma atividade/turma) para relatorio_mes e obter_dados_relatorio.
+        
+        Lê os resumos materializados (ResumoPresencaDAO); com o banco fora,
+        agrega as presenças do mês a partir de listar_presencas_periodo.
+        """
+        resumo = self.db_integration.obter_resumo_mes_db(ano, mes, atividade, turma)
+        if resumo is not None:
+            return resumo
+        
+        presencas_por_dia = {}
+        registros_por_dia = {}
+        presencas_por_aluno = {}
+        total_presencas = total_faltas = 0
+        for presenca in self.listar_presencas_periodo(*self._periodo_mes(ano, mes)):
+            if atividade and presenca['atividade'] != atividade:
+                continue
+            if turma and presenca['turma'] != turma:
+                continue
+            dia = int(presenca['data'][:2])
+            registros_por_dia[dia] = registros_por_dia.get(dia, 0) + 1
+            presencas_por_dia.setdefault(dia, 0)
+            if presenca['status'] == 'P':
+                presencas_por_dia[dia] += 1
+                presencas_por_aluno[presenca['nome']] = presencas_por_aluno.get(presenca['nome'], 0) + 1
+                total_presencas += 1
+            else:
+                total_faltas += 1
+        
+        return {
+            'total_presencas': total_presencas,
+            'total_faltas': total_faltas,
+            'dias_com_aula': len(registros_por_dia),
+            'presencas_por_dia': presencas_por_dia,
+            'registros_por_dia': registros_por_dia,
+            'presencas_por_aluno': sorted(presencas_por_aluno.items(), key=lambda x: x[1], reverse=True)[:10]
+        }
+    
+    def frequencia_alunos_mes(self, ano, mes, atividade=None):
+        """Contagens P/F/J do mês por aluno, chaveadas por str(id) (ou pelo nome, sem id).
+        
+        Uma leitura dos resumos materializados; com o banco fora, agrega as
+        presenças do mês (chaveadas pelo nome).
+        """
+        contagens = self.db_integration.obter_frequencia_alunos_mes_db(ano, mes, atividade)
+        if contagens is not None:
+            return contagens
+        
+        contagens = {}
+        for presenca in self.listar_presencas_periodo(*self._periodo_mes(ano, mes)):
+            if atividade and presenca['atividade'] != atividade:
+                continue
+            if presenca['status'] in ('P', 'F', 'J'):
+                por_status = contagens.setdefault(presenca['nome'], {'P': 0, 'F': 0, 'J': 0})
+                por_status[presenca['status']] += 1
+        return contagens
+    
+    def obter_frequencia_aluno(self, aluno):
+        """Frequência de um aluno (formato de dados_presenca) a partir da coleção presencas.
+        
+        Uma consulta pelo índice (aluno_id, data_presenca); registros só em
+        memória completam o histórico. Retorna None se não houver registros.
+        """
+        registros = {}
+        if aluno.get('id'):
+            for documento in self.db_integration.listar_presencas_db(aluno_id=aluno['id']):
+                registro = self._presenca_de_documento(documento)
+                registros[registro['data']] = registro
+        dados_memoria = self.get_presenca_aluno(aluno['nome']) or {}
+        for registro in dados_memoria.get('registros', []):
+            registros.setdefault(registro.get('data'), registro)
+        if not registros:
+            return None
+        
+        lista = sorted(registros.values(), key=self._chave_data_presenca)
+        total_presencas = sum(1 for registro in lista if registro.get('status') == 'P')
+        return {
+            'atividade': aluno.get('atividade') or dados_memoria.get('atividade', ''),
+            'total_presencas': total_presencas,
+            'total_faltas': len(lista) - total_presencas,
+            'registros': lista,
+            'percentual': round((total_presencas / len(lista)) * 100, 2)
+        }
+    
+    def presenca_registrada(self, nome_aluno, data_str):
+        """Verifica se o aluno já possui registro na data"""
+        return any(nome == nome_aluno for nome, _ in self._presencas_por_data.get(data_str, []))
+    
+    @staticmethod
+    def _converter_data_presenca(valor):
+        """Data de presença em dd/mm/aaaa ou aaaa-mm-dd → datetime (início do dia), ou None"""
+        for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+            try:
+                return datetime.strptime(valor, formato)
+            except (TypeError, ValueError):
+                continue
+        return None
+    
+    def editar_presenca(self, nome_aluno, data_original, nova_data, novo_status, novas_observacoes=''):
+        """Edita um registro de presença na coleção presencas e na memória (totais e índice por data).
+        
+        Datas em dd/mm/aaaa ou aaaa-mm-dd.
+        """
+        dia_original = self._converter_data_presenca(data_original)
+        novo_dia = self._converter_data_presenca(nova_data) if nova_data else dia_original
+        if dia_original is None or novo_dia is None:
+            return False, 'Formato de data inválido'
+        data_original = dia_original.strftime('%d/%m/%Y')
+        nova_data = novo_dia.strftime('%d/%m/%Y')
+        
+        alunos = self._alunos_por_nome.get(nome_aluno, [])
+        campos = {'status': novo_status, 'observacoes': novas_observacoes}
+        if novo_dia != dia_original:
+            campos['data_presenca'] = novo_dia
+        aluno_id = alunos[0].get('id') if alunos else None
+        editado = self.db_integration.atualizar_presenca_db(
+            dia_original, campos, aluno_id=aluno_id or None, nome_aluno=nome_aluno
+        )
+        
+        dados_aluno = self.dados_presenca.get(nome_aluno)
+        for registro in (dados_aluno or {}).get('registros', []):
+            if registro.get('data') == data_original:
+                status_anterior = registro.get('status')
+                
+                # Atualizar registro existente
+                registro['data'] = nova_data
+                registro['status'] = novo_status
+                registro['observacoes'] = novas_observacoes
+                if nova_data != data_original:
+                    self._desindexar_registro_presenca(nome_aluno, registro, data=data_original)
+                    self._indexar_registro_presenca(nome_aluno, registro)
+                
+                # Ajustar estatísticas
+                if status_anterior != novo_status:
+                    if status_anterior == 'P':
+                        dados_aluno['total_presencas'] -= 1
+                    if novo_status == 'P':
+                        dados_aluno['total_presencas'] += 1
+                total_registros = len(dados_aluno['registros'])
+                dados_aluno['total_faltas'] = total_registros - dados_aluno['total_presencas']
+                dados_aluno['percentual'] = round((dados_aluno['total_presencas'] / total_registros) * 100, 2) if total_registros > 0 else 0
+                editado = True
+                break
+        
+        if not editado:
+            return False, f'Registro de presença não encontrado para {nome_aluno} na data {data_original}'
+        self.atualizar_status_frequencia_alunos(alunos)
+        return True, f'Presença de {nome_aluno} editada com sucesso!'
+    
     def atualizar_status_frequencia_informatica(self):
         """Atualiza status de frequência dos alunos de Informática com base nos dados de presença"""
         try:
@@ -1072,26 +1371,8 @@ class SistemaAcademia:
             
             for aluno in self.alunos_reais:
                 if aluno.get('atividade') == 'Informática':
-                    nome = aluno['nome']
-                    dados_presenca = self.get_presenca_aluno(nome)
-                    
-                    if dados_presenca:
-                        percentual = dados_presenca['percentual']
-                        total_presencas = dados_presenca['total_presencas']
-                        
-                        if percentual >= 80:
-                            status = f"Excelente frequência ({percentual}% - {total_presencas} presenças)"
-                        elif percentual >= 60:
-                            status = f"Boa frequência ({percentual}% - {total_presencas} presenças)"
-                        elif percentual >= 40:
-                            status = f"Frequência regular ({percentual}% - {total_presencas} presenças)"
-                        else:
-                            status = f"Baixa frequência ({percentual}% - {total_presencas} presenças)"
-                        
-                        aluno['status_frequencia'] = status
+                    if self._atualizar_status_frequencia_aluno(aluno):
                         alunos_atualizados += 1
-                    else:
-                        aluno['status_frequencia'] = 'Sem dados de presença'
             
             if alunos_atualizados > 0:
                 self.salvar_dados()
@@ -1103,6 +1384,53 @@ class SistemaAcademia:
             print(f"❌ Erro ao atualizar status de frequência: {e}")
             return 0
     
+    def atualizar_status_frequencia_alunos(self, alunos):
+        """Recalcula o status de frequência só dos alunos informados (chamado a cada marcação/edição).
+        
+        Usa os contadores mantidos em dados_presenca, então custa O(1) por aluno;
+        os status que mudaram são gravados no banco com $set pontuais numa única
+        ida ao banco. Retorna quantos status mudaram.
+        """
+        try:
+            alterados = {}
+            for aluno in alunos:
+                if aluno.get('atividade') != 'Informática':
+                    continue
+                status_anterior = aluno.get('status_frequencia')
+                self._atualizar_status_frequencia_aluno(aluno)
+                if aluno['status_frequencia'] != status_anterior and aluno.get('id'):
+                    alterados[str(aluno['id'])] = aluno['status_frequencia']
+            
+            if alterados:
+                get_db_integration().atualizar_status_frequencia_db(alterados)
+            return len(alterados)
+            
+        except Exception as e:
+            print(f"❌ Erro ao atualizar status de frequência: {e}")
+            return 0
+    
+    def _atualizar_status_frequencia_aluno(self, aluno):
+        """Recalcula o status_frequencia de um aluno; retorna True se havia dados de presença"""
+        dados_presenca = self.get_presenca_aluno(aluno['nome'])
+        if not dados_presenca:
+            aluno['status_frequencia'] = 'Sem dados de presença'
+            return False
+        
+        percentual = dados_presenca['percentual']
+        total_presencas = dados_presenca['total_presencas']
+        
+        if percentual >= 80:
+            status = f"Excelente frequência ({percentual}% - {total_presencas} presenças)"
+        elif percentual >= 60:
+            status = f"Boa frequência ({percentual}% - {total_presencas} presenças)"
+        elif percentual >= 40:
+            status = f"Frequência regular ({percentual}% - {total_presencas} presenças)"
+        else:
+            status = f"Baixa frequência ({percentual}% - {total_presencas} presenças)"
+        
+        aluno['status_frequencia'] = status
+        return True
+    
     def registrar_presenca_manual(self, nome_aluno, data_hora=None):
         """Registra presença manual de um aluno no banco MongoDB"""
         try:
@@ -1122,98 +1450,34 @@ class SistemaAcademia:
             if not aluno_encontrado:
                 return False, "Aluno não encontrado"
             
-            # Registrar presença no banco de dados MongoDB
-            db_integration = get_db_integration()
+            nome_aluno = aluno_encontrado['nome']
+            aluno_id = aluno_encontrado.get('id')
             
+            # Verificar se já foi marcada presença hoje (memória e coleção presencas)
+            if self.presenca_registrada(nome_aluno, data_str) or (
+                    aluno_id and self.db_integration.alunos_com_presenca_no_dia_db(
+                        datetime.combine(data_hora.date(), datetime.min.time()), [aluno_id])):
+                return False, f"Presença já registrada hoje para {nome_aluno}"
+            
+            # Registrar presença no banco de dados MongoDB
             dados_presenca = {
-                'aluno_id': aluno_encontrado.get('id'),
+                'aluno_id': aluno_id,
+                'nome_aluno': nome_aluno,
+                'atividade': aluno_encontrado.get('atividade', ''),
                 'data_presenca': data_hora.date(),
+                'horario': hora_str,
                 'status': 'P',
+                'turma': aluno_encontrado.get('turma') or None,
                 'turma_id': None,  # Pode ser obtido do aluno se necessário
                 'atividade_id': None,  # Pode ser obtido do aluno se necessário
                 'observacoes': 'Presença manual',
                 'registrado_por': session.get('username', 'sistema')
             }
             
-            sucesso = db_integration.registrar_presenca_db(dados_presenca)
-            
-            if sucesso:
-                # Manter compatibilidade com sistema antigo (temporário)
-                # Inicializar dados de presença se não existir
-                if nome_aluno not in self.dados_presenca:
-                    self.dados_presenca[nome_aluno] = {
-                        'atividade': aluno_encontrado.get('atividade', 'Indefinido'),
-                        'total_presencas': 0,
-                        'total_faltas': 0,
-                        'registros': [],
-                        'percentual': 0
-                    }
-                
-                # Verificar se já foi marcada presença hoje
-                data_hoje = data_hora.strftime('%d/%m/%Y')
-                for registro in self.dados_presenca[nome_aluno]['registros']:
-                    if registro.get('data') == data_hoje:
-                        return False, f"Presença já registrada hoje para {nome_aluno}"
-                
-                # Adicionar registro de presença
-                novo_registro = {
-                    'data': data_str,
-                    'horario': hora_str,
-                    'status': 'P',
-                    'tipo': 'manual'
-                }
-            
-            self.dados_presenca[nome_aluno]['registros'].append(novo_registro)
-            self.dados_presenca[nome_aluno]['total_presencas'] += 1
+            if not self.db_integration.registrar_presenca_db(dados_presenca):
+                return False, "Erro ao registrar presença no banco de dados"
             
-            # Recalcular percentual
-            total_registros = len(self.dados_presenca[nome_aluno]['registros'])
-            if total_registros > 0:
-                percentual = round((self.dados_presenca[nome_aluno]['total_presencas'] / total_registros) * 100, 2)
-                self.dados_presenca[nome_aluno]['percentual'] = percentual
-            
-            # Salvar arquivo de presença manual
-            self.salvar_presenca_manual()
-            
-            # Atualizar status de frequência se for Informática
-            if aluno_encontrado.get('atividade') == 'Informática':
-                self.atualizar_status_frequencia_informatica()
-            
-            print(f"✅ Presença registrada: {nome_aluno} em {data_str} às {hora_str}")
-            return True, f"Presença registrada com sucesso para {nome_aluno}!"
-            
-        except Exception as e:
-            print(f"❌ Erro ao registrar presença: {e}")
-            return False, f"Erro ao registrar presença: {str(e)}"
-    
-    def registrar_presenca_detalhada(self, nome_aluno, data_presenca, horario_presenca, turma_presenca, observacoes=''):
-        """Registra presença com detalhes customizados (data, horário, turma)"""
-        try:
-            # Encontrar o aluno
-            aluno_encontrado = None
-            for aluno in self.alunos_reais:
-                if aluno['nome'].upper() == nome_aluno.upper():
-                    aluno_encontrado = aluno
-                    break
-            
-            if not aluno_encontrado:
-                return False, "Aluno não encontrado"
-            
-            # Validar formato da data
-            try:
-                data_obj = datetime.strptime(data_presenca, '%Y-%m-%d')
-                data_str = data_obj.strftime('%d/%m/%Y')
-            except ValueError:
-                return False, "Formato de data inválido"
-            
-            # Validar horário
-            try:
-                hora_obj = datetime.strptime(horario_presenca, '%H:%M')
-                hora_str = hora_obj.strftime('%H:%M')
-            except ValueError:
-                return False, "Formato de horário inválido"
-            
-            # Inicializar dados de presença se não existir
+            # Espelho em memória (índice por data e contadores do status de frequência)
             if nome_aluno not in self.dados_presenca:
                 self.dados_presenca[nome_aluno] = {
                     'atividade': aluno_encontrado.get('atividade', 'Indefinido'),
@@ -1222,24 +1486,14 @@ class SistemaAcademia:
                     'registros': [],
                     'percentual': 0
                 }
-            
-            # Verificar se já foi marcada presença nesta data
-            for registro in self.dados_presenca[nome_aluno]['registros']:
-                if registro.get('data') == data_str:
-                    return False, f"Presença já registrada em {data_str} para {nome_aluno}"
-            
-            # Adicionar registro de presença detalhada
             novo_registro = {
                 'data': data_str,
                 'horario': hora_str,
-                'turma': turma_presenca,
-                'observacoes': observacoes,
-                'status': 'P',
-                'tipo': 'manual_detalhada'
+                'status': 'P'
             }
-            
             self.dados_presenca[nome_aluno]['registros'].append(novo_registro)
             self.dados_presenca[nome_aluno]['total_presencas'] += 1
+            self._indexar_registro_presenca(nome_aluno, novo_registro)
             
             # Recalcular percentual
             total_registros = len(self.dados_presenca[nome_aluno]['registros'])
@@ -1247,99 +1501,157 @@ class SistemaAcademia:
                 percentual = round((self.dados_presenca[nome_aluno]['total_presencas'] / total_registros) * 100, 2)
                 self.dados_presenca[nome_aluno]['percentual'] = percentual
             
-            # Salvar arquivo de presença manual
-            self.salvar_presenca_detalhada()
-            
-            # Atualizar status de frequência se for Informática
-            if aluno_encontrado.get('atividade') == 'Informática':
-                self.atualizar_status_frequencia_informatica()
+            # Atualizar status de frequência (só deste aluno)
+            self.atualizar_status_frequencia_alunos([aluno_encontrado])
             
-            print(f"✅ Presença detalhada registrada: {nome_aluno} em {data_str} às {hora_str} - Turma: {turma_presenca}")
-            return True, f"Presença registrada para {nome_aluno} em {data_str} às {hora_str} (Turma: {turma_presenca})"
+            print(f"✅ Presença registrada: {nome_aluno} em {data_str} às {hora_str}")
+            return True, f"Presença registrada com sucesso para {nome_aluno}!"
             
         except Exception as e:
-            print(f"❌ Erro ao registrar presença detalhada: {e}")
+            print(f"❌ Erro ao registrar presença: {e}")
             return False, f"Erro ao registrar presença: {str(e)}"
     
-    def salvar_presenca_manual(self):
-        """Salva registros de presença manual em arquivo CSV"""
+    def registrar_presenca_detalhada(self, nome_aluno, data_presenca, horario_presenca, turma_presenca, observacoes=''):
+        """Registra presença com detalhes customizados (data, horário, turma)"""
         try:
-            arquivo_presenca = 'presencas_manuais.csv'
-            
-            # Criar cabeçalho se arquivo não existir
-            arquivo_existe = os.path.exists(arquivo_presenca)
+            if horario_presenca:
+                try:
+                    datetime.strptime(horario_presenca, '%H:%M')
+                except ValueError:
+                    return False, "Formato de horário inválido"
             
-            with open(arquivo_presenca, 'a', encoding='utf-8', newline='') as f:
-                import csv
-                writer = csv.writer(f)
-                
-                # Escrever cabeçalho se for novo arquivo
-                if not arquivo_existe:
-                    writer.writerow(['NOME', 'DATA', 'HORARIO', 'ATIVIDADE', 'STATUS', 'TIPO'])
-                
-                # Escrever apenas os registros novos (tipo manual)
-                for nome, dados in self.dados_presenca.items():
-                    aluno_atividade = dados.get('atividade', 'Indefinido')
-                    
-                    for registro in dados['registros']:
-                        if registro.get('tipo') == 'manual':
-                            writer.writerow([
-                                nome,
-                                registro.get('data', ''),
-                                registro.get('horario', ''),
-                                aluno_atividade,
-                                registro.get('status', 'P'),
-                                'MANUAL'
-                            ])
-                            # Remover flag de tipo manual para evitar duplicação
-                            registro.pop('tipo', None)
+            registrados, erros = self.registrar_presencas_lote(
+                [{'aluno': nome_aluno, 'status': 'P', 'observacoes': observacoes}],
+                data_presenca, horario_presenca, turma_presenca
+            )
+            if not registrados:
+                mensagem = erros[0] if erros else "Erro ao registrar presença"
+                # Mensagens do lote vêm como "<nome>: <motivo>"
+                return False, mensagem.split(': ', 1)[1] if mensagem.startswith(f"{nome_aluno}: ") else mensagem
             
-            return True
+            data_str = datetime.strptime(data_presenca, '%Y-%m-%d').strftime('%d/%m/%Y')
+            return True, f"Presença registrada para {registrados[0]} em {data_str} às {horario_presenca} (Turma: {turma_presenca})"
             
         except Exception as e:
-            print(f"❌ Erro ao salvar presença manual: {e}")
-            return False
+            print(f"❌ Erro ao registrar presença detalhada: {e}")
+            return False, f"Erro ao registrar presença: {str(e)}"
     
-    def salvar_presenca_detalhada(self):
-        """Salva registros de presença detalhada em arquivo CSV"""
+    def registrar_presencas_lote(self, presencas, data_presenca, horario_presenca=None, turma_presenca='Padrão'):
+        """Registra a chamada de uma turma de uma vez.
+        
+        `presencas` é uma lista de {'aluno', 'status' (P/F/J), 'observacoes'}. A
+        validação é feita numa única passada (alunos pelo índice por nome,
+        duplicatas pelo índice por data e por uma única consulta $in à coleção
+        presencas), todas as presenças vão para o banco num único insert_many
+        e o status de frequência é recalculado (e gravado num único
+        bulk_write) só para os alunos afetados.
+        
+        Retorna (registrados, erros): nomes gravados e mensagens por aluno.
+        """
         try:
-            arquivo_presenca = 'presencas_detalhadas.csv'
-            
-            # Criar cabeçalho se arquivo não existir
-            arquivo_existe = os.path.exists(arquivo_presenca)
-            
-            with open(arquivo_presenca, 'a', encoding='utf-8', newline='') as f:
-                import csv
-                writer = csv.writer(f)
-                
-                # Escrever cabeçalho se for novo arquivo
-                if not arquivo_existe:
-                    writer.writerow(['NOME', 'DATA', 'HORARIO', 'TURMA', 'ATIVIDADE', 'STATUS', 'OBSERVACOES', 'TIPO'])
-                
-                # Escrever apenas os registros novos (tipo manual_detalhada)
-                for nome, dados in self.dados_presenca.items():
-                    aluno_atividade = dados.get('atividade', 'Indefinido')
-                    
-                    for registro in dados['registros']:
-                        if registro.get('tipo') == 'manual_detalhada':
-                            writer.writerow([
-                                nome,
-                                registro.get('data', ''),
-                                registro.get('horario', ''),
-                                registro.get('turma', ''),
-                                aluno_atividade,
-                                registro.get('status', 'P'),
-                                registro.get('observacoes', ''),
-                                'MANUAL_DETALHADA'
-                            ])
-                            # Remover flag de tipo para evitar duplicação
-                            registro.pop('tipo', None)
+            data_obj = datetime.strptime(data_presenca, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            return [], ["Formato de data inválido"]
+        data_str = data_obj.strftime('%d/%m/%Y')
+        
+        try:
+            hora_str = datetime.strptime(horario_presenca, '%H:%M').strftime('%H:%M') if horario_presenca \
+                else datetime.now().strftime('%H:%M')
+        except ValueError:
+            return [], ["Formato de horário inválido"]
+        
+        erros = []
+        validas = []
+        nomes_na_chamada = set()
+        alunos_por_nome_maiusculo = None
+        for presenca in presencas:
+            nome_aluno = (presenca.get('aluno') or '').strip()
+            status = (presenca.get('status') or '').strip().upper()
+            if not nome_aluno or not status:
+                erros.append(f'Dados incompletos para {nome_aluno or "aluno desconhecido"}')
+                continue
+            if status not in ('P', 'F', 'J'):
+                erros.append(f'{nome_aluno}: status inválido ({status})')
+                continue
             
-            return True
+            aluno = self.buscar_aluno_por_nome(nome_aluno)
+            if aluno is None:
+                # Nome com caixa diferente: um único mapa por chamada, não uma varredura por aluno
+                if alunos_por_nome_maiusculo is None:
+                    alunos_por_nome_maiusculo = {}
+                    for candidato in self.alunos_reais:
+                        alunos_por_nome_maiusculo.setdefault(candidato['nome'].upper(), candidato)
+                aluno = alunos_por_nome_maiusculo.get(nome_aluno.upper())
+            if aluno is None:
+                erros.append(f'{nome_aluno}: Aluno não encontrado')
+                continue
             
-        except Exception as e:
-            print(f"❌ Erro ao salvar presença detalhada: {e}")
-            return False
+            nome = aluno['nome']
+            if nome in nomes_na_chamada or self.presenca_registrada(nome, data_str):
+                erros.append(f'{nome}: Presença já registrada em {data_str}')
+                continue
+            nomes_na_chamada.add(nome)
+            validas.append((aluno, status, presenca.get('observacoes', '') or ''))
+        
+        # Registros já gravados no banco (ex.: por outro worker): uma consulta para a chamada inteira
+        ja_no_banco = self.db_integration.alunos_com_presenca_no_dia_db(
+            data_obj, [aluno.get('id') for aluno, _, _ in validas if aluno.get('id')]
+        )
+        if ja_no_banco:
+            for aluno, _, _ in validas:
+                if str(aluno.get('id')) in ja_no_banco:
+                    erros.append(f"{aluno['nome']}: Presença já registrada em {data_str}")
+            validas = [item for item in validas if str(item[0].get('id')) not in ja_no_banco]
+        
+        if not validas:
+            return [], erros
+        
+        registrado_por = session.get('usuario_logado', 'sistema')
+        documentos = [{
+            'aluno_id': aluno.get('id'),
+            'nome_aluno': aluno['nome'],
+            'atividade': aluno.get('atividade', ''),
+            'data_presenca': data_obj.date(),
+            'horario': hora_str,
+            'status': status,
+            'turma': turma_presenca,
+            'turma_id': None,
+            'atividade_id': None,
+            'observacoes': observacoes,
+            'registrado_por': registrado_por
+        } for aluno, status, observacoes in validas]
+        if not get_db_integration().registrar_presencas_db_lote(documentos):
+            return [], erros + ["Erro ao registrar presenças no banco de dados"]
+        
+        registrados = []
+        for aluno, status, observacoes in validas:
+            nome = aluno['nome']
+            dados_aluno = self.dados_presenca.setdefault(nome, {
+                'atividade': aluno.get('atividade', 'Indefinido'),
+                'total_presencas': 0,
+                'total_faltas': 0,
+                'registros': [],
+                'percentual': 0
+            })
+            registro = {
+                'data': data_str,
+                'horario': hora_str,
+                'turma': turma_presenca,
+                'observacoes': observacoes,
+                'status': status
+            }
+            dados_aluno['registros'].append(registro)
+            if status == 'P':
+                dados_aluno['total_presencas'] += 1
+            total_registros = len(dados_aluno['registros'])
+            dados_aluno['total_faltas'] = total_registros - dados_aluno['total_presencas']
+            dados_aluno['percentual'] = round((dados_aluno['total_presencas'] / total_registros) * 100, 2)
+            self._indexar_registro_presenca(nome, registro)
+            registrados.append(nome)
+        
+        self.atualizar_status_frequencia_alunos([aluno for aluno, _, _ in validas])
+        print(f"✅ Chamada registrada: {len(registrados)} presenças em {data_str} - Turma: {turma_presenca}")
+        return registrados, erros
     
     def salvar_remocao_frequencia(self, nome_aluno):
         """Registra a remoção de dados de frequência de um aluno"""
@@ -1540,7 +1852,9 @@ class SistemaAcademia:
                 
                 # Também manter compatibilidade com sistema antigo (temporário)
                 novo_aluno['id'] = aluno_id
-                self.alunos_reais.append(novo_aluno)
+                registro = RegistroAluno(novo_aluno)
+                self.alunos_reais.append(registro)
+                self._indexar_aluno(registro)
                 self.salvar_dados()  # Backup em JSON
                 
                 if resultado.get('method') == 'fallback':
@@ -1570,7 +1884,9 @@ class SistemaAcademia:
                     
                     if sucesso:
                         # Também manter compatibilidade com sistema antigo (temporário)
-                        self.alunos_reais[indice].update(dados_atualizados)
+                        self._desindexar_aluno(aluno_atual)
+                        aluno_atual.update(dados_atualizados)
+                        self._indexar_aluno(aluno_atual)
                         self.salvar_dados()  # Backup em JSON
                         print(f"✅ Aluno {dados_atualizados.get('nome', 'ID:' + str(aluno_id))} atualizado no banco MongoDB")
                         return True
@@ -1580,7 +1896,9 @@ class SistemaAcademia:
                 else:
                     print("❌ Aluno não possui ID para atualização no banco")
                     # Fallback para sistema antigo
-                    self.alunos_reais[indice].update(dados_atualizados)
+                    self._desindexar_aluno(aluno_atual)
+                    aluno_atual.update(dados_atualizados)
+                    self._indexar_aluno(aluno_atual)
                     self.salvar_dados()
                     return True
             return False
@@ -1595,11 +1913,13 @@ class SistemaAcademia:
                 nome_removido = self.alunos_reais[indice]['nome']
                 
                 # Remover aluno da lista principal
-                self.alunos_reais.pop(indice)
+                self._desindexar_aluno(self.alunos_reais.pop(indice))
                 
                 # Remover dados de frequência do aluno (se existir)
                 if nome_removido in self.dados_presenca:
                     registros_removidos = len(self.dados_presenca[nome_removido]['registros'])
+                    for registro in self.dados_presenca[nome_removido]['registros']:
+                        self._desindexar_registro_presenca(nome_removido, registro)
                     del self.dados_presenca[nome_removido]
                     print(f"📊 Removidos {registros_removidos} registros de frequência de {nome_removido}")
                 
@@ -1693,14 +2013,77 @@ class SistemaAcademia:
             print(f"❌ Erro ao gerar planilha para {atividade}: {e}")
             return None
 
-# Sistema global
-try:
-    academia = SistemaAcademia()
-    print("✅ Sistema Academia inicializado com sucesso")
-except Exception as e:
-    print(f"❌ Erro ao inicializar Sistema Academia: {e}")
-    # Criar instância básica em caso de erro
-    academia = None
+class SistemaPreguicoso:
+    """Adia a criação do SistemaAcademia para fora da importação do app.
+
+    Carregar alunos, atividades, turmas e presenças leva segundos (e depende
+    do MongoDB); feito na importação, atrasava o bind do gunicorn e deixava o
+    /health instável no Render. O sistema é criado por aquecer() (thread em
+    segundo plano) ou no primeiro acesso, o que ocorrer antes; quem chegar
+    durante o carregamento espera por ele. Falhando, fica "falso" como o
+    antigo `academia = None`.
+    """
+
+    def __init__(self, fabrica):
+        object.__setattr__(self, '_fabrica', fabrica)
+        object.__setattr__(self, '_sistema', None)
+        object.__setattr__(self, '_carregado', False)
+        object.__setattr__(self, '_lock', threading.Lock())
+        object.__setattr__(self, 'estado', {
+            'pronto': False,
+            'carregando': False,
+            'erro': None,
+            'duracao_segundos': None,
+            'concluido_em': None
+        })
+
+    def _obter(self):
+        if not self._carregado:
+            with self._lock:
+                if not self._carregado:
+                    self.estado['carregando'] = True
+                    inicio = time.perf_counter()
+                    try:
+                        object.__setattr__(self, '_sistema', self._fabrica())
+                        print("✅ Sistema Academia inicializado com sucesso")
+                    except Exception as e:
+                        print(f"❌ Erro ao inicializar Sistema Academia: {e}")
+                        self.estado['erro'] = str(e)
+                    self.estado.update(
+                        pronto=True,
+                        carregando=False,
+                        duracao_segundos=round(time.perf_counter() - inicio, 2),
+                        concluido_em=datetime.now().isoformat()
+                    )
+                    object.__setattr__(self, '_carregado', True)
+        return self._sistema
+
+    def aquecer(self):
+        """Carrega o sistema numa thread em segundo plano"""
+        def _aquecer():
+            sistema = self._obter()
+            total = len(sistema.alunos_reais) if sistema is not None else 0
+            print(f"🔥 Aquecimento concluído em {self.estado['duracao_segundos']}s "
+                  f"({total} alunos; {time.perf_counter() - INICIO_APLICACAO:.2f}s desde o início)")
+        threading.Thread(target=_aquecer, name='aquecimento-academia', daemon=True).start()
+
+    def __bool__(self):
+        return self._obter() is not None
+
+    def __getattr__(self, nome):
+        sistema = self._obter()
+        if sistema is None:
+            raise AttributeError(f"Sistema Academia não inicializado ({self.estado['erro']})")
+        return getattr(sistema, nome)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._obter(), nome, valor)
+
+
+# Sistema global (carregado em segundo plano; ver SistemaPreguicoso)
+academia = SistemaPreguicoso(SistemaAcademia)
+if os.environ.get('AQUECIMENTO_EM_SEGUNDO_PLANO', '1') == '1':
+    academia.aquecer()
 
 def verificar_login():
     return 'usuario_logado' in session
@@ -1761,35 +2144,55 @@ def login_obrigatorio(f):
     wrapper.__name__ = f.__name__
     return wrapper
 
+def projetar_aluno(aluno):
+    """Monta o dicionário de aluno usado pelas páginas e APIs de listagem"""
+    return {
+        'id': aluno.get('_id', ''),
+        'id_unico': aluno.get('id_unico', ''),
+        'nome': aluno.get('nome', ''),
+        'telefone': aluno.get('telefone', ''),
+        'endereco': aluno.get('endereco', ''),
+        'email': aluno.get('email', ''),
+        'data_nascimento': aluno.get('data_nascimento', ''),
+        'data_cadastro': aluno.get('data_cadastro', ''),
+        'atividade': aluno.get('atividade', ''),
+        'turma': aluno.get('turma', ''),
+        'status_frequencia': aluno.get('status_frequencia', ''),
+        'observacoes': aluno.get('observacoes', '')
+    }
+
+def carregar_alunos_projetados():
+    """Lê todos os alunos ativos do banco e monta as projeções (usado pelo cache_alunos)"""
+    alunos = get_db_integration().aluno_dao.listar_todos()
+    print(f"🔄 Cache de alunos reconstruído: {len(alunos)} alunos no banco")
+    return [projetar_aluno(aluno) for aluno in alunos if aluno.get('ativo', True)]
+
+# Índice de busca de alunos, mantido pelos eventos de escrita do AlunoDAO
+indice_busca_alunos = IndiceBuscaAlunos(projetor=projetar_aluno)
+cache_alunos.registrar_ouvinte(indice_busca_alunos.aplicar_evento)
+
 def obter_alunos_usuario():
-    """Retorna lista de alunos que o usuário logado pode ver diretamente do banco de dados"""
+    """Retorna lista de alunos que o usuário logado pode ver diretamente do banco de dados.
+
+    A lista é servida pelo cache_alunos e só é reconstruída quando o AlunoDAO
+    registra uma escrita (ou o TTL do cache expira). Dentro de uma requisição
+    o resultado fica memorizado em flask.g, então chamadas repetidas não
+    refazem o filtro por atividade.
+    """
+    chave = (session.get('usuario_logado'), session.get('usuario_nivel'))
+    memo = g.get('alunos_usuario')
+    if memo is None or memo[0] != chave:
+        memo = g.alunos_usuario = (chave, _carregar_alunos_usuario())
+    return list(memo[1])
+
+def _carregar_alunos_usuario():
     usuario_logado = session.get('usuario_logado')
     nivel_usuario = session.get('usuario_nivel')
     
-    print(f"🔍 DEBUG obter_alunos_usuario: usuario_logado={usuario_logado}, nivel_usuario={nivel_usuario}")
-    
     try:
-        db_integration = get_db_integration()
-        
         # Admin Master e Admin veem todos os alunos
         if nivel_usuario in ['admin_master', 'admin']:
-            print(f"🔍 DEBUG: Entrando na condição admin/admin_master")
-            alunos = db_integration.aluno_dao.listar_todos()
-            print(f"🔍 DEBUG: Encontrados {len(alunos)} alunos no banco")
-            return [{
-                'id': aluno.get('_id', ''),
-                'id_unico': aluno.get('id_unico', ''),
-                'nome': aluno.get('nome', ''),
-                'telefone': aluno.get('telefone', ''),
-                'endereco': aluno.get('endereco', ''),
-                'email': aluno.get('email', ''),
-                'data_nascimento': aluno.get('data_nascimento', ''),
-                'data_cadastro': aluno.get('data_cadastro', ''),
-                'atividade': aluno.get('atividade', ''),
-                'turma': aluno.get('turma', ''),
-                'status_frequencia': aluno.get('status_frequencia', ''),
-                'observacoes': aluno.get('observacoes', '')
-            } for aluno in alunos if aluno.get('ativo', True)]
+            return list(cache_alunos.obter('todos', carregar_alunos_projetados))
         
         # Usuários veem apenas seus alunos atribuídos
         if nivel_usuario == 'usuario' and usuario_logado in USUARIOS:
@@ -1797,23 +2200,12 @@ def obter_alunos_usuario():
             atividade_responsavel = usuario_dados.get('atividade_responsavel')
             
             if atividade_responsavel:
-                # Buscar alunos por atividade
-                alunos = db_integration.aluno_dao.buscar_por_atividade(atividade_responsavel)
+                # Filtrar a lista completa (também em cache) pela atividade
+                def carregar_alunos_atividade():
+                    todos = cache_alunos.obter('todos', carregar_alunos_projetados)
+                    return [aluno for aluno in todos if aluno.get('atividade') == atividade_responsavel]
                 
-                return [{
-                    'id': aluno.get('_id', ''),
-                    'id_unico': aluno.get('id_unico', ''),
-                    'nome': aluno.get('nome', ''),
-                    'telefone': aluno.get('telefone', ''),
-                    'endereco': aluno.get('endereco', ''),
-                    'email': aluno.get('email', ''),
-                    'data_nascimento': aluno.get('data_nascimento', ''),
-                    'data_cadastro': aluno.get('data_cadastro', ''),
-                    'atividade': aluno.get('atividade', ''),
-                    'turma': aluno.get('turma', ''),
-                    'status_frequencia': aluno.get('status_frequencia', ''),
-                    'observacoes': aluno.get('observacoes', '')
-                } for aluno in alunos if aluno.get('ativo', True)]
+                return list(cache_alunos.obter(('atividade', atividade_responsavel), carregar_alunos_atividade))
         
         return []
         
@@ -1829,6 +2221,206 @@ def obter_alunos_usuario():
                 return academia.get_alunos_por_atividade(atividade_responsavel)
         return []
 
+def _conjuntos_acesso(usuario_logado, atividade_responsavel, construir=False):
+    """(nomes, ids) dos alunos visíveis ao usuário, montados uma vez por requisição.
+
+    Usa a lista já memorizada em flask.g ou uma projeção válida do cache_alunos;
+    com construir=False retorna None se nenhuma das duas estiver disponível.
+    """
+    chave = (usuario_logado, atividade_responsavel)
+    memo = g.get('acesso_alunos')
+    if memo is not None and memo[0] == chave:
+        return memo[1]
+    
+    alunos = None
+    memo_alunos = g.get('alunos_usuario')
+    if memo_alunos is not None and memo_alunos[0] == (usuario_logado, 'usuario'):
+        alunos = memo_alunos[1]
+    if alunos is None:
+        alunos = cache_alunos.consultar(('atividade', atividade_responsavel))
+    if alunos is None:
+        todos = cache_alunos.consultar('todos')
+        if todos is not None:
+            alunos = [aluno for aluno in todos if aluno.get('atividade') == atividade_responsavel]
+    if alunos is None:
+        if not construir:
+            return None
+        alunos = obter_alunos_usuario()
+    
+    nomes = {aluno.get('nome') for aluno in alunos}
+    ids = set()
+    for aluno in alunos:
+        for campo in ('id', 'id_unico'):
+            if aluno.get(campo):
+                ids.add(str(aluno[campo]))
+    g.acesso_alunos = (chave, (nomes, ids))
+    return nomes, ids
+
+def pode_acessar_aluno(nome=None, aluno_id=None):
+    """Verifica se o usuário logado pode ver/alterar o aluno, pelo nome exato ou pelo id (_id ou id_unico).
+
+    Admin Master e Admin acessam todos os alunos; usuários, apenas os da sua
+    atividade responsável. A resposta vem de conjuntos montados uma vez por
+    requisição; com o cache frio, faz uma única consulta indexada de existência
+    no banco em vez de carregar a lista inteira.
+    """
+    usuario_logado = session.get('usuario_logado')
+    nivel_usuario = session.get('usuario_nivel')
+    
+    if nivel_usuario in ['admin_master', 'admin']:
+        return True
+    if nivel_usuario != 'usuario' or usuario_logado not in USUARIOS:
+        return False
+    atividade_responsavel = USUARIOS[usuario_logado].get('atividade_responsavel')
+    if not atividade_responsavel:
+        return False
+    
+    acesso = _conjuntos_acesso(usuario_logado, atividade_responsavel)
+    if acesso is None:
+        existe = AlunoDAO.existe_na_atividade(atividade_responsavel, nome=nome, aluno_id=aluno_id)
+        if existe is not None:
+            return existe
+        # Banco indisponível: decidir pela lista (que tem fallback em memória)
+        acesso = _conjuntos_acesso(usuario_logado, atividade_responsavel, construir=True)
+    
+    nomes, ids = acesso
+    return (nome is not None and nome in nomes) or (aluno_id is not None and str(aluno_id) in ids)
+
+def buscar_alunos_usuario(termo):
+    """Busca por substring (sem diferenciar acentos) nos alunos visíveis ao usuário logado.
+
+    Usa o indice_busca_alunos; o resultado segue a ordem de obter_alunos_usuario().
+    """
+    usuario_logado = session.get('usuario_logado')
+    nivel_usuario = session.get('usuario_nivel')
+    
+    try:
+        encontrados = indice_busca_alunos.buscar(
+            termo, lambda: cache_alunos.obter('todos', carregar_alunos_projetados))
+    except Exception as e:
+        print(f"❌ Erro no índice de busca: {e}")
+        indice_busca_alunos.sincronizado = False
+        termo_normalizado = normalizar_texto(termo)
+        return [aluno for aluno in obter_alunos_usuario()
+                if any(termo_normalizado in normalizar_texto(aluno.get(campo, ''))
+                       for campo in ('nome', 'telefone', 'endereco', 'atividade'))]
+    
+    if nivel_usuario in ['admin_master', 'admin']:
+        return encontrados
+    
+    if nivel_usuario == 'usuario' and usuario_logado in USUARIOS:
+        atividade_responsavel = USUARIOS[usuario_logado].get('atividade_responsavel')
+        if atividade_responsavel:
+            return [aluno for aluno in encontrados if aluno.get('atividade') == atividade_responsavel]
+    
+    return []
+
+# Paginação das listagens de alunos
+CAMPOS_ALUNO_LISTAGEM = ('id', 'id_unico', 'nome', 'telefone', 'endereco', 'email', 'data_nascimento',
+                         'data_cadastro', 'atividade', 'turma', 'status_frequencia', 'observacoes')
+CAMPOS_ORDENACAO_ALUNOS = ('nome', 'data_cadastro', 'atividade', 'turma', 'telefone')
+POR_PAGINA_PADRAO = 50
+POR_PAGINA_MAXIMO = 500
+
+def obter_parametros_paginacao(por_pagina_padrao=POR_PAGINA_PADRAO):
+    """Lê pagina, por_pagina, ordenar, ordem e fields da query string"""
+    try:
+        pagina = max(int(request.args.get('pagina', 1)), 1)
+    except (TypeError, ValueError):
+        pagina = 1
+    try:
+        por_pagina = min(max(int(request.args.get('por_pagina', por_pagina_padrao)), 1), POR_PAGINA_MAXIMO)
+    except (TypeError, ValueError):
+        por_pagina = por_pagina_padrao
+    
+    ordenar_por = request.args.get('ordenar', '').strip()
+    if ordenar_por not in CAMPOS_ORDENACAO_ALUNOS:
+        ordenar_por = None
+    ordem = -1 if request.args.get('ordem', 'asc').lower() == 'desc' else 1
+    
+    campos = [campo.strip() for campo in request.args.get('fields', '').split(',')
+              if campo.strip() in CAMPOS_ALUNO_LISTAGEM]
+    
+    return {
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'ordenar_por': ordenar_por,
+        'ordem': ordem,
+        'campos': campos or None
+    }
+
+def paginar_lista(itens, params):
+    """Ordena (se pedido) e recorta uma lista já filtrada em memória"""
+    if params['ordenar_por']:
+        campo = params['ordenar_por']
+        itens = sorted(itens, key=lambda item: str(item.get(campo) or ''), reverse=params['ordem'] == -1)
+    inicio = (params['pagina'] - 1) * params['por_pagina']
+    return itens[inicio:inicio + params['por_pagina']], len(itens)
+
+def projetar_campos(alunos, campos):
+    """Mantém apenas as colunas pedidas em `fields=`"""
+    if not campos:
+        return alunos
+    return [{campo: aluno.get(campo, '') for campo in campos} for aluno in alunos]
+
+def info_paginacao(params, total):
+    """Metadados de paginação incluídos nas respostas JSON"""
+    por_pagina = params['por_pagina']
+    return {
+        'pagina': params['pagina'],
+        'por_pagina': por_pagina,
+        'total_paginas': (total + por_pagina - 1) // por_pagina if total else 0,
+        'ordenar': params['ordenar_por'] or '',
+        'ordem': 'desc' if params['ordem'] == -1 else 'asc'
+    }
+
+def filtro_alunos_usuario():
+    """Filtro do AlunoDAO correspondente ao que o usuário logado pode ver (None = sem acesso)"""
+    usuario_logado = session.get('usuario_logado')
+    nivel_usuario = session.get('usuario_nivel')
+    
+    if nivel_usuario in ['admin_master', 'admin']:
+        return {}
+    if nivel_usuario == 'usuario' and usuario_logado in USUARIOS:
+        atividade_responsavel = USUARIOS[usuario_logado].get('atividade_responsavel')
+        if atividade_responsavel:
+            return {'atividade': atividade_responsavel}
+    return None
+
+def listar_alunos_paginado(filtro, params):
+    """Busca uma página de alunos no banco (skip/limit) já no formato de projetar_aluno"""
+    campos_banco = None
+    if params['campos']:
+        campos_banco = [campo for campo in params['campos'] if campo != 'id']
+    alunos, total = AlunoDAO.listar_paginado(
+        filtro=filtro,
+        pagina=params['pagina'],
+        por_pagina=params['por_pagina'],
+        ordenar_por=params['ordenar_por'],
+        ordem=params['ordem'],
+        campos=campos_banco
+    )
+    return [projetar_aluno(aluno) for aluno in alunos], total
+
+def totais_alunos_por_atividade():
+    """Total de alunos ativos por atividade, lido dos contadores materializados"""
+    totais = ContadorDAO.obter_totais('atividade')
+    if not totais and academia.alunos_reais:
+        # Contadores indisponíveis: usar o índice em memória do SistemaAcademia
+        totais = {atividade: len(academia.get_nomes_por_atividade(atividade))
+                  for atividade in academia.atividades_cadastradas}
+    return totais
+
+def totais_alunos_por_turma():
+    """Total de alunos ativos por (atividade, turma), lido dos contadores materializados"""
+    totais = ContadorDAO.obter_totais('turma')
+    if not totais and academia.alunos_reais:
+        totais = {}
+        for aluno in academia.alunos_reais:
+            chave = (aluno.get('atividade') or '', aluno.get('turma') or '')
+            totais[chave] = totais.get(chave, 0) + 1
+    return totais
+
 def salvar_usuarios():
     """Salva dados de usuários em arquivo JSON"""
     try:
@@ -1919,7 +2511,7 @@ def dashboard():
     usuario_nome = session.get('usuario_nome', 'Usuário')
     
     # Verificar se a variável academia está inicializada
-    if academia is None:
+    if not academia:
         flash('Erro no sistema: Academia não inicializada. Entre em contato com o administrador.', 'error')
         return render_template('dashboard.html', 
                              stats={'total_alunos': 0, 'presencas_hoje': 0, 'presencas_semana': 0, 'alunos_ativos': 0},
@@ -1929,6 +2521,7 @@ def dashboard():
     
     if not hasattr(academia, 'dados_presenca') or academia.dados_presenca is None:
         academia.dados_presenca = {}
+        academia.reindexar_presencas()
     
     # Para professores/usuários, redirecionar para dashboard da sua atividade
     if nivel_usuario == 'usuario' and usuario_logado in USUARIOS:
@@ -1958,16 +2551,13 @@ def dashboard():
     presencas_hoje = []
     
     try:
-        for nome, dados in academia.dados_presenca.items():
-            if isinstance(dados, dict) and 'registros' in dados:
-                for registro in dados['registros']:
-                    if isinstance(registro, dict) and registro.get('data') == data_hoje and registro.get('status') == 'P':
-                        presencas_hoje.append({
-                            'Nome': nome,
-                            'Horário': registro.get('horario', ''),
-                            'Atividade': dados.get('atividade', ''),
-                            'Observações': 'Presença registrada'
-                        })
+        for presenca in academia.get_presencas_por_data(data_hoje, status='P'):
+            presencas_hoje.append({
+                'Nome': presenca['nome'],
+                'Horário': presenca['horario'],
+                'Atividade': presenca['atividade'],
+                'Observações': 'Presença registrada'
+            })
     except Exception as e:
         print(f"❌ Erro ao processar presenças: {e}")
         presencas_hoje = []
@@ -2042,32 +2632,41 @@ def dashboard_adaptado():
     usuario_logado = session.get('usuario_logado')
     usuario_nome = session.get('usuario_nome', 'Usuário')
     
-    # Obter alunos baseado no nível de acesso do usuário
-    lista_alunos = obter_alunos_usuario()
-    
-    # Calcular estatísticas adaptadas
-    total_alunos = len(lista_alunos)
-    cadastros_gerais = len([a for a in lista_alunos if a.get('atividade') == 'Cadastro Geral'])
-    turmas_indefinidas = len([a for a in lista_alunos if a.get('turma') in ['A definir', '', None]])
-    organizados = total_alunos - cadastros_gerais - turmas_indefinidas
-    
-    # Distribuição por atividades
-    atividades_count = {}
-    for aluno in lista_alunos:
-        atividade = aluno.get('atividade', 'Não definida')
-        atividades_count[atividade] = atividades_count.get(atividade, 0) + 1
+    # Contagens calculadas no banco, apenas sobre os alunos visíveis ao usuário
+    filtro = filtro_alunos_usuario()
+    resumo = EstatisticasDAO.resumo_alunos(filtro) if filtro is not None else None
     
-    # Alunos recentes (últimos 10)
-    alunos_recentes = sorted(lista_alunos, 
-                           key=lambda x: x.get('data_cadastro', ''), 
-                           reverse=True)[:10]
+    if filtro is None:
+        resumo = {'total_alunos': 0, 'cadastros_gerais': 0, 'turmas_indefinidas': 0, 'atividades_count': {}}
+        alunos_recentes = []
+    else:
+        if resumo is None:
+            # Fallback: calcular sobre a lista em cache
+            lista_alunos = obter_alunos_usuario()
+            resumo = {
+                'total_alunos': len(lista_alunos),
+                'cadastros_gerais': len([a for a in lista_alunos if a.get('atividade') == 'Cadastro Geral']),
+                'turmas_indefinidas': len([a for a in lista_alunos if a.get('turma') in ['A definir', '', None]]),
+                'atividades_count': {}
+            }
+            for aluno in lista_alunos:
+                atividade = aluno.get('atividade', 'Não definida')
+                resumo['atividades_count'][atividade] = resumo['atividades_count'].get(atividade, 0) + 1
+        
+        # Alunos recentes (últimos 10)
+        alunos_recentes, _ = listar_alunos_paginado(filtro, {
+            'pagina': 1, 'por_pagina': 10, 'ordenar_por': 'data_cadastro', 'ordem': -1, 'campos': None
+        })
     
+    total_alunos = resumo['total_alunos']
     stats_adaptadas = {
         'total_alunos': total_alunos,
-        'cadastros_gerais': cadastros_gerais,
-        'turmas_indefinidas': turmas_indefinidas,
-        'organizados': organizados,
-        'atividades_count': atividades_count
+        'alunos_ativos': total_alunos,
+        'cadastros_gerais': resumo['cadastros_gerais'],
+        'turmas_indefinidas': resumo['turmas_indefinidas'],
+        'organizados': total_alunos - resumo['cadastros_gerais'] - resumo['turmas_indefinidas'],
+        'atividades_count': resumo['atividades_count'],
+        'atividades_distribuicao': resumo['atividades_count']
     }
     
     return render_template('dashboard_adaptado.html',
@@ -2079,13 +2678,40 @@ def dashboard_adaptado():
 @app.route('/alunos')
 @login_obrigatorio
 def alunos():
-    # Obter alunos baseado no nível de acesso do usuário
-    lista_alunos = obter_alunos_usuario()
+    # Obter uma página de alunos baseada no nível de acesso do usuário
+    params = obter_parametros_paginacao()
+    filtro = filtro_alunos_usuario()
+    termo = request.args.get('termo', '').strip()
     usuario_nome = session.get('usuario_nome', 'Usuário')
     nivel_usuario = session.get('usuario_nivel', 'usuario')
     
+    if filtro is None:
+        lista_alunos, total = [], 0
+        resumo_status = {'dados_disponiveis': 0, 'aguardando': 0, 'em_progresso': 0}
+    elif termo:
+        # Busca em todos os alunos visíveis (índice de busca), não só na página atual
+        encontrados = buscar_alunos_usuario(termo)
+        lista_alunos, total = paginar_lista(encontrados, params)
+        status = [aluno.get('status_frequencia') or '' for aluno in encontrados]
+        resumo_status = {
+            'dados_disponiveis': sum(1 for valor in status if valor == 'Dados disponíveis'),
+            'aguardando': sum(1 for valor in status if 'Aguardando' in valor),
+            'em_progresso': sum(1 for valor in status if 'Em progresso' in valor)
+        }
+    else:
+        lista_alunos, total = listar_alunos_paginado(filtro, params)
+        resumo_status = {
+            'dados_disponiveis': AlunoDAO.contar(dict(filtro, status_frequencia='Dados disponíveis')),
+            'aguardando': AlunoDAO.contar(dict(filtro, status_frequencia={'$regex': 'Aguardando'})),
+            'em_progresso': AlunoDAO.contar(dict(filtro, status_frequencia={'$regex': 'Em progresso'}))
+        }
+    
     return render_template('alunos.html', 
                          alunos=lista_alunos, 
+                         total_alunos=total,
+                         resumo_status=resumo_status,
+                         paginacao=info_paginacao(params, total),
+                         termo=termo,
                          usuario_nome=usuario_nome,
                          nivel_usuario=nivel_usuario)
 
@@ -2105,7 +2731,11 @@ def alunos_adaptado():
 
 @app.route('/buscar_alunos')
 def buscar_alunos():
-    """Rota para busca de alunos via AJAX"""
+    """Rota para busca de alunos via AJAX.
+
+    Parâmetros: termo, pagina, por_pagina, ordenar (nome, data_cadastro, atividade,
+    turma, telefone), ordem (asc/desc) e fields (colunas separadas por vírgula).
+    """
     # Verificar login manualmente para requisições AJAX
     # Adicionar modo de teste para contornar problema de sessão
     modo_teste = request.args.get('teste', '').lower() == 'true'
@@ -2127,64 +2757,48 @@ def buscar_alunos():
             try:
                 db_integration = get_db_integration()
                 alunos_raw = db_integration.aluno_dao.listar_todos()
-                todos_alunos = [{
-                    'id': str(aluno.get('_id', '')),
-                    'id_unico': aluno.get('id_unico', ''),
-                    'nome': aluno.get('nome', ''),
-                    'telefone': aluno.get('telefone', ''),
-                    'endereco': aluno.get('endereco', ''),
-                    'email': aluno.get('email', ''),
-                    'data_nascimento': aluno.get('data_nascimento', ''),
-                    'data_cadastro': aluno.get('data_cadastro', ''),
-                    'atividade': aluno.get('atividade', ''),
-                    'turma': aluno.get('turma', ''),
-                    'status_frequencia': aluno.get('status_frequencia', ''),
-                    'observacoes': aluno.get('observacoes', '')
-                } for aluno in alunos_raw if aluno.get('ativo', True)]
+                todos_alunos = [dict(projetar_aluno(aluno), id=str(aluno.get('_id', '')))
+                                for aluno in alunos_raw if aluno.get('ativo', True)]
             except Exception as e:
                 print(f"❌ Erro ao acessar banco no modo teste: {e}")
                 todos_alunos = []
         else:
             nivel_usuario = session.get('usuario_nivel', 'usuario')
-            # Obter todos os alunos baseado no nível de acesso
-            todos_alunos = obter_alunos_usuario()
+            todos_alunos = None
+        
+        print(f"🔍 DEBUG: Modo teste: {modo_teste} | Nível usuário: {nivel_usuario} | Termo de busca: '{termo}'")
         
-        # Debug: imprimir informações
-        print(f"🔍 DEBUG: Modo teste: {modo_teste}")
-        print(f"🔍 DEBUG: Nível usuário: {nivel_usuario}")
-        print(f"🔍 DEBUG: Total de alunos obtidos: {len(todos_alunos)}")
-        print(f"🔍 DEBUG: Termo de busca: '{termo}'")
+        params = obter_parametros_paginacao()
         
         if termo:
-            # Filtrar alunos pelo termo de busca
-            alunos_filtrados = []
-            for aluno in todos_alunos:
-                nome = aluno.get('nome', '').lower()
-                telefone = aluno.get('telefone', '').lower()
-                endereco = aluno.get('endereco', '').lower()
-                atividade = aluno.get('atividade', '').lower()
-                
-                # Buscar em nome, telefone, endereço e atividade
-                if (termo in nome or 
-                    termo in telefone or 
-                    termo in endereco or 
-                    termo in atividade):
-                    alunos_filtrados.append(aluno)
+            if modo_teste:
+                termo_normalizado = normalizar_texto(termo)
+                alunos_filtrados = [
+                    aluno for aluno in todos_alunos
+                    if any(termo_normalizado in normalizar_texto(aluno.get(campo, ''))
+                           for campo in ('nome', 'telefone', 'endereco', 'atividade'))
+                ]
+            else:
+                alunos_filtrados = buscar_alunos_usuario(termo)
             
-            return jsonify({
-                'success': True,
-                'alunos': alunos_filtrados,
-                'total_encontrado': len(alunos_filtrados),
-                'termo_busca': termo
-            })
+            pagina_alunos, total = paginar_lista(alunos_filtrados, params)
+        elif todos_alunos is not None:
+            pagina_alunos, total = paginar_lista(todos_alunos, params)
         else:
-            # Retornar todos os alunos
-            return jsonify({
-                'success': True,
-                'alunos': todos_alunos,
-                'total_encontrado': len(todos_alunos),
-                'termo_busca': ''
-            })
+            filtro = filtro_alunos_usuario()
+            if filtro is None:
+                pagina_alunos, total = [], 0
+            else:
+                pagina_alunos, total = listar_alunos_paginado(filtro, params)
+        
+        resposta = {
+            'success': True,
+            'alunos': projetar_campos(pagina_alunos, params['campos']),
+            'total_encontrado': total,
+            'termo_busca': termo
+        }
+        resposta.update(info_paginacao(params, total))
+        return jsonify(resposta)
             
     except Exception as e:
         return jsonify({
@@ -2256,10 +2870,10 @@ def busca_avancada_page():
 @app.route('/relatorios')
 @login_obrigatorio
 def relatorios():
-    meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-             'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
     usuario_nome = session.get('usuario_nome', 'Usuário')
-    return render_template('relatorios.html', meses=meses, mes_selecionado='Dezembro', usuario_nome=usuario_nome)
+    atividades = sorted({aluno.get('atividade') for aluno in obter_alunos_usuario() if aluno.get('atividade')})
+    return render_template('relatorios.html', meses=MESES_RELATORIO, mes_selecionado=MESES_RELATORIO[datetime.now().month - 1],
+                           atividades=atividades, usuario_nome=usuario_nome)
 
 @app.route('/novo_aluno')
 @apenas_admin_ou_master
@@ -2277,19 +2891,12 @@ def marcar_presenca():
             return jsonify({'success': False, 'message': 'Nome do aluno é obrigatório'})
         
         # Verificar se o usuário tem permissão para marcar presença deste aluno
-        nivel_usuario = session.get('usuario_nivel')
-        usuario_logado = session.get('usuario_logado')
-        
-        if nivel_usuario == 'usuario':
-            # Usuários só podem marcar presença de alunos da sua atividade
-            alunos_permitidos = obter_alunos_usuario()
-            nomes_permitidos = [aluno['nome'] for aluno in alunos_permitidos]
-            
-            if nome_aluno not in nomes_permitidos:
-                return jsonify({
-                    'success': False, 
-                    'message': 'Você só pode marcar presença dos alunos da sua atividade responsável'
-                })
+        # (usuários só podem marcar presença de alunos da sua atividade)
+        if not pode_acessar_aluno(nome=nome_aluno):
+            return jsonify({
+                'success': False, 
+                'message': 'Você só pode marcar presença dos alunos da sua atividade responsável'
+            })
         
         # Registrar presença manual
         sucesso, mensagem = academia.registrar_presenca_manual(nome_aluno)
@@ -2333,24 +2940,18 @@ def frequencia_individual():
     
     if aluno_id:
         # Buscar aluno pelo ID (pode ser numérico ou alfanumérico)
-        for i, aluno in enumerate(academia.alunos_reais):
+        for aluno in academia.alunos_reais:
             if str(aluno.get('id_unico', '')) == str(aluno_id):
-                aluno_selecionado = academia.alunos_reais[i]
+                aluno_selecionado = aluno
                 break
-            
-            # Verificar permissão para ver este aluno
-            if nivel_usuario == 'usuario':
-                # Professores só podem ver alunos da sua atividade
-                usuario_logado = session.get('usuario_logado')
-                usuario_info = USUARIOS.get(usuario_logado, {})
-                atividades_responsavel = usuario_info.get('atividades_responsavel', [])
-                
-                if aluno_selecionado.get('atividade') not in atividades_responsavel:
-                    aluno_selecionado = None
-            
-            # Obter dados de presença
-            if aluno_selecionado:
-                dados_presenca = academia.get_presenca_aluno(aluno_selecionado['nome'])
+        
+        # Professores só podem ver alunos da sua atividade
+        if aluno_selecionado and not pode_acessar_aluno(nome=aluno_selecionado['nome'], aluno_id=aluno_id):
+            aluno_selecionado = None
+        
+        # Obter dados de presença
+        if aluno_selecionado:
+            dados_presenca = academia.obter_frequencia_aluno(aluno_selecionado)
     
     return render_template('frequencia_individual.html',
                           alunos=lista_alunos,
@@ -2384,18 +2985,12 @@ def marcar_presenca_detalhada():
             return jsonify({'success': False, 'message': 'Turma/Horário da atividade é obrigatório'})
         
         # Verificar se o usuário tem permissão para marcar presença deste aluno
-        nivel_usuario = session.get('usuario_nivel')
-        
-        if nivel_usuario == 'usuario':
-            # Usuários só podem marcar presença de alunos da sua atividade
-            alunos_permitidos = obter_alunos_usuario()
-            nomes_permitidos = [aluno['nome'] for aluno in alunos_permitidos]
-            
-            if nome_aluno not in nomes_permitidos:
-                return jsonify({
-                    'success': False, 
-                    'message': 'Você só pode marcar presença dos alunos da sua atividade responsável'
-                })
+        # (usuários só podem marcar presença de alunos da sua atividade)
+        if not pode_acessar_aluno(nome=nome_aluno):
+            return jsonify({
+                'success': False, 
+                'message': 'Você só pode marcar presença dos alunos da sua atividade responsável'
+            })
         
         # Registrar presença detalhada
         sucesso, mensagem = academia.registrar_presenca_detalhada(
@@ -2764,36 +3359,55 @@ def excluir_busca_salva(busca_id):
             'message': f'Erro ao excluir busca: {str(e)}'
         })
 
+MESES_RELATORIO = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+                   'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+RELATORIO_POR_PAGINA = int(os.environ.get('RELATORIO_POR_PAGINA', 50))
+RELATORIO_POR_PAGINA_MAX = 200
+
 @app.route('/obter_dados_relatorio', methods=['GET'])
 @login_obrigatorio
 def obter_dados_relatorio():
-    """Obtém dados para relatórios"""
+    """Frequência do mês por aluno, com filtros de atividade e turma e paginação.
+    
+    Parâmetros: mes (nome ou número), ano, atividade, turma, pagina e
+    por_pagina. As contagens vêm dos resumos mensais de presença (uma leitura
+    para o mês inteiro) cruzadas com os alunos que o usuário pode ver; os
+    totais em `resumo` consideram todos os alunos filtrados, não só a página.
+    """
     try:
         # Obter parâmetros de filtro
-        mes = request.args.get('mes', 'Dezembro')
+        agora = datetime.now()
+        mes = request.args.get('mes') or MESES_RELATORIO[agora.month - 1]
+        mes_num = MESES_RELATORIO.index(mes) + 1 if mes in MESES_RELATORIO else request.args.get('mes', type=int)
+        ano = request.args.get('ano', default=agora.year, type=int)
         atividade = request.args.get('atividade', '')
         turma = request.args.get('turma', '')
-        
-        # Obter dados dos alunos
-        alunos_data = academia.get_dados_reais_embutidos()
-        
-        # Filtrar por atividade se especificado
-        if atividade:
-            alunos_data = [aluno for aluno in alunos_data if aluno.get('atividade') == atividade]
-        
-        # Filtrar por turma se especificado
-        if turma:
-            alunos_data = [aluno for aluno in alunos_data if aluno.get('turma') == turma]
-        
-        # Simular dados de presença (em um sistema real, isso viria do banco)
-        import random
+        if not mes_num or not 1 <= mes_num <= 12 or not 2000 <= ano <= 2100:
+            return jsonify({'success': False, 'message': 'Mês ou ano inválido'}), 400
+        por_pagina = min(max(request.args.get('por_pagina', default=RELATORIO_POR_PAGINA, type=int), 1),
+                         RELATORIO_POR_PAGINA_MAX)
+        pagina = max(request.args.get('pagina', default=1, type=int), 1)
+        
+        # Alunos visíveis para o usuário, filtrados por atividade/turma
+        alunos_data = [aluno for aluno in obter_alunos_usuario()
+                       if (not atividade or aluno.get('atividade') == atividade)
+                       and (not turma or aluno.get('turma') == turma)]
+        alunos_data.sort(key=lambda aluno: aluno.get('nome') or '')
+        
+        contagens = academia.frequencia_alunos_mes(ano, mes_num, atividade or None)
         relatorio_data = []
-        
-        for aluno in alunos_data[:50]:  # Limitar a 50 para performance
-            presencas = random.randint(5, 10)
-            faltas = random.randint(0, 5)
+        total_presencas = total_faltas = 0
+        alunos_por_atividade = {}
+        for aluno in alunos_data:
+            por_status = contagens.get(str(aluno.get('id'))) or contagens.get(aluno.get('nome')) or {}
+            presencas = por_status.get('P', 0)
+            faltas = por_status.get('F', 0) + por_status.get('J', 0)
             total_aulas = presencas + faltas
             taxa = round((presencas / total_aulas) * 100) if total_aulas > 0 else 0
+            total_presencas += presencas
+            total_faltas += faltas
+            alunos_por_atividade[aluno.get('atividade') or 'Não informado'] = \
+                alunos_por_atividade.get(aluno.get('atividade') or 'Não informado', 0) + 1
             
             relatorio_data.append({
                 'nome': aluno.get('nome', 'Nome não informado'),
@@ -2802,14 +3416,41 @@ def obter_dados_relatorio():
                 'presencas': presencas,
                 'faltas': faltas,
                 'taxa': taxa,
-                'status': 'Ativo' if taxa >= 70 else 'Irregular'
+                'status': ('Ativo' if taxa >= 70 else 'Irregular') if total_aulas else 'Sem registros'
             })
         
+        # Taxa de presença por semana do mês (dias 1-7, 8-14, ...), dos resumos por dia
+        resumo_mes = academia.resumo_presencas_mes(ano, mes_num, atividade or None, turma or None)
+        frequencia_semanal = []
+        for inicio_semana in range(1, 32, 7):
+            dias = range(inicio_semana, inicio_semana + 7)
+            registros = sum(resumo_mes['registros_por_dia'].get(dia, 0) for dia in dias)
+            presentes = sum(resumo_mes['presencas_por_dia'].get(dia, 0) for dia in dias)
+            frequencia_semanal.append(round((presentes / registros) * 100) if registros else 0)
+        
+        total_alunos = len(relatorio_data)
+        inicio = (pagina - 1) * por_pagina
         return jsonify({
             'success': True,
-            'dados': relatorio_data,
+            'dados': relatorio_data[inicio:inicio + por_pagina],
+            'resumo': {
+                'total_alunos': total_alunos,
+                'total_presencas': total_presencas,
+                'total_faltas': total_faltas,
+                'taxa_geral': round((total_presencas / (total_presencas + total_faltas)) * 100)
+                              if total_presencas + total_faltas else 0,
+                'alunos_por_atividade': alunos_por_atividade,
+                'frequencia_semanal': frequencia_semanal
+            },
+            'paginacao': {
+                'pagina': pagina,
+                'por_pagina': por_pagina,
+                'total': total_alunos,
+                'paginas': max((total_alunos + por_pagina - 1) // por_pagina, 1)
+            },
             'filtros': {
-                'mes': mes,
+                'mes': MESES_RELATORIO[mes_num - 1],
+                'ano': ano,
                 'atividade': atividade,
                 'turma': turma
             }
@@ -2836,22 +3477,24 @@ def salvar_presenca():
                 'message': 'Nome do aluno e status são obrigatórios'
             }), 400
         
-        # Usar o sistema existente de registro de presença
-        sucesso, mensagem = sistema_busca.registrar_presenca_detalhada(
-            nome_aluno=nome_aluno,
-            data_presenca=data_presenca,
-            horario_presenca=datetime.now().strftime('%H:%M'),
-            turma_presenca='Padrão',
-            observacoes=observacoes
+        if not pode_acessar_aluno(nome=nome_aluno):
+            return jsonify({
+                'success': False,
+                'message': 'Você só pode marcar presença dos alunos da sua atividade responsável'
+            }), 403
+        
+        registrados, erros = academia.registrar_presencas_lote(
+            [{'aluno': nome_aluno, 'status': status, 'observacoes': observacoes}],
+            data_presenca
         )
         
-        if sucesso:
+        if registrados:
             # Registrar atividade no log
-            usuario_nome = session.get('usuario_nome', 'Sistema')
-            sistema_busca.registrar_atividade(
+            registrar_atividade(
+                session.get('usuario_logado'),
+                'Marcou Presença',
                 f"Presença registrada para {nome_aluno} - Status: {status}",
-                usuario_nome,
-                'presenca'
+                session.get('usuario_nivel', 'usuario')
             )
             
             return jsonify({
@@ -2861,7 +3504,7 @@ def salvar_presenca():
         else:
             return jsonify({
                 'success': False,
-                'message': mensagem
+                'message': erros[0] if erros else 'Nenhuma presença foi salva'
             }), 400
             
     except Exception as e:
@@ -2885,43 +3528,28 @@ def salvar_todas_presencas():
                 'message': 'Nenhuma presença para salvar'
             }), 400
         
-        sucessos = 0
+        # Usuários só podem marcar presença de alunos da sua atividade
+        permitidas = []
         erros = []
-        
         for presenca in presencas:
             nome_aluno = presenca.get('aluno')
-            status = presenca.get('status')
-            observacoes = presenca.get('observacoes', '')
-            
-            if not nome_aluno or not status:
-                erros.append(f'Dados incompletos para {nome_aluno or "aluno desconhecido"}')
-                continue
-            
-            try:
-                # Registrar presença individual
-                sucesso, mensagem = sistema_busca.registrar_presenca_detalhada(
-                    nome_aluno=nome_aluno,
-                    data_presenca=data_presenca,
-                    horario_presenca=datetime.now().strftime('%H:%M'),
-                    turma_presenca='Padrão',
-                    observacoes=observacoes
-                )
-                
-                if sucesso:
-                    sucessos += 1
-                else:
-                    erros.append(f'{nome_aluno}: {mensagem}')
-                    
-            except Exception as e:
-                erros.append(f'{nome_aluno}: {str(e)}')
+            if nome_aluno and not pode_acessar_aluno(nome=nome_aluno):
+                erros.append(f'{nome_aluno}: fora da sua atividade responsável')
+            else:
+                permitidas.append(presenca)
+        
+        # Chamada inteira em lote: uma validação e um insert_many no MongoDB (ou um append na fila de gravação)
+        registrados, erros_lote = academia.registrar_presencas_lote(permitidas, data_presenca)
+        erros += erros_lote
+        sucessos = len(registrados)
         
         # Registrar atividade no log
         if sucessos > 0:
-            usuario_nome = session.get('usuario_nome', 'Sistema')
-            sistema_busca.registrar_atividade(
+            registrar_atividade(
+                session.get('usuario_logado'),
+                'Marcou Presença',
                 f"Presenças em lote registradas: {sucessos} sucessos, {len(erros)} erros",
-                usuario_nome,
-                'presenca'
+                session.get('usuario_nivel', 'usuario')
             )
         
         if sucessos > 0 and len(erros) == 0:
@@ -2967,52 +3595,25 @@ def editar_presenca():
             }), 400
         
         # Buscar e atualizar no sistema de dados de presença
-        if nome_aluno in sistema_busca.dados_presenca:
-            dados_aluno = sistema_busca.dados_presenca[nome_aluno]
-            registro_encontrado = False
-            
-            for registro in dados_aluno['registros']:
-                if registro.get('data') == data_original:
-                    # Atualizar registro existente
-                    registro['data'] = nova_data
-                    registro['status'] = novo_status
-                    registro['observacoes'] = novas_observacoes
-                    registro_encontrado = True
-                    break
+        sucesso, mensagem = academia.editar_presenca(nome_aluno, data_original, nova_data, novo_status, novas_observacoes)
+        
+        if sucesso:
+            # Registrar atividade no log
+            registrar_atividade(
+                session.get('usuario_logado', 'Sistema'),
+                'Editou Presença',
+                f"Presença editada para {nome_aluno} - Data: {data_original} -> {nova_data}, Status: {novo_status}",
+                session.get('usuario_nivel', 'usuario')
+            )
             
-            if registro_encontrado:
-                # Recalcular estatísticas
-                total_presencas = sum(1 for r in dados_aluno['registros'] if r.get('status') == 'P')
-                total_registros = len(dados_aluno['registros'])
-                
-                dados_aluno['total_presencas'] = total_presencas
-                dados_aluno['total_faltas'] = total_registros - total_presencas
-                dados_aluno['percentual'] = round((total_presencas / total_registros) * 100, 2) if total_registros > 0 else 0
-                
-                # Salvar alterações
-                sistema_busca.salvar_presenca_detalhada()
-                
-                # Registrar atividade no log
-                usuario_nome = session.get('usuario_nome', 'Sistema')
-                sistema_busca.registrar_atividade(
-                    f"Presença editada para {nome_aluno} - Data: {data_original} -> {nova_data}, Status: {novo_status}",
-                    usuario_nome,
-                    'presenca'
-                )
-                
-                return jsonify({
-                    'success': True,
-                    'message': f'Presença de {nome_aluno} editada com sucesso!'
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'message': f'Registro de presença não encontrado para {nome_aluno} na data {data_original}'
-                }), 404
+            return jsonify({
+                'success': True,
+                'message': mensagem
+            })
         else:
             return jsonify({
                 'success': False,
-                'message': f'Dados de presença não encontrados para {nome_aluno}'
+                'message': mensagem
             }), 404
             
     except Exception as e:
@@ -3069,51 +3670,13 @@ def relatorio_mes(mes):
             return jsonify({'error': 'Mês inválido'}), 400
         
         mes_num = meses_map[mes]
-        ano_atual = datetime.now().year
-        
-        # Obter dados de presença do mês
-        presencas_por_dia = {}
-        presencas_por_aluno = {}
-        total_presencas = 0
-        total_faltas = 0
-        dias_com_aula = set()
-        
-        # Processar dados de presença do arquivo CSV
-        if os.path.exists('presencas_detalhadas.csv'):
-            import csv
-            with open('presencas_detalhadas.csv', 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        # Converter data do formato DD/MM/YYYY
-                        data_str = row.get('DATA', '')
-                        if data_str:
-                            dia, mes_data, ano = data_str.split('/')
-                            if int(mes_data) == mes_num and int(ano) == ano_atual:
-                                dia_int = int(dia)
-                                dias_com_aula.add(dia_int)
-                                
-                                # Contar presenças por dia
-                                if dia_int not in presencas_por_dia:
-                                    presencas_por_dia[dia_int] = 0
-                                
-                                if row.get('STATUS') == 'P':
-                                    presencas_por_dia[dia_int] += 1
-                                    total_presencas += 1
-                                    
-                                    # Contar presenças por aluno
-                                    nome_aluno = row.get('NOME', '')
-                                    if nome_aluno not in presencas_por_aluno:
-                                        presencas_por_aluno[nome_aluno] = 0
-                                    presencas_por_aluno[nome_aluno] += 1
-                                else:
-                                    total_faltas += 1
-                    except Exception as e:
-                        print(f"Erro ao processar linha: {e}")
-                        continue
+        ano = request.args.get('ano', default=datetime.now().year, type=int)
+        if not 2000 <= ano <= 2100:
+            return jsonify({'error': 'Ano inválido'}), 400
         
-        # Ordenar ranking de alunos por presenças
-        ranking_alunos = sorted(presencas_por_aluno.items(), key=lambda x: x[1], reverse=True)
+        # Resumo materializado do mês (leitura pontual, sem varrer o histórico)
+        resumo = academia.resumo_presencas_mes(ano, mes_num)
+        presencas_por_dia = resumo['presencas_por_dia']
         
         # Preparar dados para o gráfico
         for dia in range(1, 32):
@@ -3122,14 +3685,15 @@ def relatorio_mes(mes):
         
         return jsonify({
             'mes': mes,
+            'ano': ano,
             'total_alunos': len(academia.alunos_reais),
             'estatisticas': {
-                'total_presencas': total_presencas,
-                'total_faltas': total_faltas,
-                'dias_com_aula': len(dias_com_aula)
+                'total_presencas': resumo['total_presencas'],
+                'total_faltas': resumo['total_faltas'],
+                'dias_com_aula': resumo['dias_com_aula']
             },
             'presencas_por_dia': presencas_por_dia,
-            'presencas_por_aluno': dict(ranking_alunos[:10])  # Top 10 alunos
+            'presencas_por_aluno': dict(resumo['presencas_por_aluno'])  # Top 10 alunos
         })
         
     except Exception as e:
@@ -3378,16 +3942,9 @@ def excluir_aluno(aluno_id):
         # Obter nome do aluno e dados de frequência antes de excluir
         nome_aluno = aluno_db.get('nome', 'Aluno')
         
-        # Verificar se há registros de presença
-        presenca_dao = PresencaDAO()
-        presencas = presenca_dao.buscar_por_aluno_id(aluno_id)
-        tem_frequencia = len(presencas) > 0
-        registros_frequencia = len(presencas) if tem_frequencia else 0
-        
-        # Excluir registros de presença primeiro (se houver)
-        if tem_frequencia:
-            for presenca in presencas:
-                presenca_dao.excluir(str(presenca['_id']))
+        # Excluir registros de presença primeiro (um único delete_many)
+        registros_frequencia = PresencaDAO().excluir_por_aluno(aluno_id)
+        tem_frequencia = registros_frequencia > 0
         
         # Excluir o aluno
         sucesso = aluno_dao.excluir(aluno_id)
@@ -3452,8 +4009,8 @@ def obter_aluno(aluno_id):
         # Buscar dados de presença usando MongoDB
         dados_presenca = None
         try:
-            # Para MongoDB, usar o id_unico do aluno
-            presencas = db_integration.presenca_dao.buscar_por_aluno_id(aluno_db.get('id_unico'))
+            # Consulta pelo índice (aluno_id, data_presenca) da coleção presencas
+            presencas = db_integration.listar_presencas_db(aluno_id=aluno_db.get('_id'))
             
             if presencas:
                 # Contar presenças e faltas
@@ -3556,17 +4113,7 @@ def recarregar_presenca_informatica():
 def presencas_hoje():
     try:
         data_hoje = datetime.now().strftime('%d/%m/%Y')
-        presencas_hoje = []
-        
-        for nome, dados in academia.dados_presenca.items():
-            for registro in dados['registros']:
-                if registro.get('data') == data_hoje:
-                    presencas_hoje.append({
-                        'nome': nome,
-                        'horario': registro.get('horario', ''),
-                        'atividade': dados.get('atividade', ''),
-                        'status': registro.get('status', 'P')
-                    })
+        presencas_hoje = academia.get_presencas_por_data(data_hoje)
         
         return jsonify({
             'success': True,
@@ -3982,20 +4529,9 @@ def upload_planilha():
 
 def truncar_dados_aluno(dados):
     """Trunca dados do aluno para respeitar limites do banco de dados - TRATAMENTO SEGURO DE NONE"""
-    # Limites baseados no modelo Aluno
-    limites = {
-        'id_unico': 50,
-        'nome': 200,
-        'telefone': 20,
-        'email': 200,
-        'titulo_eleitor': 20,
-        'status_frequencia': 200,
-        'criado_por': 50
-    }
-    
     dados_truncados = dados.copy()
     
-    for campo, limite in limites.items():
+    for campo, limite in LIMITES_CAMPOS_ALUNO.items():
         if campo in dados_truncados and dados_truncados[campo] is not None:
             valor = str(dados_truncados[campo])
             if len(valor) > limite:
@@ -4007,220 +4543,6 @@ def truncar_dados_aluno(dados):
     
     return dados_truncados
 
-def processar_csv_basico(filepath):
-    """Processa CSV básico sem pandas quando a biblioteca não está disponível"""
-    import csv
-    from datetime import datetime
-    
-    try:
-        db_integration = get_db_integration()
-        
-        # Usar atividade padrão "Cadastro Geral" para planilhas de cadastro
-        atividade_nome = "Cadastro Geral"
-        atividade_obj = db_integration.atividade_dao.buscar_por_nome(atividade_nome)
-        if not atividade_obj:
-            # Criar atividade padrão se não existir
-            nova_atividade = {
-                'nome': atividade_nome,
-                'descricao': 'Atividade padrão para cadastros gerais importados via planilha',
-                'ativa': True,
-                'data_criacao': datetime.now().date(),
-                'criado_por': session.get('usuario_logado', 'admin')
-            }
-            atividade_obj = db_integration.atividade_dao.criar(nova_atividade)
-        
-        alunos_processados = 0
-        novos_cadastros = 0
-        atualizados = 0
-        alunos_erros = 0
-        erros_detalhes = []
-        
-        # Tentar diferentes encodings e delimitadores
-        csv_configs = [
-            {'encoding': 'utf-8', 'delimiter': ','},
-            {'encoding': 'utf-8', 'delimiter': ';'},
-            {'encoding': 'latin-1', 'delimiter': ','},
-            {'encoding': 'latin-1', 'delimiter': ';'},
-            {'encoding': 'cp1252', 'delimiter': ','},
-            {'encoding': 'cp1252', 'delimiter': ';'}
-        ]
-        
-        csv_data = None
-        last_error = None
-        
-        for config in csv_configs:
-            try:
-                with open(filepath, 'r', encoding=config['encoding'], newline='') as csvfile:
-                    # Tentar ler com delimitador específico
-                    reader = csv.DictReader(
-                        csvfile, 
-                        delimiter=config['delimiter'],
-                        quoting=csv.QUOTE_MINIMAL,
-                        skipinitialspace=True
-                    )
-                    csv_data = []
-                    line_num = 0
-                    for row in reader:
-                        line_num += 1
-                        try:
-                            # Filtrar linhas vazias ou problemáticas
-                            if any(value.strip() for value in row.values()):
-                                csv_data.append(row)
-                        except Exception as line_error:
-                            print(f"⚠️ Linha {line_num} ignorada: {str(line_error)}")
-                            continue
-                    
-                    if csv_data:
-                        print(f"✅ CSV básico lido com sucesso usando encoding={config['encoding']}, delimiter='{config['delimiter']}'")
-                        print(f"📊 Total de linhas válidas: {len(csv_data)}")
-                        break
-                        
-            except Exception as e:
-                last_error = e
-                print(f"⚠️ Tentativa básica falhou com {config}: {str(e)}")
-                continue
-        
-        if not csv_data:
-            return jsonify({'error': f'Não foi possível ler o arquivo CSV: {str(last_error)}'}), 400
-        
-        # Mapear colunas (case-insensitive)
-        colunas_mapeadas = {
-            'nome': ['nome', 'Name', 'NOME', 'name'],
-            'telefone': ['telefone', 'Telefone', 'TELEFONE', 'phone', 'celular'],
-            'email': ['email', 'Email', 'EMAIL', 'e-mail'],
-            'endereco': ['endereco', 'Endereco', 'ENDERECO', 'endereço', 'address'],
-            'data_nascimento': ['data_nascimento', 'Data Nascimento', 'nascimento', 'birth_date'],
-            'titulo_eleitor': ['titulo_eleitor', 'Titulo Eleitor', 'TITULO_ELEITOR', 'titulo'],
-            'observacoes': ['observacoes', 'Observacoes', 'obs', 'observações']
-        }
-        
-        # Encontrar colunas correspondentes
-        mapeamento_final = {}
-        if csv_data:
-            colunas_csv = list(csv_data[0].keys())
-            print(f"📋 Colunas encontradas na planilha: {colunas_csv}")
-            
-            for campo, possiveis_nomes in colunas_mapeadas.items():
-                for col in colunas_csv:
-                    if col.lower() in [nome.lower() for nome in possiveis_nomes]:
-                        mapeamento_final[campo] = col
-                        break
-            
-            print(f"✅ Colunas mapeadas: {list(mapeamento_final.keys())}")
-            colunas_ignoradas = set(colunas_csv) - set(mapeamento_final.values())
-            if colunas_ignoradas:
-                print(f"⚠️  Colunas ignoradas: {list(colunas_ignoradas)}")
-        
-        # Processar dados
-        for index, row in enumerate(csv_data):
-            try:
-                # Extrair dados da linha
-                nome = str(row.get(mapeamento_final.get('nome', ''), '')).strip()
-                if not nome or nome.lower() in ['', 'nan', 'none']:
-                    continue
-                
-                telefone = str(row.get(mapeamento_final.get('telefone', ''), '')).strip()
-                email = str(row.get(mapeamento_final.get('email', ''), '')).strip()
-                endereco = str(row.get(mapeamento_final.get('endereco', ''), '')).strip()
-                titulo_eleitor = str(row.get(mapeamento_final.get('titulo_eleitor', ''), '')).strip()
-                observacoes = str(row.get(mapeamento_final.get('observacoes', ''), '')).strip()
-                
-                # Truncar dados para respeitar limites do banco
-                dados_aluno = {
-                    'nome': nome,
-                    'telefone': telefone,
-                    'email': email,
-                    'titulo_eleitor': titulo_eleitor,
-                    'id_unico': f'CSV_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{index}'
-                }
-                dados_aluno = truncar_dados_aluno(dados_aluno)
-                
-                nome = dados_aluno['nome']
-                telefone = dados_aluno['telefone']
-                email = dados_aluno['email']
-                titulo_eleitor = dados_aluno['titulo_eleitor']
-                id_unico = dados_aluno['id_unico']
-                
-                # Processar data de nascimento
-                data_nascimento = None
-                if 'data_nascimento' in mapeamento_final:
-                    data_nasc_raw = row.get(mapeamento_final['data_nascimento'], '').strip()
-                    if data_nasc_raw and data_nasc_raw.lower() not in ['', 'nan', 'none']:
-                        try:
-                            data_nascimento = datetime.strptime(data_nasc_raw, '%d/%m/%Y').date()
-                        except:
-                            try:
-                                data_nascimento = datetime.strptime(data_nasc_raw, '%Y-%m-%d').date()
-                            except:
-                                pass
-                
-                # Verificar se aluno já existe
-                aluno_existente = db.query(Aluno).filter(
-                    Aluno.nome == nome,
-                    Aluno.telefone == telefone
-                ).first()
-                
-                if aluno_existente:
-                    # Atualizar aluno existente
-                    if email and email.lower() not in ['', 'nan', 'none']:
-                        aluno_existente.email = email
-                    if endereco and endereco.lower() not in ['', 'nan', 'none']:
-                        aluno_existente.endereco = endereco
-                    if titulo_eleitor and titulo_eleitor.lower() not in ['', 'nan', 'none']:
-                        aluno_existente.titulo_eleitor = titulo_eleitor
-                    if observacoes and observacoes.lower() not in ['', 'nan', 'none']:
-                        aluno_existente.observacoes = observacoes
-                    aluno_existente.atividade_id = atividade_obj.id
-                    aluno_existente.ativo = True
-                    if data_nascimento:
-                        aluno_existente.data_nascimento = data_nascimento
-                    atualizados += 1
-                else:
-                    # Criar novo aluno
-                    novo_aluno = Aluno(
-                        id_unico=id_unico,
-                        nome=nome,
-                        telefone=telefone if telefone and telefone.lower() not in ['', 'nan', 'none'] else None,
-                        email=email if email and email.lower() not in ['', 'nan', 'none'] else None,
-                        endereco=endereco if endereco and endereco.lower() not in ['', 'nan', 'none'] else None,
-                        titulo_eleitor=titulo_eleitor if titulo_eleitor and titulo_eleitor.lower() not in ['', 'nan', 'none'] else None,
-                        data_nascimento=data_nascimento,
-                        data_cadastro=datetime.now().date(),
-                        atividade_id=atividade_obj.id,
-                        observacoes=observacoes if observacoes and observacoes.lower() not in ['', 'nan', 'none'] else None,
-                        ativo=True
-                    )
-                    db.add(novo_aluno)
-                    novos_cadastros += 1
-                
-                alunos_processados += 1
-                
-            except Exception as e:
-                alunos_erros += 1
-                erros_detalhes.append(f'Linha {index + 2}: {str(e)}')
-                continue
-        
-        db.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': f'CSV processado com sucesso! {novos_cadastros} novos cadastros, {atualizados} atualizações',
-            'total_processados': alunos_processados,
-            'novos_cadastros': novos_cadastros,
-            'atualizados': atualizados,
-            'alunos_erros': alunos_erros,
-            'erros_detalhes': erros_detalhes[:10],  # Limitar a 10 erros
-            'colunas_encontradas': list(mapeamento_final.keys()),
-            'total_linhas': len(csv_data),
-            'processamento': 'CSV básico (sem pandas)'
-        })
-        
-    except Exception as e:
-        return jsonify({'error': f'Erro ao processar CSV: {str(e)}'}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
-
 @app.route('/processar_planilha', methods=['POST'])
 @login_obrigatorio
 def processar_planilha():
@@ -4241,306 +4563,29 @@ def processar_planilha():
         if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
             return jsonify({'error': 'Apenas arquivos Excel (.xlsx, .xls) e CSV (.csv) são aceitos'}), 400
         
-        # Salvar arquivo temporariamente
+        # Salvar arquivo temporariamente (nome único: a importação roda depois da resposta)
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"importacao_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{filename}")
         file.save(filepath)
         
-        # Verificar se pandas está disponível
-        if not PANDAS_AVAILABLE:
-            # Se pandas não estiver disponível, usar processamento básico para CSV
-            if file.filename.lower().endswith('.csv'):
-                return processar_csv_basico(filepath)
-            else:
-                return jsonify({'error': 'Biblioteca pandas não instalada. Para Excel: pip install pandas openpyxl. Para CSV, use formato simples.'}), 500
-        
-        # Ler arquivo (Excel ou CSV)
-        try:
-            if file.filename.lower().endswith('.csv'):
-                # Tentar diferentes encodings e configurações para CSV
-                csv_configs = [
-                    {'encoding': 'utf-8', 'sep': ','},
-                    {'encoding': 'utf-8', 'sep': ';'},
-                    {'encoding': 'latin-1', 'sep': ','},
-                    {'encoding': 'latin-1', 'sep': ';'},
-                    {'encoding': 'cp1252', 'sep': ','},
-                    {'encoding': 'cp1252', 'sep': ';'}
-                ]
-                
-                df = None
-                last_error = None
-                
-                for config in csv_configs:
-                    try:
-                        df = pd.read_csv(
-                            filepath, 
-                            encoding=config['encoding'],
-                            sep=config['sep'],
-                            on_bad_lines='skip',  # Pular linhas problemáticas
-                            engine='python',      # Usar engine Python mais flexível
-                            quoting=csv.QUOTE_MINIMAL,
-                            skipinitialspace=True
-                        )
-                        print(f"✅ CSV lido com sucesso usando encoding={config['encoding']}, sep='{config['sep']}'")
-                        break
-                    except Exception as e:
-                        last_error = e
-                        print(f"⚠️ Tentativa falhou com {config}: {str(e)}")
-                        continue
-                
-                if df is None:
-                    return jsonify({'error': f'Erro ao ler arquivo CSV: {str(last_error)}'}), 400
-                    
-            else:
-                df = pd.read_excel(filepath)
-        except Exception as e:
-            return jsonify({'error': f'Erro ao ler arquivo: {str(e)}'}), 400
-        
-        # Mapear colunas comuns - TODOS OS CAMPOS SÃO OPCIONAIS EXCETO NOME
-        colunas_mapeadas = {
-            'nome': ['nome', 'Nome', 'NOME', 'name', 'Name', 'NAME'],
-            'telefone': ['telefone', 'Telefone', 'TELEFONE', 'phone', 'celular', 'Celular', 'CELULAR'],
-            'email': ['email', 'Email', 'EMAIL', 'e-mail', 'E-mail', 'E-MAIL'],
-            'endereco': ['endereco', 'Endereco', 'ENDERECO', 'endereço', 'Endereço', 'ENDEREÇO', 'address', 'Address'],
-            'data_nascimento': ['data_nascimento', 'Data_Nascimento', 'Data Nascimento', 'nascimento', 'Nascimento', 'birth_date', 'Data_Nasc'],
-            'observacoes': ['observacoes', 'Observacoes', 'OBSERVACOES', 'obs', 'Obs', 'observações', 'Observações'],
-            'titulo_eleitor': ['titulo_eleitor', 'Titulo_Eleitor', 'Titulo Eleitor', 'titulo eleitor', 'TITULO_ELEITOR', 'titulo de eleitor', 'CPF', 'cpf'],
-            'atividades': ['atividades', 'Atividades', 'ATIVIDADES', 'atividade', 'Atividade', 'ATIVIDADE', 'activities', 'activity', 'Activity'],
-            'status': ['status', 'Status', 'STATUS', 'situacao', 'Situacao', 'SITUACAO']
-        }
-        
-        # Encontrar colunas correspondentes
-        mapeamento_final = {}
-        for campo, possiveis_nomes in colunas_mapeadas.items():
-            for col in df.columns:
-                if col in possiveis_nomes:
-                    mapeamento_final[campo] = col
-                    break
-        
-        # Log das colunas encontradas e mapeadas
-        print(f"[PROCESSAR_PLANILHA] Colunas encontradas no arquivo: {list(df.columns)}")
-        print(f"[PROCESSAR_PLANILHA] Colunas mapeadas: {mapeamento_final}")
-        colunas_ignoradas = [col for col in df.columns if col not in mapeamento_final.values()]
-        print(f"[PROCESSAR_PLANILHA] Colunas ignoradas: {colunas_ignoradas}")
+        # Verificar se há biblioteca para ler o arquivo (CSV e .xlsx dispensam pandas)
+        if not leitura_disponivel(file.filename):
+            os.remove(filepath)
+            return jsonify({'error': 'Biblioteca pandas não instalada. Para Excel: pip install pandas openpyxl. Para CSV, use formato simples.'}), 500
         
-        # Verificar se pelo menos o campo nome foi encontrado
-        if 'nome' not in mapeamento_final:
-            print("[PROCESSAR_PLANILHA] ERRO: Campo 'nome' não encontrado")
-            return jsonify({
-                'error': 'Campo obrigatório "nome" não encontrado na planilha',
-                'colunas_encontradas': list(df.columns),
-                'colunas_esperadas': colunas_mapeadas['nome']
-            }), 400
-        
-        # Processar dados
-        alunos_processados = 0
-        novos_cadastros = 0
-        atualizados = 0
-        alunos_erros = 0
-        erros_detalhes = []
-        
-        def processar_atividades_aluno(atividades_str, db_integration):
-            """Processa string de atividades e retorna lista de IDs de atividades válidas"""
-            if not atividades_str or atividades_str == 'nan':
-                return []
-            
-            # Separar atividades por vírgula, ponto e vírgula ou pipe
-            separadores = [',', ';', '|']
-            atividades_nomes = [atividades_str]
-            
-            for sep in separadores:
-                if sep in atividades_str:
-                    atividades_nomes = [nome.strip() for nome in atividades_str.split(sep) if nome.strip()]
-                    break
-            
-            atividades_ids = []
-            for nome_atividade in atividades_nomes:
-                nome_atividade = nome_atividade.strip()
-                if not nome_atividade:
-                    continue
-                    
-                # Buscar atividade existente
-                atividade_obj = db_integration.atividade_dao.buscar_por_nome(nome_atividade)
-                
-                if not atividade_obj:
-                    # Criar nova atividade se não existir
-                    try:
-                        nova_atividade = {
-                            'nome': nome_atividade,
-                            'descricao': f'Atividade criada automaticamente via importação de planilha',
-                            'ativa': True,
-                            'data_criacao': datetime.now().date(),
-                            'criado_por': session.get('usuario_logado', 'admin')
-                        }
-                        atividade_obj = db_integration.atividade_dao.criar(nova_atividade)
-                        print(f"[PROCESSAR_PLANILHA] Nova atividade criada: {nome_atividade}")
-                    except Exception as e:
-                        print(f"[PROCESSAR_PLANILHA] Erro ao criar atividade {nome_atividade}: {e}")
-                        continue
-                
-                if atividade_obj and atividade_obj.get('_id'):
-                    atividades_ids.append(atividade_obj.get('_id'))
-            
-            return atividades_ids
+        # Importação em segundo plano: a resposta sai antes do timeout do worker
+        job_id = iniciar_importacao(filepath, filename, criado_por=session.get('usuario_logado', 'admin'))
+        if not job_id:
+            os.remove(filepath)
+            return jsonify({'error': 'Não foi possível iniciar a importação', 'tipo_erro': 'database_error'}), 500
         
-        db_integration = get_db_integration()
-        try:
-            # Preparar atividade padrão para casos sem atividade especificada
-            atividade_padrao_nome = "Cadastro Geral"
-            atividade_padrao_obj = db_integration.atividade_dao.buscar_por_nome(atividade_padrao_nome)
-            if not atividade_padrao_obj:
-                # Criar atividade padrão se não existir
-                nova_atividade_padrao = {
-                    'nome': atividade_padrao_nome,
-                    'descricao': 'Atividade padrão para cadastros gerais importados via planilha',
-                    'ativa': True,
-                    'data_criacao': datetime.now().date(),
-                    'criado_por': session.get('usuario_logado', 'admin')
-                }
-                atividade_padrao_obj = db_integration.atividade_dao.criar(nova_atividade_padrao)
-            
-            for index, row in df.iterrows():
-                try:
-                    # Extrair dados da linha - CAMPOS OPCIONAIS COM VALORES PADRÃO
-                    nome = str(row.get(mapeamento_final.get('nome', ''), '')).strip()
-                    if not nome or nome == 'nan':
-                        continue
-                    
-                    # Campos opcionais com valores padrão seguros
-                    telefone = str(row.get(mapeamento_final.get('telefone', ''), '')).strip()
-                    if telefone == 'nan' or not telefone:
-                        telefone = None
-                    
-                    email = str(row.get(mapeamento_final.get('email', ''), '')).strip()
-                    if email == 'nan' or not email:
-                        email = None
-                    
-                    endereco = str(row.get(mapeamento_final.get('endereco', ''), '')).strip()
-                    if endereco == 'nan' or not endereco:
-                        endereco = None
-                    
-                    observacoes = str(row.get(mapeamento_final.get('observacoes', ''), '')).strip()
-                    if observacoes == 'nan' or not observacoes:
-                        observacoes = f'Importado via planilha em {datetime.now().strftime("%d/%m/%Y")}'
-                    
-                    titulo_eleitor = str(row.get(mapeamento_final.get('titulo_eleitor', ''), '')).strip()
-                    if titulo_eleitor == 'nan' or not titulo_eleitor:
-                        titulo_eleitor = None
-                    
-                    atividades_str = str(row.get(mapeamento_final.get('atividades', ''), '')).strip()
-                    if atividades_str == 'nan' or not atividades_str:
-                        atividades_str = 'Cadastro Geral'
-                    
-                    # Truncar dados para respeitar limites do banco - TRATAMENTO SEGURO DE VALORES NONE
-                    dados_aluno = {
-                        'nome': nome,
-                        'telefone': telefone,
-                        'email': email,
-                        'titulo_eleitor': titulo_eleitor,
-                        'id_unico': f'IMP_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{index}'
-                    }
-                    dados_aluno = truncar_dados_aluno(dados_aluno)
-                    
-                    nome = dados_aluno['nome']
-                    telefone = dados_aluno.get('telefone')
-                    email = dados_aluno.get('email')
-                    titulo_eleitor = dados_aluno.get('titulo_eleitor')
-                    id_unico = dados_aluno['id_unico']
-                    
-                    # Processar data de nascimento
-                    data_nascimento = None
-                    if 'data_nascimento' in mapeamento_final:
-                        data_nasc_raw = row.get(mapeamento_final['data_nascimento'])
-                        if pd.notna(data_nasc_raw):
-                            try:
-                                if isinstance(data_nasc_raw, str):
-                                    data_nascimento = datetime.strptime(data_nasc_raw, '%d/%m/%Y').date()
-                                else:
-                                    data_nascimento = data_nasc_raw.date() if hasattr(data_nasc_raw, 'date') else None
-                            except:
-                                pass
-                    
-                    # Processar atividades do aluno
-                    atividades_ids = processar_atividades_aluno(atividades_str, db_integration)
-                    
-                    # Se não há atividades especificadas, usar atividade padrão
-                    if not atividades_ids and atividade_padrao_obj:
-                        atividades_ids = [atividade_padrao_obj.get('_id')]
-                    
-                    # Verificar se aluno já existe usando MongoDB
-                    aluno_existente = db_integration.aluno_dao.buscar_por_nome_telefone(nome, telefone)
-                    
-                    if aluno_existente:
-                        # Atualizar aluno existente - PRESERVAR DADOS EXISTENTES SE NOVOS FOREM NONE
-                        dados_atualizacao = {
-                            'email': email if email is not None else aluno_existente.get('email'),
-                            'endereco': endereco if endereco is not None else aluno_existente.get('endereco'),
-                            'observacoes': observacoes if observacoes is not None else aluno_existente.get('observacoes'),
-                            'titulo_eleitor': titulo_eleitor if titulo_eleitor is not None else aluno_existente.get('titulo_eleitor'),
-                            'telefone': telefone if telefone is not None else aluno_existente.get('telefone'),
-                            'atividades_ids': atividades_ids,  # Múltiplas atividades
-                            'ativo': True
-                        }
-                        if data_nascimento:
-                            dados_atualizacao['data_nascimento'] = data_nascimento
-                        db_integration.aluno_dao.atualizar(aluno_existente.get('_id'), dados_atualizacao)
-                        atualizados += 1
-                    else:
-                        # Criar novo aluno usando MongoDB - CAMPOS OPCIONAIS SEGUROS
-                        novo_aluno = {
-                            'id_unico': id_unico,
-                            'nome': nome,
-                            'telefone': telefone,
-                            'email': email,
-                            'endereco': endereco,
-                            'titulo_eleitor': titulo_eleitor,
-                            'data_nascimento': data_nascimento,
-                            'data_cadastro': datetime.now().date(),
-                            'atividades_ids': atividades_ids,  # Múltiplas atividades
-                            'observacoes': observacoes,
-                            'ativo': True
-                        }
-                        db_integration.aluno_dao.criar(novo_aluno)
-                        novos_cadastros += 1
-                    
-                    alunos_processados += 1
-                    
-                except Exception as e:
-                    alunos_erros += 1
-                    erro_msg = f'Linha {index + 2}: {str(e)}'
-                    print(f"[PROCESSAR_PLANILHA] ERRO: {erro_msg}")
-                    erros_detalhes.append(erro_msg)
-                    continue
-            
-            print(f"[PROCESSAR_PLANILHA] SUCESSO: {alunos_processados} processados, {novos_cadastros} novos, {atualizados} atualizados, {alunos_erros} erros")
-            
-            return jsonify({
-                'success': True,
-                'message': f'Planilha processada com sucesso! {novos_cadastros} novos cadastros, {atualizados} atualizações',
-                'total_processados': alunos_processados,
-                'novos_cadastros': novos_cadastros,
-                'atualizados': atualizados,
-                'alunos_erros': alunos_erros,
-                'erros_detalhes': erros_detalhes[:10],  # Limitar a 10 erros
-                'colunas_encontradas': list(mapeamento_final.keys()),
-                'colunas_ignoradas': colunas_ignoradas,
-                'total_linhas': len(df)
-            })
-            
-        except Exception as db_error:
-            print(f"[PROCESSAR_PLANILHA] ERRO DE BANCO: {str(db_error)}")
-            return jsonify({
-                'error': f'Erro de banco de dados: {str(db_error)}',
-                'tipo_erro': 'database_error'
-            }), 500
-        finally:
-            pass  # MongoDB não precisa de close manual
-            # Limpar arquivo temporário
-            if filepath and os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except:
-                    pass
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': 'pendente',
+            'status_url': url_for('status_importacao', job_id=job_id),
+            'message': 'Importação iniciada. Acompanhe o progresso pelo status_url.'
+        }), 202
             
     except Exception as e:
         print(f"[PROCESSAR_PLANILHA] ERRO GERAL: {str(e)}")
@@ -4555,6 +4600,20 @@ def processar_planilha():
             'tipo_erro': 'general_error'
         }), 500
 
+@app.route('/importacao/<job_id>')
+@login_obrigatorio
+def status_importacao(job_id):
+    """Progresso de uma importação iniciada em /processar_planilha"""
+    if session.get('usuario_nivel') != 'admin':
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    job = obter_status_importacao(job_id)
+    if not job:
+        return jsonify({'error': 'Importação não encontrada'}), 404
+    
+    job['success'] = job.get('status') not in ('erro', 'interrompido')
+    return jsonify(job)
+
 @app.route('/listar_backups')
 @login_obrigatorio
 def listar_backups():
@@ -4692,6 +4751,31 @@ def gerar_todas_planilhas():
 def health():
     return jsonify({'status': 'ok', 'service': 'Associação Amigo do Povo'})
 
+# Dependências que só devem ser importadas sob demanda (ver perfil_inicializacao.py)
+MODULOS_PESADOS = ('pandas', 'numpy', 'openpyxl')
+
+def memoria_maxima_mb():
+    """Pico de memória residente do processo (None fora do Unix)"""
+    try:
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except ImportError:
+        return None
+
+@app.route('/ready')
+def ready():
+    """Readiness: 200 quando o Sistema Academia já foi carregado, 503 enquanto aquece"""
+    estado = dict(academia.estado)
+    estado['segundos_desde_inicio'] = round(time.perf_counter() - INICIO_APLICACAO, 2)
+    estado['tempo_importacao_segundos'] = TEMPO_IMPORTACAO_APP
+    estado['memoria_maxima_mb'] = memoria_maxima_mb()
+    estado['modulos_pesados'] = [nome for nome in MODULOS_PESADOS if nome in sys.modules]
+    if not estado['pronto']:
+        return jsonify({'status': 'aquecendo', **estado}), 503
+    if estado['erro']:
+        return jsonify({'status': 'erro', **estado}), 503
+    return jsonify({'status': 'ready', **estado})
+
 # Endpoint para executar migrações manualmente em produção
 @app.route('/migrate')
 def migrate():
@@ -4768,13 +4852,10 @@ def gerenciar_atividades():
     """Página de gerenciamento de atividades - Admin/Admin Master"""
     usuario_nome = session.get('usuario_nome', 'Usuário')
     
-    # Atualizar contadores de alunos
+    # Contadores materializados (mantidos pelo AlunoDAO a cada escrita)
+    totais = totais_alunos_por_atividade()
     for nome_atividade, dados_atividade in academia.atividades_cadastradas.items():
-        alunos_atividade = academia.get_alunos_por_atividade(nome_atividade)
-        dados_atividade['total_alunos'] = len(alunos_atividade)
-    
-    # Salvar atualizações
-    academia.salvar_atividades()
+        dados_atividade['total_alunos'] = totais.get(nome_atividade, 0)
     
     # Obter lista de professores para o dropdown
     professores = {login: dados for login, dados in USUARIOS.items() 
@@ -4849,14 +4930,14 @@ def sincronizar_atividades():
                     
                     if sucesso:
                         # Atualizar também na memória (compatibilidade)
-                        aluno['atividade'] = atividade_destino
+                        academia.alterar_atividade_aluno(aluno, atividade_destino)
                         alunos_migrados += 1
                     else:
                         alunos_erros += 1
                         erros_detalhes.append(f"Erro ao atualizar {aluno.get('nome', 'ID:' + str(aluno_id))} no banco")
                 else:
                     # Fallback: atualizar apenas na memória
-                    aluno['atividade'] = atividade_destino
+                    academia.alterar_atividade_aluno(aluno, atividade_destino)
                     alunos_migrados += 1
                     
             except Exception as e:
@@ -4867,10 +4948,10 @@ def sincronizar_atividades():
         if alunos_migrados > 0:
             academia.salvar_dados_reais()
             
-            # Atualizar contadores das atividades
+            # Contadores já ajustados com $inc pelo AlunoDAO.atualizar
+            totais = totais_alunos_por_atividade()
             for nome_atividade, dados_atividade in academia.atividades_cadastradas.items():
-                alunos_atividade = academia.get_alunos_por_atividade(nome_atividade)
-                dados_atividade['total_alunos'] = len(alunos_atividade)
+                dados_atividade['total_alunos'] = totais.get(nome_atividade, 0)
             academia.salvar_atividades()
         
         return jsonify({
@@ -4891,15 +4972,26 @@ def sincronizar_atividades():
 @app.route('/listar_alunos_atividade/<atividade>')
 @apenas_admin_ou_master
 def listar_alunos_atividade(atividade):
-    """Lista alunos de uma atividade específica"""
+    """Lista alunos de uma atividade específica (paginado: pagina, por_pagina, ordenar, ordem, fields)"""
     try:
-        alunos_atividade = academia.get_alunos_por_atividade(atividade)
+        params = obter_parametros_paginacao()
+        campos_banco = ['id_unico', 'nome', 'telefone', 'email', 'turma', 'data_cadastro', 'status_frequencia']
+        if params['campos']:
+            campos_banco = [campo for campo in params['campos'] if campo in campos_banco]
+        alunos_atividade, total = AlunoDAO.listar_paginado(
+            filtro={'atividade': atividade},
+            pagina=params['pagina'],
+            por_pagina=params['por_pagina'],
+            ordenar_por=params['ordenar_por'],
+            ordem=params['ordem'],
+            campos=campos_banco
+        )
         
         # Formatar dados dos alunos
         alunos_formatados = []
         for aluno in alunos_atividade:
             alunos_formatados.append({
-                'id': aluno.get('id') or aluno.get('_id'),
+                'id': str(aluno.get('id') or aluno.get('_id')),
                 'nome': aluno.get('nome', ''),
                 'telefone': aluno.get('telefone', ''),
                 'email': aluno.get('email', ''),
@@ -4908,12 +5000,14 @@ def listar_alunos_atividade(atividade):
                 'status_frequencia': aluno.get('status_frequencia', 'Ativo')
             })
         
-        return jsonify({
+        resposta = {
             'success': True,
             'atividade': atividade,
-            'total_alunos': len(alunos_formatados),
-            'alunos': alunos_formatados
-        })
+            'total_alunos': total,
+            'alunos': projetar_campos(alunos_formatados, params['campos'])
+        }
+        resposta.update(info_paginacao(params, total))
+        return jsonify(resposta)
         
     except Exception as e:
         return jsonify({
@@ -4982,9 +5076,11 @@ def limpar_banco_dados():
         
         # Limpar dados em memória
         academia.alunos_reais.clear()
+        academia.reindexar_alunos()
         academia.atividades_cadastradas.clear()
         academia.turmas_cadastradas.clear()
         academia.dados_presenca.clear()
+        academia.reindexar_presencas()
         
         # Recriar atividades e turmas padrão
         atividades_padrao = {
@@ -5112,23 +5208,14 @@ def dashboard_atividade(nome_atividade):
     data_hoje = datetime.now().strftime('%d/%m/%Y')
     presencas_hoje = []
     
-    for nome, dados in academia.dados_presenca.items():
-        # Verificar se o aluno pertence à atividade
-        aluno_da_atividade = False
-        for aluno in academia.alunos_reais:
-            if aluno['nome'] == nome and aluno.get('atividade') == nome_atividade:
-                aluno_da_atividade = True
-                break
-        
-        if aluno_da_atividade:
-            for registro in dados['registros']:
-                if registro.get('data') == data_hoje and registro.get('status') == 'P':
-                    presencas_hoje.append({
-                        'Nome': nome,
-                        'Horário': registro.get('horario', ''),
-                        'Atividade': nome_atividade,
-                        'Observações': 'Presença registrada'
-                    })
+    nomes_atividade = academia.get_nomes_por_atividade(nome_atividade)
+    for presenca in academia.get_presencas_por_data(data_hoje, status='P', nomes=nomes_atividade):
+        presencas_hoje.append({
+            'Nome': presenca['nome'],
+            'Horário': presenca['horario'],
+            'Atividade': nome_atividade,
+            'Observações': 'Presença registrada'
+        })
     
     return render_template('dashboard_atividade.html', 
                          stats=stats, 
@@ -5349,7 +5436,7 @@ def editar_atividade_route():
                     'nome': nome_novo,
                     'descricao': descricao_nova,
                     'professor': professor,
-                    'total_alunos': len(academia.get_alunos_por_atividade(nome_novo))
+                    'total_alunos': totais_alunos_por_atividade().get(nome_novo, 0)
                 }
             })
         else:
@@ -5366,6 +5453,11 @@ def gerenciar_turmas():
     """Página de gerenciamento de turmas - Admin/Admin Master"""
     usuario_nome = session.get('usuario_nome', 'Usuário')
     
+    # Contadores materializados por (atividade, turma)
+    totais = totais_alunos_por_turma()
+    for turma in academia.turmas_cadastradas.values():
+        turma['total_alunos'] = totais.get((turma.get('atividade', ''), turma.get('nome', '')), 0)
+    
     # Obter lista de professores para o dropdown
     professores = {login: dados for login, dados in USUARIOS.items() 
                   if dados.get('nivel') == 'usuario'}
@@ -5679,19 +5771,12 @@ def ficha_cadastro(aluno_id):
         if not aluno:
             return "Aluno não encontrado", 404
         
-        # Verificar permissão do usuário
-        nivel_usuario = session.get('usuario_nivel', 'usuario')
-        if nivel_usuario == 'usuario':
-            # Professores só podem ver alunos da sua atividade
-            usuario_logado = session.get('usuario_logado')
-            usuario_info = USUARIOS.get(usuario_logado, {})
-            atividades_responsavel = usuario_info.get('atividades_responsavel', [])
-            
-            if aluno.get('atividade') not in atividades_responsavel:
-                return "Você não tem permissão para visualizar este aluno", 403
+        # Verificar permissão do usuário (professores só podem ver alunos da sua atividade)
+        if not pode_acessar_aluno(nome=aluno['nome'], aluno_id=aluno_id):
+            return "Você não tem permissão para visualizar este aluno", 403
         
         # Obter dados de presença do aluno
-        dados_presenca = academia.get_presenca_aluno(aluno['nome'])
+        dados_presenca = academia.obter_frequencia_aluno(aluno)
         
         return render_template('ficha_cadastro.html',
                               aluno=aluno,
@@ -5712,7 +5797,7 @@ def registrar_atividade(usuario, acao, detalhes, tipo_usuario="usuario"):
     """Registra uma atividade no sistema de logs usando MongoDB"""
     try:
         # Registrar no banco de dados MongoDB
-        sucesso = db_integration.registrar_atividade_db(
+        sucesso = db_integration_robusto.registrar_atividade_db(
             usuario=usuario,
             acao=acao,
             detalhes=detalhes,
@@ -6073,6 +6158,8 @@ def status_sistema():
     """Endpoint para verificar status do sistema de banco de dados"""
     try:
         status = db_integration_robusto.get_status_sistema()
+        status['cache_alunos'] = cache_alunos.get_status()
+        status['indice_busca'] = indice_busca_alunos.get_status()
         
         return jsonify({
             'success': True,
@@ -6113,6 +6200,49 @@ def processar_fallback():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/sistema/reconciliar-contadores', methods=['POST'])
+@apenas_admin_master
+def reconciliar_contadores():
+    """Reconstrói os contadores de alunos por atividade/turma a partir da coleção de alunos"""
+    try:
+        resultado = ContadorDAO.reconciliar()
+        
+        return jsonify({
+            'success': resultado.get('success', False),
+            'resultado': resultado,
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+@app.route('/sistema/reconciliar-resumos-presenca', methods=['POST'])
+@apenas_admin_master
+def reconciliar_resumos_presenca():
+    """Reconstrói os resumos mensais de presença (todos, de um ano ou de um mês) a partir da coleção presencas"""
+    try:
+        dados = request.get_json(silent=True) or request.form
+        ano = int(dados.get('ano')) if dados.get('ano') else None
+        mes = int(dados.get('mes')) if dados.get('mes') and ano else None
+        resultado = ResumoPresencaDAO.reconciliar(ano, mes)
+        
+        return jsonify({
+            'success': resultado.get('success', False),
+            'resultado': resultado,
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
 @app.route('/gerenciar_dados_lote')
 @login_obrigatorio
 def gerenciar_dados_lote():
@@ -6258,6 +6388,9 @@ def processar_lote():
             'message': f'Erro interno: {str(e)}'
         }), 500
 
+TEMPO_IMPORTACAO_APP = round(time.perf_counter() - INICIO_APLICACAO, 2)
+print(f"⏱️ Aplicação importada em {TEMPO_IMPORTACAO_APP}s (Sistema Academia carregando em segundo plano)")
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug_mode = os.environ.get('FLASK_ENV') == 'development'
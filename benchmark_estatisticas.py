@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark das estatísticas por atividade (get_estatisticas / dashboard_atividade)
+
+Compara a varredura aninhada antiga (para cada aluno com presença, percorrer
+alunos_reais procurando a atividade) com os índices nome→alunos e
+atividade→nomes do SistemaAcademia.
+
+Uso: python benchmark_estatisticas.py [total_alunos] [total_registros]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime
+
+from app import SistemaAcademia
+
+ATIVIDADES = ['Informática', 'Dança', 'Hidroginástica', 'Funcional', 'Fisioterapia',
+              'Natação', 'Pilates', 'Capoeira', 'Teatro', 'Música']
+
+
+def gerar_dados(total_alunos, total_registros):
+    """Gera alunos e registros de presença sintéticos"""
+    random.seed(42)
+    data_hoje = datetime.now().strftime('%d/%m/%Y')
+    datas = [data_hoje] + [f'{dia:02d}/01/2025' for dia in range(1, 29)]
+
+    alunos = [{
+        'id': str(i),
+        'nome': f'Aluno Benchmark {i:06d}',
+        'telefone': f'62999{i:06d}',
+        'atividade': ATIVIDADES[i % len(ATIVIDADES)],
+        'turma': 'A definir',
+        'status_frequencia': 'Sem dados'
+    } for i in range(total_alunos)]
+
+    dados_presenca = {}
+    for _ in range(total_registros):
+        aluno = alunos[random.randrange(total_alunos)]
+        dados = dados_presenca.setdefault(aluno['nome'], {
+            'atividade': aluno['atividade'],
+            'total_presencas': 0,
+            'total_faltas': 0,
+            'registros': []
+        })
+        status = 'P' if random.random() < 0.8 else 'F'
+        dados['registros'].append({'data': random.choice(datas), 'horario': '08:00', 'status': status})
+        dados['total_presencas' if status == 'P' else 'total_faltas'] += 1
+
+    return alunos, dados_presenca
+
+
+def montar_sistema(alunos, dados_presenca):
+    """Cria um SistemaAcademia sem acessar banco nem arquivos"""
+    sistema = SistemaAcademia.__new__(SistemaAcademia)
+    sistema.alunos_reais = alunos
+    sistema.dados_presenca = dados_presenca
+    sistema.reindexar_alunos()
+    sistema.reindexar_presencas()
+    return sistema
+
+
+def estatisticas_varredura_aninhada(sistema, filtro_atividade):
+    """Implementação anterior: O(alunos com presença × alunos)"""
+    data_hoje = datetime.now().strftime('%d/%m/%Y')
+    presencas_hoje = 0
+    total_registros = 0
+    alunos_com_presenca = 0
+    for nome, dados in sistema.dados_presenca.items():
+        aluno_encontrado = None
+        for aluno in sistema.alunos_reais:
+            if aluno['nome'] == nome and aluno.get('atividade') == filtro_atividade:
+                aluno_encontrado = aluno
+                break
+        if not aluno_encontrado:
+            continue
+        for registro in dados['registros']:
+            if registro.get('data') == data_hoje and registro.get('status') == 'P':
+                presencas_hoje += 1
+        total_registros += len(dados['registros'])
+        alunos_com_presenca += 1
+    return presencas_hoje, total_registros, alunos_com_presenca
+
+
+def medir(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    return (time.perf_counter() - inicio) / repeticoes, resultado
+
+
+def main():
+    total_alunos = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    total_registros = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+
+    print(f"🧪 Gerando {total_alunos} alunos e {total_registros} registros de presença...")
+    alunos, dados_presenca = gerar_dados(total_alunos, total_registros)
+    sistema = montar_sistema(alunos, dados_presenca)
+    atividade = ATIVIDADES[0]
+
+    tempo_antigo, resultado_antigo = medir(lambda: estatisticas_varredura_aninhada(sistema, atividade), 1)
+    tempo_novo, stats = medir(lambda: sistema.get_estatisticas(filtro_atividade=atividade), 20)
+    resultado_novo = (stats['presencas_hoje'], stats['presencas_semana'], stats['alunos_ativos'])
+
+    print(f"\n📊 Filtro de atividade: {atividade}")
+    print(f"   Varredura aninhada: {tempo_antigo * 1000:10.1f} ms")
+    print(f"   Índice por nome:    {tempo_novo * 1000:10.1f} ms")
+    print(f"   Ganho:              {tempo_antigo / tempo_novo:10.0f}x")
+
+    if resultado_antigo == resultado_novo:
+        print(f"✅ Resultados idênticos {resultado_novo}")
+    else:
+        print(f"❌ Resultados divergentes: antigo={resultado_antigo} novo={resultado_novo}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark da normalização de planilhas do /processar_planilha
+
+Compara a extração antiga (df.iterrows() com str().strip(), checagens de
+'nan', truncar_dados_aluno e strptime por linha) com normalizar_planilha(),
+que faz as mesmas transformações por coluna com pandas. Não acessa o banco.
+
+Uso: python benchmark_importacao.py [tamanho ...]   (padrão: 1000 10000 100000)
+"""
+
+import random
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from importacao import LIMITES_CAMPOS_ALUNO, mapear_colunas, normalizar_planilha, linhas_normalizadas
+
+ATIVIDADES = ['Informática', 'Dança', 'Hidroginástica', 'Funcional', 'Natação; Dança', '']
+
+
+def gerar_planilha(total_linhas):
+    """DataFrame sintético com as colunas de uma planilha de cadastro"""
+    random.seed(42)
+    return pd.DataFrame({
+        'Nome': [f'  Aluno Benchmark {i:06d} ' if i % 50 else None for i in range(total_linhas)],
+        'Telefone': [float(62990000000 + i) if i % 7 else None for i in range(total_linhas)],
+        'Email': [f'aluno{i}@email.com' if i % 3 else 'nan' for i in range(total_linhas)],
+        'Endereço': [f'Rua {i % 300}, {i}' for i in range(total_linhas)],
+        'Data Nascimento': [f'{random.randint(1, 28):02d}/{random.randint(1, 12):02d}/{random.randint(1950, 2015)}'
+                            if i % 5 else None for i in range(total_linhas)],
+        'Atividades': [ATIVIDADES[i % len(ATIVIDADES)] for i in range(total_linhas)],
+        'Observações': ['' if i % 4 else 'Observação longa ' * 3 for i in range(total_linhas)]
+    })
+
+
+def truncar(dados):
+    """Cópia do truncar_dados_aluno (sem os prints) usada pela extração antiga"""
+    dados_truncados = dados.copy()
+    for campo, limite in LIMITES_CAMPOS_ALUNO.items():
+        if campo in dados_truncados and dados_truncados[campo] is not None:
+            valor = str(dados_truncados[campo])
+            if len(valor) > limite:
+                dados_truncados[campo] = valor[:limite]
+    return dados_truncados
+
+
+def extracao_por_linha(df, mapeamento):
+    """Implementação anterior: uma iteração Python por linha"""
+    linhas = []
+    for index, row in df.iterrows():
+        nome = str(row.get(mapeamento.get('nome', ''), '')).strip()
+        if not nome or nome == 'nan':
+            continue
+        campos = {}
+        for campo in ('telefone', 'email', 'endereco', 'observacoes', 'titulo_eleitor', 'atividades'):
+            valor = str(row.get(mapeamento.get(campo, ''), '')).strip()
+            campos[campo] = None if valor == 'nan' or not valor else valor
+        dados = truncar({
+            'nome': nome,
+            'telefone': campos['telefone'],
+            'email': campos['email'],
+            'titulo_eleitor': campos['titulo_eleitor'],
+            'id_unico': f'IMP_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{index}'
+        })
+        data_nascimento = None
+        data_nasc_raw = row.get(mapeamento['data_nascimento'])
+        if pd.notna(data_nasc_raw):
+            try:
+                data_nascimento = datetime.strptime(data_nasc_raw, '%d/%m/%Y').date()
+            except Exception:
+                pass
+        dados.update(linha=index + 2, endereco=campos['endereco'], observacoes=campos['observacoes'],
+                     atividades=campos['atividades'] or 'Cadastro Geral', data_nascimento=data_nascimento)
+        linhas.append(dados)
+    return linhas
+
+
+def normalizacao_por_coluna(df, mapeamento):
+    return linhas_normalizadas(normalizar_planilha(df, mapeamento))
+
+
+def medir(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+
+    print(f"{'linhas':>8} | {'por linha (linhas/s)':>21} | {'por coluna (linhas/s)':>22} | ganho")
+    for total_linhas in tamanhos:
+        df = gerar_planilha(total_linhas)
+        mapeamento = mapear_colunas(df.columns)
+
+        tempo_antigo, antigas = medir(extracao_por_linha, df, mapeamento)
+        tempo_novo, novas = medir(normalizacao_por_coluna, df, mapeamento)
+
+        if len(antigas) != len(novas) or [l['linha'] for l in antigas] != [l['linha'] for l in novas]:
+            print(f"❌ Resultados divergentes para {total_linhas} linhas")
+            sys.exit(1)
+
+        print(f"{total_linhas:>8} | {total_linhas / tempo_antigo:>21,.0f} | "
+              f"{total_linhas / tempo_novo:>22,.0f} | {tempo_antigo / tempo_novo:4.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de memória do cadastro em memória (SistemaAcademia.alunos_reais)
+
+Compara a representação antiga (um dict de 11 chaves por aluno, montado como
+em carregar_dados_reais) com RegistroAluno (slots + campos categóricos
+internados). Os documentos são gerados como chegam do MongoDB: cada string é
+um objeto novo, inclusive as repetidas ('A definir', atividade, turma).
+Mede com tracemalloc os bytes que continuam alocados depois que os
+documentos de origem são descartados, ou seja, o custo real por aluno.
+
+Uso: python benchmark_memoria_alunos.py [total_alunos ...]   (padrão: 10000 100000)
+"""
+
+import gc
+import random
+import sys
+import tracemalloc
+
+from registro_aluno import RegistroAluno
+
+ATIVIDADES = ['Informática', 'Dança', 'Hidroginástica', 'Funcional', 'Fisioterapia',
+              'Natação', 'Karatê', 'Capoeira', 'Bombeiro mirim', 'Teatro']
+TURMAS = ['A definir', 'Manhã', 'Tarde', 'Noite', 'Básico', 'Avançado', 'Terceira Idade']
+STATUS = ['Sem dados de presença', 'Sem dados', 'Dados disponíveis', 'Ativo']
+
+
+def _nova(texto):
+    """Cópia independente da string, como a decodificação BSON produz"""
+    return ''.join(list(texto))
+
+
+def gerar_documentos(total_alunos):
+    """Documentos sintéticos no formato da coleção alunos"""
+    random.seed(42)
+    documentos = []
+    for i in range(total_alunos):
+        atividade = ATIVIDADES[i % len(ATIVIDADES)]
+        documentos.append({
+            '_id': f'{i:024x}',
+            'nome': f'ALUNO BENCHMARK {i:06d}',
+            'telefone': f'62 99{i:07d}',
+            'endereco': f'Rua {i % 300}, {i}',
+            'email': f'aluno{i}@email.com' if i % 3 else _nova(''),
+            'data_nascimento': (f'{random.randint(1, 28):02d}/{random.randint(1, 12):02d}/{random.randint(1950, 2015)}'
+                                if i % 5 else _nova('A definir')),
+            'data_cadastro': f'{random.randint(1, 28):02d}/{random.randint(1, 12):02d}/2024',
+            'atividade': _nova(atividade),
+            'turma': _nova(TURMAS[i % len(TURMAS)]),
+            'status_frequencia': _nova(STATUS[i % len(STATUS)] if i % 4 else f'Aguardando dados de {atividade}'),
+            'observacoes': _nova('')
+        })
+    return documentos
+
+
+def aluno_dict(aluno):
+    """Representação anterior de carregar_dados_reais"""
+    return {
+        'id': aluno.get('_id', ''),
+        'nome': aluno.get('nome', ''),
+        'telefone': aluno.get('telefone', ''),
+        'endereco': aluno.get('endereco', ''),
+        'email': aluno.get('email', ''),
+        'data_nascimento': aluno.get('data_nascimento', 'A definir'),
+        'data_cadastro': aluno.get('data_cadastro', 'A definir'),
+        'atividade': aluno.get('atividade', 'A definir'),
+        'turma': aluno.get('turma', 'A definir'),
+        'status_frequencia': aluno.get('status_frequencia', 'Sem dados'),
+        'observacoes': aluno.get('observacoes', '')
+    }
+
+
+def aluno_registro(aluno):
+    return RegistroAluno(aluno_dict(aluno))
+
+
+def medir(total_alunos, montar):
+    """Bytes retidos pelo cadastro montado com `montar`, sem contar os documentos de origem"""
+    gc.collect()
+    tracemalloc.start()
+    documentos = gerar_documentos(total_alunos)
+    cadastro = [montar(aluno) for aluno in documentos]
+    del documentos
+    gc.collect()
+    retido, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retido, cadastro
+
+
+def main():
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+
+    print(f"{'alunos':>8} | {'dict (bytes/aluno)':>19} | {'RegistroAluno (bytes/aluno)':>28} | redução")
+    for total_alunos in tamanhos:
+        bytes_dict, antigos = medir(total_alunos, aluno_dict)
+        del antigos
+        bytes_registro, novos = medir(total_alunos, aluno_registro)
+
+        referencia = [aluno_dict(aluno) for aluno in gerar_documentos(total_alunos)]
+        if [aluno.to_dict() for aluno in novos] != referencia:
+            print(f"❌ Conteúdo divergente para {total_alunos} alunos")
+            sys.exit(1)
+        del novos, referencia
+
+        print(f"{total_alunos:>8} | {bytes_dict / total_alunos:>19,.0f} | "
+              f"{bytes_registro / total_alunos:>28,.0f} | {1 - bytes_registro / bytes_dict:6.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,9 +5,14 @@ Incluindo retry automático, fallback e recuperação de falhas de conexão
 """
 
 import os
+import csv
 import json
 import time
+import hashlib
 import logging
+import random
+import threading
+import uuid
 from datetime import datetime, date
 from typing import List, Dict, Optional, Any, Union
 
@@ -15,9 +20,15 @@ from typing import List, Dict, Optional, Any, Union
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+from pymongo import monitoring, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, ServerSelectionTimeoutError
+
+from fila_gravacao import FilaGravacao, DrenadorFila
+
 try:
+    import models
     from models import (
-        get_db, AlunoDAO, PresencaDAO, AtividadeDAO, TurmaDAO, LogAtividadeDAO, UsuarioDAO
+        get_db, AlunoDAO, PresencaDAO, ResumoPresencaDAO, AtividadeDAO, TurmaDAO, LogAtividadeDAO, UsuarioDAO
     )
 except ImportError as e:
     logger.error(f"Erro ao importar models: {e}")
@@ -27,27 +38,260 @@ class DatabaseConnectionError(Exception):
     """Exceção customizada para erros de conexão com o banco"""
     pass
 
+# Configuração do circuit breaker
+CIRCUITO_LIMITE_FALHAS = int(os.environ.get('CIRCUITO_LIMITE_FALHAS', 3))
+CIRCUITO_TEMPO_ABERTO = float(os.environ.get('CIRCUITO_TEMPO_ABERTO', 30))
+CIRCUITO_INTERVALO_SONDAGEM = float(os.environ.get('CIRCUITO_INTERVALO_SONDAGEM', 10))
+
+# Configuração da política de retry
+RETRY_MAX_TENTATIVAS = int(os.environ.get('RETRY_MAX_TENTATIVAS', 4))
+RETRY_ATRASO_BASE = float(os.environ.get('RETRY_ATRASO_BASE', 0.2))
+RETRY_ATRASO_MAXIMO = float(os.environ.get('RETRY_ATRASO_MAXIMO', 2.0))
+RETRY_PRAZO_TOTAL = float(os.environ.get('RETRY_PRAZO_TOTAL', 8.0))
+
+# Arquivos de presença usados antes da coleção presencas (migrados uma vez)
+ARQUIVOS_PRESENCA_CSV = ('presencas_manuais.csv', 'presencas_detalhadas.csv')
+
+
+class PoliticaRetry:
+    """Backoff exponencial com jitter e prazo total por operação.
+
+    O atraso antes da tentativa n (n >= 1) é sorteado entre 0 e
+    min(atraso_maximo, atraso_base * 2**(n-1)) ("full jitter"), para que as
+    requisições que falharam juntas numa queda do Atlas não voltem todas no
+    mesmo instante. Nenhuma nova tentativa começa se o prazo total da
+    operação já teria estourado ao fim do atraso.
+    """
+
+    def __init__(self, max_tentativas: int = RETRY_MAX_TENTATIVAS,
+                 atraso_base: float = RETRY_ATRASO_BASE,
+                 atraso_maximo: float = RETRY_ATRASO_MAXIMO,
+                 prazo_total: float = RETRY_PRAZO_TOTAL,
+                 jitter: bool = True):
+        self.max_tentativas = max(1, max_tentativas)
+        self.atraso_base = atraso_base
+        self.atraso_maximo = atraso_maximo
+        self.prazo_total = prazo_total
+        self.jitter = jitter
+
+    def atraso(self, tentativa: int) -> float:
+        """Tempo de espera antes da tentativa `tentativa` (a primeira é 0)"""
+        if tentativa <= 0:
+            return 0.0
+        limite = min(self.atraso_maximo, self.atraso_base * (2 ** (tentativa - 1)))
+        return random.uniform(0, limite) if self.jitter else limite
+
+    def pode_repetir(self, tentativa: int, decorrido: float, atraso: float) -> bool:
+        """Indica se cabe mais uma tentativa depois de `tentativa` tentativas"""
+        return tentativa < self.max_tentativas and decorrido + atraso < self.prazo_total
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'max_tentativas': self.max_tentativas,
+            'atraso_base': self.atraso_base,
+            'atraso_maximo': self.atraso_maximo,
+            'prazo_total': self.prazo_total
+        }
+
+
+class CircuitBreaker:
+    """Estado de saúde da conexão com o banco, alimentado pelos resultados reais.
+
+    - fechado: operações passam direto, sem nenhum round trip extra;
+    - aberto: após `limite_falhas` erros de conexão seguidos as operações
+      falham na hora (vão para o fallback) por `tempo_aberto` segundos;
+    - meio_aberto: passado esse tempo, uma única operação de teste é liberada;
+      se der certo o circuito fecha, se falhar volta a abrir.
+
+    Enquanto o circuito não está fechado, uma thread em segundo plano executa
+    `sonda` (um ping) a cada `intervalo_sondagem` segundos e fecha o circuito
+    assim que o banco responde, sem depender do tráfego das requisições.
+    """
+
+    FECHADO = 'fechado'
+    ABERTO = 'aberto'
+    MEIO_ABERTO = 'meio_aberto'
+
+    def __init__(self, limite_falhas: int = CIRCUITO_LIMITE_FALHAS,
+                 tempo_aberto: float = CIRCUITO_TEMPO_ABERTO,
+                 intervalo_sondagem: float = CIRCUITO_INTERVALO_SONDAGEM,
+                 sonda=None):
+        self.limite_falhas = max(1, limite_falhas)
+        self.tempo_aberto = tempo_aberto
+        self.intervalo_sondagem = intervalo_sondagem
+        self.sonda = sonda
+        self.estado = self.FECHADO
+        self.falhas_consecutivas = 0
+        self.aberto_em = None
+        self.ultimo_erro = None
+        self.total_aberturas = 0
+        self.rejeitadas = 0
+        self._teste_em_andamento = False
+        self._sondando = False
+        self._lock = threading.Lock()
+        self.ao_fechar = []  # callbacks chamados quando o circuito volta a fechar
+
+    def permitir(self) -> bool:
+        """Indica se uma operação pode ir ao banco agora"""
+        if self.estado == self.FECHADO:
+            return True
+        with self._lock:
+            if self.estado == self.ABERTO and time.monotonic() - self.aberto_em >= self.tempo_aberto:
+                self.estado = self.MEIO_ABERTO
+                logger.info("🟡 Circuito meio-aberto: liberando uma operação de teste")
+            if self.estado == self.MEIO_ABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+            if self.estado == self.FECHADO:
+                return True
+            self.rejeitadas += 1
+            return False
+
+    def registrar_sucesso(self):
+        """Registra uma operação bem-sucedida (fecha o circuito se necessário)"""
+        if self.estado == self.FECHADO and not self.falhas_consecutivas:
+            return
+        with self._lock:
+            self.falhas_consecutivas = 0
+            self._teste_em_andamento = False
+            fechou = self.estado != self.FECHADO
+            if fechou:
+                self.estado = self.FECHADO
+                self.aberto_em = None
+                logger.info("🟢 Circuito fechado: conexão com o banco restabelecida")
+        if fechou:
+            for callback in self.ao_fechar:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Erro no callback de fechamento do circuito: {e}")
+
+    def registrar_falha(self, erro: Optional[Exception] = None):
+        """Registra um erro de conexão (abre o circuito ao atingir o limite)"""
+        with self._lock:
+            self.falhas_consecutivas += 1
+            self._teste_em_andamento = False
+            self.ultimo_erro = str(erro) if erro is not None else self.ultimo_erro
+            if self.estado == self.MEIO_ABERTO or (
+                    self.estado == self.FECHADO and self.falhas_consecutivas >= self.limite_falhas):
+                self._abrir()
+            elif self.estado == self.ABERTO:
+                self.aberto_em = time.monotonic()
+
+    def forcar_abertura(self, motivo: str):
+        """Abre o circuito imediatamente (ex.: monitor do driver sem servidor disponível)"""
+        with self._lock:
+            self.ultimo_erro = motivo
+            if self.estado != self.ABERTO:
+                self._abrir()
+
+    def _abrir(self):
+        self.estado = self.ABERTO
+        self.aberto_em = time.monotonic()
+        self.total_aberturas += 1
+        logger.warning(f"🔴 Circuito aberto: banco indisponível ({self.ultimo_erro})")
+        if self.sonda is not None and not self._sondando:
+            self._sondando = True
+            threading.Thread(target=self._sondar, name='circuit-breaker-sonda', daemon=True).start()
+
+    def _sondar(self):
+        """Thread em segundo plano: pinga o banco até o circuito fechar"""
+        while True:
+            time.sleep(self.intervalo_sondagem)
+            if self.estado != self.FECHADO:
+                try:
+                    if self.sonda():
+                        self.registrar_sucesso()
+                except Exception as e:
+                    self.ultimo_erro = str(e)
+            with self._lock:
+                if self.estado == self.FECHADO:
+                    self._sondando = False
+                    return
+
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado do circuito para monitoramento"""
+        return {
+            'estado': self.estado,
+            'falhas_consecutivas': self.falhas_consecutivas,
+            'aberto_ha_segundos': round(time.monotonic() - self.aberto_em, 1) if self.aberto_em else None,
+            'total_aberturas': self.total_aberturas,
+            'operacoes_rejeitadas': self.rejeitadas,
+            'ultimo_erro': self.ultimo_erro
+        }
+
+
+class MonitorTopologia(monitoring.TopologyListener):
+    """Repassa ao circuit breaker as mudanças de topologia vistas pelo driver.
+
+    O pymongo já faz heartbeats próprios em segundo plano; quando o cluster
+    deixa de ter um servidor gravável o circuito abre sem esperar que as
+    requisições falhem, e quando volta a ter o circuito fecha.
+    """
+
+    def __init__(self):
+        self.circuit_breakers = []
+
+    def opened(self, event):
+        pass
+
+    def description_changed(self, event):
+        antes = event.previous_description.has_writable_server()
+        depois = event.new_description.has_writable_server()
+        for circuit_breaker in self.circuit_breakers:
+            if antes and not depois:
+                circuit_breaker.forcar_abertura('driver sem servidor gravável disponível')
+            elif depois and not antes and circuit_breaker.estado != CircuitBreaker.FECHADO:
+                circuit_breaker.registrar_sucesso()
+
+    def closed(self, event):
+        pass
+
+
+# Registrado antes da criação do MongoClient (get_db) para valer para ele
+monitor_topologia = MonitorTopologia()
+monitoring.register(monitor_topologia)
+
 class DatabaseIntegrationRobusto:
     """
     Versão robusta da integração com banco de dados
     Inclui tratamento avançado de erros, retry automático e fallback
     """
     
-    def __init__(self, max_retries: int = 3, retry_delay: float = 1.0):
+    def __init__(self, max_retries: int = RETRY_MAX_TENTATIVAS - 1, retry_delay: float = RETRY_ATRASO_BASE,
+                 prazo_total: float = RETRY_PRAZO_TOTAL):
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.politica_retry = PoliticaRetry(max_tentativas=max_retries + 1, atraso_base=retry_delay,
+                                            prazo_total=prazo_total)
+        self.metricas_retry = {}
+        self._lock_metricas = threading.Lock()
         self.db = None
         self.fallback_file = 'cadastros_fallback.json'
+        self.circuit_breaker = CircuitBreaker(sonda=self._test_connection)
+        monitor_topologia.circuit_breakers.append(self.circuit_breaker)
+        
+        # Fila durável para gravações feitas com o banco fora do ar
+        self.fila = FilaGravacao()
+        self.drenador = DrenadorFila(self.fila, self._aplicadores_fila(), self._pode_drenar)
+        self.circuit_breaker.ao_fechar.append(self.drenador.acordar)
         
         # Inicializar DAOs (são classes estáticas)
         self.aluno_dao = AlunoDAO
         self.atividade_dao = AtividadeDAO
         self.turma_dao = TurmaDAO
         self.presenca_dao = PresencaDAO
+        self.resumo_presenca_dao = ResumoPresencaDAO
         self.log_atividade_dao = LogAtividadeDAO
         self.usuario_dao = UsuarioDAO
         
         self._init_connection()
+        if self.db is not None:
+            try:
+                self._migrar_fallback_legado()
+            except Exception as e:
+                logger.error(f"Erro ao migrar {self.fallback_file}: {e}")
+            self.drenador.garantir_execucao()
     
     def _init_connection(self):
         """Inicializa a conexão com o banco de dados e os DAOs"""
@@ -74,6 +318,7 @@ class DatabaseIntegrationRobusto:
             self.atividade_dao = AtividadeDAO
             self.turma_dao = TurmaDAO
             self.presenca_dao = PresencaDAO
+            self.resumo_presenca_dao = ResumoPresencaDAO
             self.log_atividade_dao = LogAtividadeDAO()
             self.usuario_dao = UsuarioDAO
             
@@ -90,12 +335,17 @@ class DatabaseIntegrationRobusto:
             self.atividade_dao = AtividadeDAO
             self.turma_dao = TurmaDAO
             self.presenca_dao = PresencaDAO
+            self.resumo_presenca_dao = ResumoPresencaDAO
             self.log_atividade_dao = LogAtividadeDAO()
             self.usuario_dao = UsuarioDAO
             logger.info("✅ DAOs inicializados em modo fallback após erro")
     
+    def _usando_memoria(self) -> bool:
+        """Sem MongoDB: conexão não configurada ou fallback em memória ativado (MONGO_FALLBACK_MEMORIA/init_mongodb)"""
+        return self.db is None or models.USE_MEMORY_FALLBACK
+    
     def _test_connection(self) -> bool:
-        """Testa se a conexão com o banco está ativa"""
+        """Testa se a conexão com o banco está ativa (ping; usado pela sonda do circuit breaker)"""
         try:
             if self.db is None:
                 return False
@@ -132,6 +382,7 @@ class DatabaseIntegrationRobusto:
             self.atividade_dao = AtividadeDAO
             self.turma_dao = TurmaDAO
             self.presenca_dao = PresencaDAO
+            self.resumo_presenca_dao = ResumoPresencaDAO
             self.log_atividade_dao = LogAtividadeDAO
             self.usuario_dao = UsuarioDAO
             
@@ -155,104 +406,434 @@ class DatabaseIntegrationRobusto:
             self.atividade_dao = AtividadeDAO
             self.turma_dao = TurmaDAO
             self.presenca_dao = PresencaDAO
+            self.resumo_presenca_dao = ResumoPresencaDAO
             self.log_atividade_dao = LogAtividadeDAO
             self.usuario_dao = UsuarioDAO
             return False
     
     def _is_connection_error(self, error: Exception) -> bool:
         """Verifica se o erro é relacionado à conexão"""
-        error_str = str(error).lower()
-        connection_errors = [
-            'connection refused',
-            'connection reset',
-            'connection lost',
-            'server closed the connection',
-            'connection timeout',
-            'connection broken',
-            'no connection to the server',
-            'connection terminated',
-            'connection aborted',
-            'não foi possível reconectar',
-            'database connection error',
-            'could not connect',
-            'connection failed',
-            'database is not available',
-            'mongodb connection',
-            'dns query name does not exist',
-            'serverselectiontimeouterror'
-        ]
-        
-        return any(err in error_str for err in connection_errors)
+        # ConnectionFailure cobre AutoReconnect, NetworkTimeout e ServerSelectionTimeoutError
+        if isinstance(error, ConnectionFailure):
+            return True
+        if isinstance(error, DatabaseConnectionError):
+            error_str = str(error).lower()
+            return any(err in error_str for err in ('circuito aberto', 'conexão perdida'))
+        return False
     
     def _save_to_fallback(self, dados_aluno: Dict[str, Any]) -> str:
-        """Salva dados no arquivo de fallback quando o banco está indisponível"""
+        """Enfileira o cadastro na fila durável quando o banco está indisponível"""
         try:
-            # Adicionar timestamp e ID único
-            fallback_data = {
-                **dados_aluno,
-                'fallback_timestamp': datetime.now().isoformat(),
-                'fallback_id': f"fallback_{int(time.time())}_{hash(dados_aluno.get('nome', ''))}",
-                'status': 'pending_database_save'
-            }
-            
-            # Carregar dados existentes do fallback
-            fallback_records = []
-            if os.path.exists(self.fallback_file):
-                try:
-                    with open(self.fallback_file, 'r', encoding='utf-8') as f:
-                        fallback_records = json.load(f)
-                except:
-                    fallback_records = []
-            
-            # Adicionar novo registro
-            fallback_records.append(fallback_data)
-            
-            # Salvar de volta
-            with open(self.fallback_file, 'w', encoding='utf-8') as f:
-                json.dump(fallback_records, f, ensure_ascii=False, indent=2, default=str)
-            
-            logger.info(f"💾 Dados salvos no fallback: {self.fallback_file}")
-            return fallback_data['fallback_id']
-            
+            fallback_id = self.fila.registrar('aluno', dados_aluno)
+            self.drenador.garantir_execucao()
+            return fallback_id
         except Exception as e:
             logger.error(f"❌ Erro ao salvar no fallback: {e}")
             raise
     
-    def _execute_with_retry(self, operation_func, *args, **kwargs):
-        """Executa uma operação com retry automático"""
+    def _gravar_ou_enfileirar(self, tipo: str, colecao: str, documento: Dict[str, Any]) -> Optional[str]:
+        """Grava um documento com chave `id_fila` ou, com o banco fora, enfileira.
+
+        Retorna 'database', 'fila' ou None (erro que não é de conexão).
+        """
+        documento.setdefault('id_fila', uuid.uuid4().hex)
+        if self.circuit_breaker.permitir():
+            try:
+                resultado = self.db[colecao].update_one({'id_fila': documento['id_fila']},
+                                                        {'$setOnInsert': documento}, upsert=True)
+                self.circuit_breaker.registrar_sucesso()
+                if resultado.upserted_id is not None:
+                    self._apos_inserir(colecao, [documento])
+                return 'database'
+            except Exception as e:
+                if not self._is_connection_error(e):
+                    self.circuit_breaker.registrar_sucesso()
+                    logger.error(f"Erro ao gravar {tipo}: {e}")
+                    return None
+                self.circuit_breaker.registrar_falha(e)
+        try:
+            self.fila.registrar(tipo, documento)
+            self.drenador.garantir_execucao()
+            return 'fila'
+        except Exception as e:
+            logger.error(f"❌ Erro ao enfileirar {tipo}: {e}")
+            return None
+    
+    # ------------------------------------------------------------------
+    # Reaplicação da fila (idempotente: id_unico para alunos, id_fila nos demais)
+    # ------------------------------------------------------------------
+    def _aplicadores_fila(self) -> Dict[str, Any]:
+        return {
+            'aluno': self._aplicar_alunos_fila,
+            'presenca': lambda entradas: self._aplicar_upserts_fila('presencas', entradas),
+            'log': lambda entradas: self._aplicar_upserts_fila('logs_atividades', entradas)
+        }
+    
+    def _pode_drenar(self) -> bool:
+        return not self._usando_memoria() and self.circuit_breaker.estado == CircuitBreaker.FECHADO
+    
+    def _apos_inserir(self, colecao: str, documentos: List[Dict[str, Any]]):
+        """Mantém os dados derivados de documentos efetivamente inseridos (não os já existentes)"""
+        if colecao == 'presencas' and documentos:
+            self.resumo_presenca_dao.registrar_mudanca(depois=documentos)
+    
+    def _aplicar_upserts_fila(self, colecao: str, entradas: List[Dict[str, Any]]):
+        """Reaplica presenças/logs enfileirados num único bulk_write"""
+        operacoes = [UpdateOne({'id_fila': entrada['dados']['id_fila']},
+                               {'$setOnInsert': entrada['dados']}, upsert=True)
+                     for entrada in entradas]
+        try:
+            resultado = self.db[colecao].bulk_write(operacoes, ordered=False)
+            self._apos_inserir(colecao, [entradas[indice]['dados'] for indice in resultado.upserted_ids])
+        except BulkWriteError as e:
+            self._apos_inserir(colecao, [entradas[item['index']]['dados'] for item in e.details.get('upserted', [])])
+            raise
+        except Exception as e:
+            if self._is_connection_error(e):
+                self.circuit_breaker.registrar_falha(e)
+            raise
+    
+    def _aplicar_alunos_fila(self, entradas: List[Dict[str, Any]]):
+        """Reaplica cadastros enfileirados com AlunoDAO.gravar_lote (um bulk_write)"""
+        cadastros = [entrada['dados'] for entrada in entradas]
+        atividades = self.atividade_dao.listar_todas() if any(d.get('atividade') for d in cadastros) else []
+        turmas = self.turma_dao.listar_todas() if any(d.get('turma') for d in cadastros) else []
+        
+        # Cadastros já gravados (ex.: checkpoint perdido num restart) não são repetidos
+        ids_unicos = [d['id_unico'] for d in cadastros]
+        existentes = {a['id_unico'] for a in self.db.alunos.find({'id_unico': {'$in': ids_unicos}}, {'id_unico': 1})}
+        documentos = [self._montar_documento_aluno(d, d['id_unico'], atividades, turmas)
+                      for d in cadastros if d['id_unico'] not in existentes]
+        if not documentos:
+            return
+        
+        resultado = self.aluno_dao.gravar_lote(documentos, {})
+        falhas_gerais = [mensagem for indice, mensagem in resultado['erros'] if indice is None]
+        if falhas_gerais:
+            erro = DatabaseConnectionError(f"Falha ao reaplicar cadastros: {falhas_gerais[0]}")
+            if self._is_connection_error(resultado.get('excecao')):
+                self.circuit_breaker.registrar_falha(erro)
+            raise erro
+        for indice, mensagem in resultado['erros']:
+            if 'E11000' not in mensagem:
+                logger.error(f"❌ Cadastro da fila descartado ({documentos[indice].get('nome')}): {mensagem}")
+    
+    def _migrar_fallback_legado(self) -> int:
+        """Move os pendentes do antigo cadastros_fallback.json para a fila durável"""
+        if not os.path.exists(self.fallback_file):
+            return 0
+        # O rename é atômico: só um worker migra o arquivo
+        migrando = f"{self.fallback_file}.migrando.{os.getpid()}"
+        try:
+            os.rename(self.fallback_file, migrando)
+        except OSError:
+            return 0
+        try:
+            with open(migrando, 'r', encoding='utf-8') as f:
+                fallback_records = json.load(f)
+        except Exception as e:
+            logger.error(f"Erro ao ler arquivo de fallback: {e}")
+            os.rename(migrando, self.fallback_file)
+            return 0
+        
+        migrados = 0
+        for record in fallback_records:
+            if record.get('status') != 'pending_database_save':
+                continue
+            dados = {k: v for k, v in record.items() if not k.startswith('fallback_') and k != 'status'}
+            dados.setdefault('id_unico', str(uuid.uuid4())[:8])
+            self.fila.registrar('aluno', dados)
+            migrados += 1
+        os.remove(migrando)
+        logger.info(f"📁 {migrados} registro(s) do {self.fallback_file} migrados para a fila de gravação")
+        return migrados
+    
+    def migrar_presencas_csv(self, arquivos=ARQUIVOS_PRESENCA_CSV, completar_antigos: bool = False) -> Dict[str, int]:
+        """Importa o histórico dos antigos CSVs de presença para a coleção presencas.
+
+        Roda uma vez: o arquivo é renomeado atomicamente (só um worker migra) e
+        termina como <arquivo>.migrado. Linhas de um aluno num dia que já tem
+        registro no banco são ignoradas (as presenças manuais já iam para o
+        banco além do CSV); as demais são gravadas com upsert por um id_fila
+        derivado da linha, então uma migração interrompida pode ser repetida.
+        Quando algum arquivo é migrado (ou com completar_antigos), também
+        preenche nome_aluno/atividade nos registros antigos do banco; sem
+        arquivos a migrar, o boot não faz nenhuma consulta.
+        """
+        resultado = {'arquivos': 0, 'migrados': 0, 'ja_existentes': 0, 'sem_aluno': 0, 'invalidos': 0, 'completados': 0}
+        if self._usando_memoria():
+            return resultado
+        try:
+            for arquivo in arquivos:
+                if not os.path.exists(arquivo):
+                    continue
+                migrando = f"{arquivo}.migrando.{os.getpid()}"
+                try:
+                    os.rename(arquivo, migrando)
+                except OSError:
+                    continue
+                try:
+                    with open(migrando, 'r', encoding='utf-8', newline='') as f:
+                        linhas = list(csv.DictReader(f))
+                    documentos = self._documentos_presenca_csv(linhas, resultado)
+                    for inicio in range(0, len(documentos), 1000):
+                        bloco = documentos[inicio:inicio + 1000]
+                        gravados = self.db.presencas.bulk_write(
+                            [UpdateOne({'id_fila': documento['id_fila']}, {'$setOnInsert': documento}, upsert=True)
+                             for documento in bloco],
+                            ordered=False
+                        )
+                        self._apos_inserir('presencas', [bloco[indice] for indice in gravados.upserted_ids])
+                except Exception as e:
+                    logger.error(f"Erro ao migrar {arquivo}: {e}")
+                    os.rename(migrando, arquivo)
+                    continue
+                os.replace(migrando, f"{arquivo}.migrado")
+                resultado['arquivos'] += 1
+                resultado['migrados'] += len(documentos)
+                logger.info(f"📁 {len(documentos)} presença(s) de {arquivo} migradas para a coleção presencas")
+            if resultado['arquivos'] or completar_antigos:
+                resultado['completados'] = self._completar_presencas_sem_nome()
+        except Exception as e:
+            logger.error(f"Erro na migração das presenças em CSV: {e}")
+        return resultado
+    
+    def _documentos_presenca_csv(self, linhas: List[Dict[str, str]], resultado: Dict[str, int]) -> List[Dict[str, Any]]:
+        """Converte as linhas dos CSVs de presença em documentos da coleção presencas"""
+        nomes = list({(linha.get('NOME') or '').strip() for linha in linhas} - {''})
+        alunos_por_nome = {}
+        for aluno in self.db.alunos.find({'nome': {'$in': nomes}}, {'nome': 1, 'atividade': 1}):
+            alunos_por_nome.setdefault(aluno['nome'], aluno)
+        
+        candidatos = []
+        for linha in linhas:
+            nome = (linha.get('NOME') or '').strip()
+            try:
+                data_presenca = datetime.strptime((linha.get('DATA') or '').strip(), '%d/%m/%Y')
+            except ValueError:
+                resultado['invalidos'] += 1
+                continue
+            if not nome:
+                resultado['invalidos'] += 1
+                continue
+            aluno = alunos_por_nome.get(nome)
+            if aluno is None:
+                resultado['sem_aluno'] += 1
+            campos = [nome, linha.get('DATA', ''), linha.get('HORARIO', ''), linha.get('TURMA', ''), linha.get('STATUS', '')]
+            candidatos.append({
+                'id_fila': 'csv_' + hashlib.sha1('|'.join(campos).encode('utf-8')).hexdigest(),
+                'aluno_id': aluno['_id'] if aluno else None,
+                'nome_aluno': nome,
+                'atividade': (aluno or {}).get('atividade') or linha.get('ATIVIDADE', ''),
+                'data_presenca': data_presenca,
+                'horario': linha.get('HORARIO', ''),
+                'turma': linha.get('TURMA') or None,
+                'status': (linha.get('STATUS') or 'P').strip().upper(),
+                'observacoes': linha.get('OBSERVACOES', ''),
+                'origem': 'csv',
+                'registrado_por': 'migracao_csv',
+                'data_registro': datetime.now()
+            })
+        
+        # Um registro por aluno e dia, como na marcação: descartar o que o banco já tem
+        ids = list({documento['aluno_id'] for documento in candidatos if documento['aluno_id'] is not None})
+        datas = list({documento['data_presenca'] for documento in candidatos})
+        existentes = {(str(presenca.get('aluno_id')), presenca.get('data_presenca'))
+                      for presenca in self.db.presencas.find(
+                          {'aluno_id': {'$in': ids}, 'data_presenca': {'$in': datas}},
+                          {'aluno_id': 1, 'data_presenca': 1})} if ids else set()
+        documentos = []
+        for documento in candidatos:
+            chave = (str(documento['aluno_id']) if documento['aluno_id'] is not None else documento['nome_aluno'],
+                     documento['data_presenca'])
+            if chave in existentes:
+                resultado['ja_existentes'] += 1
+                continue
+            existentes.add(chave)
+            documentos.append(documento)
+        return documentos
+    
+    def _completar_presencas_sem_nome(self) -> int:
+        """Preenche nome_aluno/atividade dos registros gravados antes desses campos existirem"""
+        # Os campos que compõem os resumos, para mover as presenças de atividade
+        antigos = list(self.db.presencas.find({'nome_aluno': {'$exists': False}, 'aluno_id': {'$ne': None}},
+                                              {'aluno_id': 1, 'atividade': 1, 'turma': 1,
+                                               'data_presenca': 1, 'status': 1}))
+        if not antigos:
+            return 0
+        alunos = {aluno['_id']: aluno for aluno in self.db.alunos.find(
+            {'_id': {'$in': list({presenca['aluno_id'] for presenca in antigos})}}, {'nome': 1, 'atividade': 1})}
+        antes, depois, operacoes = [], [], []
+        for presenca in antigos:
+            aluno = alunos.get(presenca['aluno_id'])
+            if aluno is None:
+                continue
+            campos = {'nome_aluno': aluno.get('nome', ''), 'atividade': aluno.get('atividade', '')}
+            operacoes.append(UpdateOne({'_id': presenca['_id']}, {'$set': campos}))
+            antes.append(presenca)
+            depois.append(dict(presenca, **campos))
+        if operacoes:
+            self.db.presencas.bulk_write(operacoes, ordered=False)
+            self.resumo_presenca_dao.registrar_mudanca(antes=antes, depois=depois)
+        return len(operacoes)
+    
+    def _registrar_metrica(self, operacao: str, **incrementos):
+        """Acumula as métricas de retry de uma operação"""
+        with self._lock_metricas:
+            metricas = self.metricas_retry.setdefault(operacao, {
+                'chamadas': 0, 'retries': 0, 'sucesso_apos_retry': 0,
+                'falhas': 0, 'prazo_esgotado': 0, 'nao_idempotente': 0
+            })
+            for campo, valor in incrementos.items():
+                metricas[campo] += valor
+    
+    def _pode_repetir_erro(self, error: Exception, idempotente: bool) -> bool:
+        """Só repete erros de conexão; escritas não idempotentes apenas se nunca chegaram ao servidor"""
+        if not self._is_connection_error(error):
+            return False
+        if idempotente:
+            return True
+        # Sem servidor selecionado (ou circuito aberto) a operação não foi enviada
+        return isinstance(error, (ServerSelectionTimeoutError, DatabaseConnectionError))
+    
+    def _execute_with_retry(self, operation_func, *args, idempotente: bool = True,
+                            operacao: Optional[str] = None, **kwargs):
+        """Executa uma operação com retry (backoff exponencial com jitter e prazo total).
+
+        Escritas só devem ser marcadas como `idempotente` quando tiverem uma
+        chave de deduplicação (ex.: id_unico gerado uma única vez); caso
+        contrário, um erro de conexão após o envio não é repetido.
+        """
+        politica = self.politica_retry
+        operacao = operacao or getattr(operation_func, '__name__', 'operacao')
+        inicio = time.monotonic()
         last_error = None
+        tentativa = 0
+        self._registrar_metrica(operacao, chamadas=1)
         
-        for attempt in range(self.max_retries + 1):
+        while True:
+            # Sem ping prévio: o circuit breaker decide com base nos resultados anteriores
+            usar_banco = not self._usando_memoria()
+            tentativa += 1
             try:
-                # Verificar conexão antes da operação
-                if not self._test_connection():
-                    logger.warning(f"Conexão perdida, tentando reconectar (tentativa {attempt + 1})")
-                    if not self._reconnect():
-                        raise DatabaseConnectionError("Não foi possível reconectar com o banco")
+                if usar_banco and not self.circuit_breaker.permitir():
+                    raise DatabaseConnectionError("Circuito aberto: banco indisponível, usando fallback")
                 
                 # Executar operação
-                return operation_func(*args, **kwargs)
+                resultado = operation_func(*args, **kwargs)
+                if usar_banco:
+                    self.circuit_breaker.registrar_sucesso()
+                if tentativa > 1:
+                    self._registrar_metrica(operacao, sucesso_apos_retry=1)
+                return resultado
                 
             except Exception as e:
                 last_error = e
-                logger.warning(f"Tentativa {attempt + 1} falhou: {e}")
+                logger.warning(f"[{operacao}] Tentativa {tentativa} falhou: {e}")
                 
-                # Se é erro de conexão e ainda há tentativas, tentar reconectar
-                if self._is_connection_error(e) and attempt < self.max_retries:
-                    logger.info(f"Erro de conexão detectado, aguardando {self.retry_delay}s antes da próxima tentativa")
-                    time.sleep(self.retry_delay)
-                    
-                    # Tentar reconectar
-                    if self._reconnect():
-                        continue
+                if usar_banco and not isinstance(e, DatabaseConnectionError):
+                    if self._is_connection_error(e):
+                        self.circuit_breaker.registrar_falha(e)
+                    else:
+                        # O banco respondeu (ex.: erro de validação): a conexão está saudável
+                        self.circuit_breaker.registrar_sucesso()
                 
-                # Se não é erro de conexão ou esgotaram as tentativas, re-raise
-                if attempt == self.max_retries:
+                if not self._pode_repetir_erro(e, idempotente):
+                    if self._is_connection_error(e) and not idempotente:
+                        self._registrar_metrica(operacao, nao_idempotente=1)
                     break
+                if usar_banco and self.circuit_breaker.estado == CircuitBreaker.ABERTO:
+                    break  # falhar rápido para o fallback
+                
+                atraso = politica.atraso(tentativa)
+                if not politica.pode_repetir(tentativa, time.monotonic() - inicio, atraso):
+                    if tentativa < politica.max_tentativas:
+                        self._registrar_metrica(operacao, prazo_esgotado=1)
+                    break
+                
+                # O driver reconecta sozinho; basta aguardar e tentar de novo
+                self._registrar_metrica(operacao, retries=1)
+                logger.info(f"[{operacao}] Erro de conexão, nova tentativa em {atraso:.2f}s")
+                time.sleep(atraso)
         
-        # Se chegou aqui, todas as tentativas falharam
+        # Se chegou aqui, todas as tentativas permitidas falharam
+        self._registrar_metrica(operacao, falhas=1)
         raise last_error
     
+    def _montar_documento_aluno(self, dados_aluno: Dict[str, Any], id_unico: str,
+                                atividades: Optional[List[Dict[str, Any]]] = None,
+                                turmas: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Monta o documento do aluno para o MongoDB.
+
+        `atividades` e `turmas` permitem reaproveitar as listas já carregadas
+        ao reaplicar vários cadastros da fila.
+        """
+        # Buscar atividade usando DAO do MongoDB
+        atividade_id = None
+        if dados_aluno.get('atividade'):
+            if atividades is None:
+                atividades = self.atividade_dao.listar_todas()
+            for ativ in atividades:
+                if ativ.get('nome') == dados_aluno['atividade']:
+                    atividade_id = ativ.get('_id')
+                    break
+        
+        # Buscar turma usando DAO do MongoDB
+        turma_id = None
+        if dados_aluno.get('turma'):
+            if turmas is None:
+                turmas = self.turma_dao.listar_todas()
+            for t in turmas:
+                if t.get('nome') == dados_aluno['turma']:
+                    turma_id = t.get('_id')
+                    break
+        
+        # Converter datas
+        data_nascimento = None
+        if dados_aluno.get('data_nascimento'):
+            if isinstance(dados_aluno['data_nascimento'], str):
+                try:
+                    data_nascimento = datetime.strptime(
+                        dados_aluno['data_nascimento'], '%Y-%m-%d'
+                    ).date()
+                except:
+                    pass
+            elif isinstance(dados_aluno['data_nascimento'], date):
+                data_nascimento = dados_aluno['data_nascimento']
+        
+        data_cadastro = date.today()
+        if dados_aluno.get('data_cadastro'):
+            if isinstance(dados_aluno['data_cadastro'], str):
+                try:
+                    data_cadastro = datetime.strptime(
+                        dados_aluno['data_cadastro'], '%Y-%m-%d'
+                    ).date()
+                except:
+                    pass
+            elif isinstance(dados_aluno['data_cadastro'], date):
+                data_cadastro = dados_aluno['data_cadastro']
+        
+        # Criar dados do novo aluno para MongoDB
+        return {
+            'id_unico': id_unico,
+            'nome': dados_aluno.get('nome', ''),
+            'telefone': dados_aluno.get('telefone', ''),
+            'endereco': dados_aluno.get('endereco', ''),
+            'email': dados_aluno.get('email', ''),
+            'data_nascimento': data_nascimento.isoformat() if data_nascimento else None,
+            'data_cadastro': data_cadastro.isoformat() if data_cadastro else None,
+            'titulo_eleitor': dados_aluno.get('titulo_eleitor', ''),
+            'atividade': dados_aluno.get('atividade', ''),
+            'atividade_id': atividade_id,
+            'turma': dados_aluno.get('turma', ''),
+            'turma_id': turma_id,
+            'status_frequencia': dados_aluno.get('status_frequencia', ''),
+            'observacoes': dados_aluno.get('observacoes', ''),
+            'ativo': dados_aluno.get('ativo', True),
+            'criado_por': dados_aluno.get('criado_por', 'sistema'),
+            'criado_em': datetime.now().isoformat()
+        }
+    
     def salvar_aluno_db_robusto(self, dados_aluno: Dict[str, Any]) -> Dict[str, Any]:
         """
         Versão robusta do salvamento de aluno com tratamento avançado de erros
@@ -260,97 +841,39 @@ class DatabaseIntegrationRobusto:
         Returns:
             Dict com 'success', 'message', 'aluno_id' ou 'fallback_id'
         """
+        # Gerado uma única vez: é a chave de deduplicação entre as tentativas e na fila
+        id_unico = dados_aluno.get('id_unico') or str(uuid.uuid4())[:8]
+        tentativas = {'total': 0}
+        
         def _salvar_operacao():
             """Operação interna de salvamento"""
             logger.info(f"[ROBUSTO] Iniciando salvamento: {dados_aluno.get('nome')}")
             
-            # Buscar atividade usando DAO do MongoDB
-            atividade = None
-            atividade_id = None
-            if dados_aluno.get('atividade'):
-                atividades = self.atividade_dao.listar_todas()
-                for ativ in atividades:
-                    if ativ.get('nome') == dados_aluno['atividade']:
-                        atividade = ativ
-                        atividade_id = ativ.get('_id')
-                        break
-            
-            # Buscar turma usando DAO do MongoDB
-            turma = None
-            turma_id = None
-            if dados_aluno.get('turma'):
-                turmas = self.turma_dao.listar_todas()
-                for t in turmas:
-                    if t.get('nome') == dados_aluno['turma']:
-                        turma = t
-                        turma_id = t.get('_id')
-                        break
-            
-            # Converter datas
-            data_nascimento = None
-            if dados_aluno.get('data_nascimento'):
-                if isinstance(dados_aluno['data_nascimento'], str):
-                    try:
-                        data_nascimento = datetime.strptime(
-                            dados_aluno['data_nascimento'], '%Y-%m-%d'
-                        ).date()
-                    except:
-                        pass
-                elif isinstance(dados_aluno['data_nascimento'], date):
-                    data_nascimento = dados_aluno['data_nascimento']
-            
-            data_cadastro = date.today()
-            if dados_aluno.get('data_cadastro'):
-                if isinstance(dados_aluno['data_cadastro'], str):
-                    try:
-                        data_cadastro = datetime.strptime(
-                            dados_aluno['data_cadastro'], '%Y-%m-%d'
-                        ).date()
-                    except:
-                        pass
-                elif isinstance(dados_aluno['data_cadastro'], date):
-                    data_cadastro = dados_aluno['data_cadastro']
+            # Uma nova tentativa após erro de conexão pode encontrar o aluno já gravado
+            if tentativas['total'] > 0:
+                existente = self.aluno_dao.buscar_por_id_unico(id_unico)
+                if existente:
+                    logger.info(f"[ROBUSTO] Aluno {id_unico} já havia sido gravado, reaproveitando")
+                    return str(existente['_id'])
+            tentativas['total'] += 1
             
-            # Gerar ID único
-            import uuid
-            id_unico = dados_aluno.get('id_unico') or str(uuid.uuid4())[:8]
-            
-            # Criar dados do novo aluno para MongoDB
-            dados_novo_aluno = {
-                'id_unico': id_unico,
-                'nome': dados_aluno.get('nome', ''),
-                'telefone': dados_aluno.get('telefone', ''),
-                'endereco': dados_aluno.get('endereco', ''),
-                'email': dados_aluno.get('email', ''),
-                'data_nascimento': data_nascimento.isoformat() if data_nascimento else None,
-                'data_cadastro': data_cadastro.isoformat() if data_cadastro else None,
-                'titulo_eleitor': dados_aluno.get('titulo_eleitor', ''),
-                'atividade': dados_aluno.get('atividade', ''),
-                'atividade_id': atividade_id,
-                'turma': dados_aluno.get('turma', ''),
-                'turma_id': turma_id,
-                'status_frequencia': dados_aluno.get('status_frequencia', ''),
-                'observacoes': dados_aluno.get('observacoes', ''),
-                'ativo': dados_aluno.get('ativo', True),
-                'criado_por': dados_aluno.get('criado_por', 'sistema'),
-                'criado_em': datetime.now().isoformat()
-            }
+            dados_novo_aluno = self._montar_documento_aluno(dados_aluno, id_unico)
             
             # Salvar usando DAO do MongoDB
+            # (os contadores por atividade/turma são mantidos pelo próprio AlunoDAO)
             resultado = self.aluno_dao.criar(dados_novo_aluno)
-            
-            # Atualizar contadores
-            if atividade_id:
-                self.atividade_dao.atualizar_total_alunos(atividade_id)
-            if turma_id:
-                self.turma_dao.atualizar_total_alunos(turma_id)
+            if resultado is None:
+                # AlunoDAO.criar não propaga a exceção: distinguir queda de conexão de erro nos dados
+                if not self._usando_memoria() and not self._test_connection():
+                    raise DatabaseConnectionError("Conexão perdida ao gravar aluno")
+                raise RuntimeError("Não foi possível gravar o aluno no banco")
             
             logger.info(f"[ROBUSTO] ✅ Aluno salvo com ID: {resultado}")
             return resultado
         
         try:
             # Tentar salvar no banco com retry
-            aluno_id = self._execute_with_retry(_salvar_operacao)
+            aluno_id = self._execute_with_retry(_salvar_operacao, idempotente=True, operacao='salvar_aluno')
             
             return {
                 'success': True,
@@ -365,7 +888,7 @@ class DatabaseIntegrationRobusto:
             # Se é erro de conexão, tentar fallback
             if self._is_connection_error(e):
                 try:
-                    fallback_id = self._save_to_fallback(dados_aluno)
+                    fallback_id = self._save_to_fallback({**dados_aluno, 'id_unico': id_unico})
                     
                     return {
                         'success': True,
@@ -393,170 +916,239 @@ class DatabaseIntegrationRobusto:
                 }
     
     def processar_fallback_pendente(self) -> Dict[str, Any]:
-        """Processa registros pendentes do fallback quando a conexão é restaurada"""
-        if not os.path.exists(self.fallback_file):
-            return {'processed': 0, 'message': 'Nenhum registro pendente'}
-        
+        """Aplica agora as gravações pendentes da fila (inclui o antigo cadastros_fallback.json)"""
         try:
-            with open(self.fallback_file, 'r', encoding='utf-8') as f:
-                fallback_records = json.load(f)
-        except:
-            return {'processed': 0, 'error': 'Erro ao ler arquivo de fallback'}
-        
-        processed = 0
-        errors = []
-        remaining_records = []
-        
-        for record in fallback_records:
-            if record.get('status') == 'pending_database_save':
-                try:
-                    # Remover campos de fallback antes de salvar
-                    clean_data = {k: v for k, v in record.items() 
-                                if not k.startswith('fallback_') and k != 'status'}
-                    
-                    result = self.salvar_aluno_db_robusto(clean_data)
-                    
-                    if result['success'] and result.get('method') == 'database':
-                        processed += 1
-                        logger.info(f"✅ Registro fallback processado: {record.get('nome')}")
-                    else:
-                        # Se ainda falhou, manter no fallback
-                        remaining_records.append(record)
-                        errors.append(f"Falha ao processar {record.get('nome')}: {result.get('message')}")
-                        
-                except Exception as e:
-                    remaining_records.append(record)
-                    errors.append(f"Erro ao processar {record.get('nome')}: {str(e)}")
-            else:
-                # Manter registros que não são pendentes
-                remaining_records.append(record)
-        
-        # Atualizar arquivo de fallback
-        try:
-            if remaining_records:
-                with open(self.fallback_file, 'w', encoding='utf-8') as f:
-                    json.dump(remaining_records, f, ensure_ascii=False, indent=2, default=str)
-            else:
-                os.remove(self.fallback_file)
-                logger.info("📁 Arquivo de fallback removido - todos os registros processados")
+            self._migrar_fallback_legado()
+            if not self.fila.tem_pendentes():
+                return {'processed': 0, 'remaining': 0, 'errors': [], 'message': 'Nenhum registro pendente'}
+            if not self._pode_drenar():
+                restantes = self.fila.contar_pendentes()
+                return {'processed': 0, 'remaining': restantes, 'errors': [],
+                        'message': f'Banco indisponível, {restantes} registros aguardando'}
+            
+            resultado = self.fila.drenar(self._aplicadores_fila())
+            if resultado.pop('ocupado'):
+                resultado['message'] = 'Fila já está sendo processada por outro processo'
+                return resultado
+            resultado['remaining'] = self.fila.contar_pendentes()
+            resultado['message'] = f"Processados {resultado['processed']} registros, {resultado['remaining']} restantes"
+            return resultado
         except Exception as e:
-            logger.error(f"Erro ao atualizar arquivo de fallback: {e}")
-        
-        return {
-            'processed': processed,
-            'remaining': len(remaining_records),
-            'errors': errors,
-            'message': f'Processados {processed} registros, {len(remaining_records)} restantes'
-        }
+            logger.error(f"Erro ao processar fila de gravação: {e}")
+            return {'processed': 0, 'error': str(e)}
     
     def get_status_sistema(self) -> Dict[str, Any]:
         """Retorna o status do sistema de banco de dados"""
         status = {
-            'database_connected': self._test_connection(),
-            'fallback_records': 0,
+            'database_connected': not self._usando_memoria() and self.circuit_breaker.estado != CircuitBreaker.ABERTO,
+            'circuit_breaker': self.circuit_breaker.get_status(),
+            'politica_retry': self.politica_retry.get_status(),
+            'retries': {operacao: dict(metricas) for operacao, metricas in self.metricas_retry.items()},
+            'fallback_records': self.fila.contar_pendentes(),
+            'fila_gravacao': {
+                'diretorio': self.fila.diretorio,
+                'ultima_drenagem': self.drenador.ultimo_resultado
+            },
             'last_check': datetime.now().isoformat()
         }
         
-        # Verificar registros pendentes no fallback
+        # Registros do formato antigo ainda não migrados para a fila
         if os.path.exists(self.fallback_file):
             try:
                 with open(self.fallback_file, 'r', encoding='utf-8') as f:
                     fallback_records = json.load(f)
-                    status['fallback_records'] = len([r for r in fallback_records 
-                                                    if r.get('status') == 'pending_database_save'])
+                    status['fallback_records'] += len([r for r in fallback_records 
+                                                     if r.get('status') == 'pending_database_save'])
             except:
                 status['fallback_records'] = 'erro_leitura'
         
         return status
     
+
+    def _operacao_protegida(self, operacao, valor_padrao, descricao: str):
+        """Executa uma operação simples no banco passando pelo circuit breaker.
+
+        Com o circuito aberto (ou em modo fallback) retorna `valor_padrao` sem
+        tocar no banco; erros de conexão alimentam o circuito.
+        """
+        if self._usando_memoria() or not self.circuit_breaker.permitir():
+            return valor_padrao
+        try:
+            resultado = operacao()
+            self.circuit_breaker.registrar_sucesso()
+            return resultado
+        except Exception as e:
+            if self._is_connection_error(e):
+                self.circuit_breaker.registrar_falha(e)
+            else:
+                self.circuit_breaker.registrar_sucesso()
+            logger.error(f"Erro ao {descricao}: {e}")
+            return valor_padrao
+    
     # Métodos de compatibilidade com a interface existente
     def contar_alunos_db(self) -> int:
         """Conta o total de alunos no banco"""
-        try:
-            if not self._test_connection():
-                return 0
-            return self.aluno_dao.contar_total()
-        except Exception as e:
-            logger.error(f"Erro ao contar alunos: {e}")
-            return 0
+        return self._operacao_protegida(self.aluno_dao.contar_total, 0, 'contar alunos')
     
     def contar_atividades_db(self) -> int:
         """Conta o total de atividades no banco"""
-        try:
-            if not self._test_connection():
-                return 0
-            return self.atividade_dao.contar_total()
-        except Exception as e:
-            logger.error(f"Erro ao contar atividades: {e}")
-            return 0
+        return self._operacao_protegida(self.atividade_dao.contar_total, 0, 'contar atividades')
     
     def contar_turmas_db(self) -> int:
         """Conta o total de turmas no banco"""
-        try:
-            if not self._test_connection():
-                return 0
-            return self.turma_dao.contar_total()
-        except Exception as e:
-            logger.error(f"Erro ao contar turmas: {e}")
-            return 0
+        return self._operacao_protegida(self.turma_dao.contar_total, 0, 'contar turmas')
     
     def listar_alunos_db(self) -> List[Dict[str, Any]]:
         """Lista todos os alunos do banco"""
-        try:
-            if not self._test_connection():
-                return []
-            return self.aluno_dao.listar_todos()
-        except Exception as e:
-            logger.error(f"Erro ao listar alunos: {e}")
-            return []
+        return self._operacao_protegida(self.aluno_dao.listar_todos, [], 'listar alunos')
     
     def listar_atividades_db(self) -> List[Dict[str, Any]]:
         """Lista todas as atividades do banco"""
-        try:
-            if not self._test_connection():
-                return []
-            return self.atividade_dao.listar_todas()
-        except Exception as e:
-            logger.error(f"Erro ao listar atividades: {e}")
-            return []
+        return self._operacao_protegida(self.atividade_dao.listar_todas, [], 'listar atividades')
     
     def listar_turmas_db(self) -> List[Dict[str, Any]]:
         """Lista todas as turmas do banco"""
-        try:
-            if not self._test_connection():
-                return []
-            return self.turma_dao.listar_todas()
-        except Exception as e:
-            logger.error(f"Erro ao listar turmas: {e}")
-            return []
+        return self._operacao_protegida(self.turma_dao.listar_todas, [], 'listar turmas')
     
     def atualizar_aluno_db(self, aluno_id: str, dados_atualizados: Dict[str, Any]) -> bool:
         """Atualiza um aluno no banco"""
-        try:
-            if not self._test_connection():
-                return False
-            return self.aluno_dao.atualizar(aluno_id, dados_atualizados)
-        except Exception as e:
-            logger.error(f"Erro ao atualizar aluno: {e}")
-            return False
+        return self._operacao_protegida(
+            lambda: self.aluno_dao.atualizar(aluno_id, dados_atualizados), False, 'atualizar aluno'
+        )
+    
+    def listar_presencas_db(self, **filtros) -> List[Dict[str, Any]]:
+        """Presenças por faixa de datas (ver PresencaDAO.listar_por_periodo); [] com o banco fora"""
+        return self._operacao_protegida(
+            lambda: self.presenca_dao.listar_por_periodo(**filtros), [], 'listar presenças'
+        )
+    
+    def alunos_com_presenca_no_dia_db(self, data_presenca: datetime, aluno_ids: List[Any]) -> set:
+        """aluno_ids (str) que já têm presença no dia, numa única consulta"""
+        return self._operacao_protegida(
+            lambda: self.presenca_dao.alunos_com_presenca_no_dia(data_presenca, aluno_ids), set(),
+            'verificar presenças do dia'
+        )
+    
+    def obter_resumo_mes_db(self, ano: int, mes: int, atividade: Optional[str] = None,
+                            turma: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Resumo mensal materializado (ver ResumoPresencaDAO.obter_mes); None com o banco fora"""
+        return self._operacao_protegida(
+            lambda: self.resumo_presenca_dao.obter_mes(ano, mes, atividade=atividade, turma=turma), None,
+            'ler resumo mensal de presenças'
+        )
+    
+    def obter_frequencia_alunos_mes_db(self, ano: int, mes: int,
+                                       atividade: Optional[str] = None) -> Optional[Dict[str, Dict[str, int]]]:
+        """Contagens P/F/J do mês por aluno (ver ResumoPresencaDAO.obter_alunos_mes); None com o banco fora"""
+        return self._operacao_protegida(
+            lambda: self.resumo_presenca_dao.obter_alunos_mes(ano, mes, atividade=atividade), None,
+            'ler resumo mensal por aluno'
+        )
+    
+    def materializar_resumos_presenca(self) -> Optional[Dict[str, Any]]:
+        """Monta os resumos mensais na primeira execução (coleção resumos_presenca vazia)"""
+        return self._operacao_protegida(
+            self.resumo_presenca_dao.materializar_se_vazio, None, 'materializar resumos de presença'
+        )
+    
+    def atualizar_presenca_db(self, data_presenca: datetime, campos: Dict[str, Any],
+                              aluno_id: Any = None, nome_aluno: Optional[str] = None) -> bool:
+        """Altera o registro de presença de um aluno numa data"""
+        if self._usando_memoria():
+            return self.presenca_dao.atualizar_registro(data_presenca, campos, aluno_id=aluno_id, nome_aluno=nome_aluno)
+        return self._operacao_protegida(
+            lambda: self.presenca_dao.atualizar_registro(data_presenca, campos, aluno_id=aluno_id, nome_aluno=nome_aluno),
+            False, 'atualizar presença'
+        )
+    
+    def atualizar_status_frequencia_db(self, status_por_aluno: Dict[str, str]) -> int:
+        """Grava o status_frequencia recalculado de alguns alunos ({aluno_id: status})"""
+        if self._usando_memoria():
+            return self.aluno_dao.atualizar_status_frequencia(status_por_aluno)
+        return self._operacao_protegida(
+            lambda: self.aluno_dao.atualizar_status_frequencia(status_por_aluno), 0, 'atualizar status de frequência'
+        )
     
     def registrar_atividade_db(self, usuario: str, acao: str, detalhes: str, tipo_usuario: str = "usuario") -> bool:
-        """Registra uma atividade no log"""
+        """Registra uma atividade no log (enfileirada se o banco estiver fora)"""
+        if self._usando_memoria():
+            return False
+        agora = datetime.utcnow()
+        dados_log = {
+            'usuario': usuario,
+            'acao': acao,
+            'detalhes': detalhes,
+            'tipo_usuario': tipo_usuario,
+            'timestamp': agora,
+            'data_registro': agora
+        }
+        return self._gravar_ou_enfileirar('log', 'logs_atividades', dados_log) is not None
+    
+    def registrar_presenca_db(self, dados_presenca: Dict[str, Any]) -> bool:
+        """Registra uma presença (enfileirada se o banco estiver fora)"""
+        dados = dict(dados_presenca)
+        # BSON não aceita datetime.date
+        for campo, valor in dados.items():
+            if isinstance(valor, date) and not isinstance(valor, datetime):
+                dados[campo] = datetime.combine(valor, datetime.min.time())
+        if self._usando_memoria():
+            return self.presenca_dao.registrar(dados) is not None
+        dados['data_registro'] = datetime.now()
+        return self._gravar_ou_enfileirar('presenca', 'presencas', dados) is not None
+
+    def registrar_presencas_db_lote(self, lista_presencas: List[Dict[str, Any]]) -> Optional[str]:
+        """Registra uma chamada inteira com um único insert_many (ou um único append na fila).
+
+        Cada documento recebe um `id_fila`; se um insert_many interrompido for
+        repetido pela fila, o índice único descarta as presenças já gravadas.
+        Retorna 'database', 'fila', 'memoria' ou None.
+        """
+        documentos = []
+        for dados_presenca in lista_presencas:
+            dados = dict(dados_presenca)
+            for campo, valor in dados.items():
+                if isinstance(valor, date) and not isinstance(valor, datetime):
+                    dados[campo] = datetime.combine(valor, datetime.min.time())
+            documentos.append(dados)
+        if not documentos:
+            return 'database'
+        if self._usando_memoria():
+            return 'memoria' if self.presenca_dao.registrar_lote(documentos) is not None else None
+        
+        agora = datetime.now()
+        for dados in documentos:
+            dados['data_registro'] = agora
+            dados.setdefault('id_fila', uuid.uuid4().hex)
+        if self.circuit_breaker.permitir():
+            try:
+                # Cópias: insert_many acrescenta _id (ObjectId) aos documentos
+                self.db.presencas.insert_many([dict(dados) for dados in documentos], ordered=False)
+                self.circuit_breaker.registrar_sucesso()
+                self._apos_inserir('presencas', documentos)
+                return 'database'
+            except BulkWriteError as e:
+                self.circuit_breaker.registrar_sucesso()
+                erros = e.details.get('writeErrors', [])
+                recusados = {erro.get('index') for erro in erros}
+                self._apos_inserir('presencas', [dados for indice, dados in enumerate(documentos)
+                                                 if indice not in recusados])
+                if all(erro.get('code') == 11000 for erro in erros):
+                    return 'database'
+                logger.error(f"Erro ao gravar lote de presenças: {erros[:3]}")
+                return None
+            except Exception as e:
+                if not self._is_connection_error(e):
+                    self.circuit_breaker.registrar_sucesso()
+                    logger.error(f"Erro ao gravar lote de presenças: {e}")
+                    return None
+                self.circuit_breaker.registrar_falha(e)
         try:
-            if not self._test_connection():
-                return False
-            dados_log = {
-                'usuario': usuario,
-                'acao': acao,
-                'detalhes': detalhes,
-                'tipo_usuario': tipo_usuario,
-                'timestamp': datetime.now().isoformat()
-            }
-            self.log_atividade_dao.criar(dados_log)
-            return True
+            self.fila.registrar_lote('presenca', documentos)
+            self.drenador.garantir_execucao()
+            return 'fila'
         except Exception as e:
-            logger.error(f"Erro ao registrar atividade: {e}")
-            return False
+            logger.error(f"❌ Erro ao enfileirar lote de presenças: {e}")
+            return None
 
 # Instância global para uso na aplicação
 db_integration_robusto = DatabaseIntegrationRobusto()
@@ -0,0 +1,345 @@
+"""Fila de gravação durável (write-ahead log) usada quando o MongoDB está fora
+
+Cada gravação que não pôde ir ao banco (cadastro de aluno, presença, log de
+atividade) vira uma linha JSON acrescentada ao segmento atual da fila, com
+fsync antes de responder. Os segmentos ficam em FILA_GRAVACAO_DIR:
+
+    segmento_00000001.jsonl   linhas {"id", "tipo", "dados", "criado_em"}
+    checkpoint.json           {"segmento": n, "offset": bytes já aplicados}
+    escrita.lock / drenagem.lock
+
+Escrever é O(1) (append), independente do tamanho da fila. Vários workers do
+gunicorn podem escrever ao mesmo tempo (flock em escrita.lock); só um drena
+por vez (flock não bloqueante em drenagem.lock). A drenagem lê a partir do
+checkpoint, reaplica as entradas em lotes por tipo e só então avança o
+checkpoint, apagando os segmentos já consumidos. Os aplicadores precisam ser
+idempotentes (cada entrada tem um `id` estável), pois um lote pode ser
+reaplicado se o processo cair antes do checkpoint.
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows: apenas o lock entre threads do processo
+    fcntl = None
+    FCNTL_AVAILABLE = False
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+logger = logging.getLogger(__name__)
+
+FILA_GRAVACAO_DIR = os.environ.get('FILA_GRAVACAO_DIR', 'fila_gravacao')
+FILA_TAMANHO_SEGMENTO = int(os.environ.get('FILA_TAMANHO_SEGMENTO', 4 * 1024 * 1024))
+FILA_LOTE_DRENAGEM = int(os.environ.get('FILA_LOTE_DRENAGEM', 500))
+FILA_INTERVALO_DRENAGEM = float(os.environ.get('FILA_INTERVALO_DRENAGEM', 15))
+
+PREFIXO_SEGMENTO = 'segmento_'
+SUFIXO_SEGMENTO = '.jsonl'
+
+
+def _codificar(valor):
+    """json.dumps(default=...): preserva datas e ObjectIds para a reaplicação"""
+    if ObjectId is not None and isinstance(valor, ObjectId):
+        return {'__oid__': str(valor)}
+    if isinstance(valor, datetime):
+        return {'__datetime__': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'__date__': valor.isoformat()}
+    return str(valor)
+
+
+def _decodificar(objeto):
+    """json.loads(object_hook=...): inverso de _codificar"""
+    if len(objeto) == 1:
+        if '__datetime__' in objeto:
+            return datetime.fromisoformat(objeto['__datetime__'])
+        if '__date__' in objeto:
+            return date.fromisoformat(objeto['__date__'])
+        if '__oid__' in objeto and ObjectId is not None:
+            return ObjectId(objeto['__oid__'])
+    return objeto
+
+
+class FilaGravacao:
+    """Write-ahead log em segmentos JSON-lines com checkpoint"""
+
+    def __init__(self, diretorio=FILA_GRAVACAO_DIR, tamanho_segmento=FILA_TAMANHO_SEGMENTO):
+        self.diretorio = diretorio
+        self.tamanho_segmento = tamanho_segmento
+        self._locks = {'escrita': threading.Lock(), 'drenagem': threading.Lock()}
+
+    # ------------------------------------------------------------------
+    # Arquivos e locks
+    # ------------------------------------------------------------------
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    def _caminho_segmento(self, numero):
+        return self._caminho(f'{PREFIXO_SEGMENTO}{numero:08d}{SUFIXO_SEGMENTO}')
+
+    def _segmentos(self):
+        """Números dos segmentos existentes, em ordem"""
+        if not os.path.isdir(self.diretorio):
+            return []
+        numeros = []
+        for nome in os.listdir(self.diretorio):
+            if nome.startswith(PREFIXO_SEGMENTO) and nome.endswith(SUFIXO_SEGMENTO):
+                try:
+                    numeros.append(int(nome[len(PREFIXO_SEGMENTO):-len(SUFIXO_SEGMENTO)]))
+                except ValueError:
+                    continue
+        return sorted(numeros)
+
+    @contextmanager
+    def _trava(self, nome, bloquear=True):
+        """Lock entre threads e entre processos; produz False se não bloqueante e ocupado"""
+        lock = self._locks[nome]
+        if not lock.acquire(blocking=bloquear):
+            yield False
+            return
+        arquivo = None
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            arquivo = open(self._caminho(f'{nome}.lock'), 'a')
+            if FCNTL_AVAILABLE:
+                try:
+                    fcntl.flock(arquivo, fcntl.LOCK_EX if bloquear else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+            yield True
+        finally:
+            if arquivo is not None:
+                arquivo.close()  # fechar libera o flock
+            lock.release()
+
+    def _ler_checkpoint(self):
+        try:
+            with open(self._caminho('checkpoint.json'), 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            return int(checkpoint['segmento']), int(checkpoint['offset'])
+        except (OSError, ValueError, KeyError):
+            segmentos = self._segmentos()
+            return (segmentos[0] if segmentos else 1), 0
+
+    def _gravar_checkpoint(self, segmento, offset):
+        """Grava o checkpoint de forma atômica (arquivo temporário + os.replace)"""
+        caminho = self._caminho('checkpoint.json')
+        temporario = f'{caminho}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'segmento': segmento, 'offset': offset,
+                       'atualizado_em': datetime.now().isoformat()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+    def registrar(self, tipo, dados):
+        """Acrescenta uma entrada à fila (durável ao retornar); retorna o id da entrada"""
+        return self.registrar_lote(tipo, [dados])[0]
+
+    def registrar_lote(self, tipo, lista_dados):
+        """Acrescenta várias entradas com uma única escrita e um único fsync; retorna os ids"""
+        criado_em = datetime.now().isoformat()
+        entradas = [{'id': uuid.uuid4().hex, 'tipo': tipo, 'dados': dados, 'criado_em': criado_em}
+                    for dados in lista_dados]
+        if not entradas:
+            return []
+        linhas = b''.join((json.dumps(entrada, ensure_ascii=False, default=_codificar) + '\n').encode('utf-8')
+                          for entrada in entradas)
+
+        with self._trava('escrita'):
+            segmentos = self._segmentos()
+            numero = segmentos[-1] if segmentos else 1
+            caminho = self._caminho_segmento(numero)
+            if os.path.exists(caminho) and os.path.getsize(caminho) >= self.tamanho_segmento:
+                numero += 1
+                caminho = self._caminho_segmento(numero)
+            with open(caminho, 'ab+') as f:
+                # Linha truncada por um processo que caiu no meio da escrita:
+                # fechá-la para não corromper a entrada seguinte
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+                f.write(linhas)
+                f.flush()
+                os.fsync(f.fileno())
+
+        if len(entradas) == 1:
+            logger.info(f"💾 Gravação enfileirada ({tipo}): {entradas[0]['id']}")
+        else:
+            logger.info(f"💾 {len(entradas)} gravações enfileiradas ({tipo})")
+        return [entrada['id'] for entrada in entradas]
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def _ler_a_partir(self, segmento, offset, limite=None):
+        """Gera (segmento, offset_fim, entrada) a partir de uma posição.
+
+        Uma última linha sem '\\n' no segmento atual é uma escrita em andamento
+        e encerra a leitura (num segmento antigo, é resto de um processo que
+        caiu e é descartada); linhas corrompidas são ignoradas (com aviso).
+        """
+        lidas = 0
+        segmentos = self._segmentos()
+        for numero in segmentos:
+            if numero < segmento:
+                continue
+            posicao = offset if numero == segmento else 0
+            with open(self._caminho_segmento(numero), 'rb') as f:
+                f.seek(posicao)
+                for linha in f:
+                    if not linha.endswith(b'\n') and numero == segmentos[-1]:
+                        return
+                    posicao += len(linha)
+                    try:
+                        entrada = json.loads(linha.decode('utf-8'), object_hook=_decodificar)
+                    except ValueError as e:
+                        logger.warning(f"⚠️ Entrada corrompida na fila ({numero}:{posicao}): {e}")
+                        entrada = None
+                    yield numero, posicao, entrada
+                    lidas += 1
+                    if limite is not None and lidas >= limite:
+                        return
+
+    def contar_pendentes(self):
+        """Número de entradas ainda não aplicadas ao banco"""
+        try:
+            segmento, offset = self._ler_checkpoint()
+            return sum(1 for _, _, entrada in self._ler_a_partir(segmento, offset) if entrada)
+        except Exception as e:
+            logger.error(f"Erro ao contar pendências da fila: {e}")
+            return 0
+
+    def tem_pendentes(self):
+        """Verificação barata (só tamanhos de arquivo) usada pelo drenador"""
+        segmento, offset = self._ler_checkpoint()
+        for numero in self._segmentos():
+            tamanho = os.path.getsize(self._caminho_segmento(numero))
+            if (numero > segmento and tamanho > 0) or (numero == segmento and tamanho > offset):
+                return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Drenagem
+    # ------------------------------------------------------------------
+    def drenar(self, aplicadores, limite_lote=FILA_LOTE_DRENAGEM):
+        """Reaplica as entradas pendentes em lotes.
+
+        `aplicadores` mapeia tipo -> função(lista de entradas); a função deve
+        ser idempotente e levantar exceção se o lote não pôde ser aplicado
+        (a drenagem para e o checkpoint não avança). Entradas consecutivas do
+        mesmo tipo são aplicadas juntas, preservando a ordem da fila.
+        """
+        resultado = {'processed': 0, 'remaining': 0, 'errors': [], 'ocupado': False}
+        with self._trava('drenagem', bloquear=False) as obtida:
+            if not obtida:
+                resultado['ocupado'] = True
+                return resultado
+            while True:
+                segmento, offset = self._ler_checkpoint()
+                lote = list(self._ler_a_partir(segmento, offset, limite_lote))
+                if not lote:
+                    break
+
+                # Agrupar sequências do mesmo tipo
+                grupos = []
+                for numero, posicao, entrada in lote:
+                    tipo = entrada.get('tipo') if entrada else None
+                    if grupos and grupos[-1][0] == tipo:
+                        grupos[-1][1].append(entrada)
+                        grupos[-1][2] = (numero, posicao)
+                    else:
+                        grupos.append([tipo, [entrada], (numero, posicao)])
+
+                for tipo, entradas, (numero, posicao) in grupos:
+                    if tipo is not None:
+                        aplicador = aplicadores.get(tipo)
+                        if aplicador is None:
+                            resultado['errors'].append(f"Tipo sem aplicador na fila: {tipo}")
+                        else:
+                            try:
+                                aplicador(entradas)
+                            except Exception as e:
+                                resultado['errors'].append(f"Falha ao aplicar {len(entradas)} entrada(s) '{tipo}': {e}")
+                                resultado['remaining'] = self.contar_pendentes()
+                                return resultado
+                            resultado['processed'] += len(entradas)
+                    self._gravar_checkpoint(numero, posicao)
+
+                self._remover_segmentos_consumidos()
+
+        if resultado['processed']:
+            logger.info(f"✅ Fila de gravação: {resultado['processed']} entrada(s) aplicada(s) ao banco")
+        return resultado
+
+    def _remover_segmentos_consumidos(self):
+        """Apaga os segmentos anteriores ao checkpoint (e o do checkpoint, se já lido e houver outro)"""
+        segmento, offset = self._ler_checkpoint()
+        segmentos = self._segmentos()
+        for numero in segmentos:
+            caminho = self._caminho_segmento(numero)
+            consumido = numero < segmento or (
+                numero == segmento and numero != segmentos[-1] and offset >= os.path.getsize(caminho)
+            )
+            if not consumido:
+                continue
+            if numero == segmento:
+                proximo = next(n for n in segmentos if n > numero)
+                self._gravar_checkpoint(proximo, 0)
+            os.remove(caminho)
+
+
+class DrenadorFila:
+    """Thread em segundo plano que drena a fila quando o banco está disponível.
+
+    Acorda a cada `intervalo` segundos (para pegar entradas de outros workers
+    ou de antes de um restart) ou imediatamente via acordar(), chamado quando
+    o circuit breaker fecha.
+    """
+
+    def __init__(self, fila, aplicadores, pode_drenar, intervalo=FILA_INTERVALO_DRENAGEM):
+        self.fila = fila
+        self.aplicadores = aplicadores
+        self.pode_drenar = pode_drenar
+        self.intervalo = intervalo
+        self.ultimo_resultado = None
+        self._evento = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def garantir_execucao(self):
+        """Inicia a thread (de novo, se o processo foi criado por fork)"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._executar, name='fila-gravacao-drenador', daemon=True)
+        self._thread.start()
+
+    def acordar(self):
+        self._evento.set()
+
+    def _executar(self):
+        while True:
+            self._evento.wait(self.intervalo)
+            self._evento.clear()
+            try:
+                if self.pode_drenar() and self.fila.tem_pendentes():
+                    self.ultimo_resultado = self.fila.drenar(self.aplicadores)
+            except Exception as e:
+                logger.error(f"Erro ao drenar fila de gravação: {e}")
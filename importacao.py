@@ -0,0 +1,844 @@
+"""Importação de alunos em lote (planilhas Excel/CSV)
+
+Recebe as linhas já extraídas da planilha e grava no banco por lotes:
+cada lote resolve os alunos existentes com uma única consulta
+(AlunoDAO.buscar_existentes_lote) e grava inserções e atualizações num único
+bulk_write (AlunoDAO.gravar_lote). As atividades são resolvidas uma vez por
+nome durante toda a importação.
+
+Antes de qualquer acesso ao banco, normalizar_planilha() limpa o DataFrame
+lido da planilha com operações por coluna (mapeamento, limpeza de texto,
+limites de tamanho e datas). Sem pandas, normalizar_linhas() faz o mesmo
+linha a linha.
+
+Os arquivos são lidos em lotes (LeitorCSV, LeitorExcel) e as linhas seguem
+direto para o banco, sem carregar o arquivo inteiro na memória. No CSV a
+codificação e o delimitador são detectados uma vez numa amostra do início do
+arquivo; o .xlsx é percorrido com openpyxl em modo read_only.
+
+Importações enviadas por /processar_planilha rodam em segundo plano
+(iniciar_importacao); o progresso fica no ImportacaoDAO e é consultado em
+/importacao/<job_id> por qualquer worker.
+"""
+
+import codecs
+import csv
+import importlib.util
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from models import AlunoDAO, AtividadeDAO, ImportacaoDAO
+
+# pandas (com numpy) e openpyxl só são importados no primeiro uso: juntos
+# custam ~0,4 s e dezenas de MB em cada worker, e importações são raras
+PANDAS_AVAILABLE = importlib.util.find_spec('pandas') is not None
+OPENPYXL_AVAILABLE = importlib.util.find_spec('openpyxl') is not None
+pd = None
+openpyxl = None
+
+
+def _pandas():
+    """Importa o pandas na primeira vez em que é necessário"""
+    global pd
+    if pd is None:
+        import pandas
+        pd = pandas
+    return pd
+
+
+def _openpyxl():
+    """Importa o openpyxl na primeira vez em que é necessário"""
+    global openpyxl
+    if openpyxl is None:
+        import openpyxl as modulo
+        openpyxl = modulo
+    return openpyxl
+
+TAMANHO_LOTE_IMPORTACAO = int(os.environ.get('TAMANHO_LOTE_IMPORTACAO', 1000))
+ATIVIDADE_PADRAO_IMPORTACAO = 'Cadastro Geral'
+SEPARADORES_ATIVIDADES = (',', ';', '|')
+MAX_ERROS_DETALHADOS = 10
+IMPORTACAO_WORKERS = int(os.environ.get('IMPORTACAO_WORKERS', 2))
+# Job sem atualização há mais tempo que isso é dado como interrompido
+# (worker reciclado ou derrubado no meio da importação)
+IMPORTACAO_HEARTBEAT_MAXIMO = int(os.environ.get('IMPORTACAO_HEARTBEAT_MAXIMO', 120))
+IMPORTACAO_HEARTBEAT_INTERVALO = 30
+
+# Nomes de coluna aceitos na planilha - TODOS OS CAMPOS SÃO OPCIONAIS EXCETO NOME
+COLUNAS_PLANILHA = {
+    'nome': ['nome', 'Nome', 'NOME', 'name', 'Name', 'NAME'],
+    'telefone': ['telefone', 'Telefone', 'TELEFONE', 'phone', 'celular', 'Celular', 'CELULAR'],
+    'email': ['email', 'Email', 'EMAIL', 'e-mail', 'E-mail', 'E-MAIL'],
+    'endereco': ['endereco', 'Endereco', 'ENDERECO', 'endereço', 'Endereço', 'ENDEREÇO', 'address', 'Address'],
+    'data_nascimento': ['data_nascimento', 'Data_Nascimento', 'Data Nascimento', 'nascimento', 'Nascimento', 'birth_date', 'Data_Nasc'],
+    'observacoes': ['observacoes', 'Observacoes', 'OBSERVACOES', 'obs', 'Obs', 'observações', 'Observações'],
+    'titulo_eleitor': ['titulo_eleitor', 'Titulo_Eleitor', 'Titulo Eleitor', 'titulo eleitor', 'TITULO_ELEITOR', 'titulo de eleitor', 'CPF', 'cpf'],
+    'atividades': ['atividades', 'Atividades', 'ATIVIDADES', 'atividade', 'Atividade', 'ATIVIDADE', 'activities', 'activity', 'Activity'],
+    'status': ['status', 'Status', 'STATUS', 'situacao', 'Situacao', 'SITUACAO']
+}
+
+# Limites baseados no modelo Aluno
+LIMITES_CAMPOS_ALUNO = {
+    'id_unico': 50,
+    'nome': 200,
+    'telefone': 20,
+    'email': 200,
+    'titulo_eleitor': 20,
+    'status_frequencia': 200,
+    'criado_por': 50
+}
+
+CAMPOS_TEXTO_PLANILHA = ('nome', 'telefone', 'email', 'endereco', 'observacoes', 'titulo_eleitor', 'atividades')
+# O último formato cobre células de data do Excel em colunas mistas (texto e data)
+FORMATOS_DATA_PLANILHA = ('%d/%m/%Y', '%Y-%m-%d', '%Y-%m-%d %H:%M:%S')
+
+
+def separar_atividades(atividades_str):
+    """Divide a coluna de atividades por vírgula, ponto e vírgula ou pipe"""
+    if not atividades_str or atividades_str == 'nan':
+        return []
+    for separador in SEPARADORES_ATIVIDADES:
+        if separador in atividades_str:
+            return [nome.strip() for nome in atividades_str.split(separador) if nome.strip()]
+    return [atividades_str.strip()]
+
+
+def mapear_colunas(colunas):
+    """Associa cada campo conhecido à primeira coluna da planilha com nome aceito"""
+    mapeamento = {}
+    for campo, possiveis_nomes in COLUNAS_PLANILHA.items():
+        for coluna in colunas:
+            if coluna in possiveis_nomes:
+                mapeamento[campo] = coluna
+                break
+    return mapeamento
+
+
+def _limpar_texto(serie):
+    """Texto sem espaços nas pontas; vazio e 'nan' viram <NA>"""
+    pd = _pandas()
+    texto = serie.astype('string')
+    if pd.api.types.is_float_dtype(serie):
+        # Telefones/títulos lidos como número (62999990001.0)
+        texto = texto.str.replace(r'\.0$', '', regex=True)
+    texto = texto.str.strip()
+    return texto.mask(texto.isin(['', 'nan']))
+
+
+def _converter_datas(serie):
+    """Datas de nascimento: células de data do Excel ou texto dd/mm/aaaa (ou aaaa-mm-dd)"""
+    pd = _pandas()
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        datas = serie
+    else:
+        textos = serie.astype('string').str.strip()
+        datas = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+        for formato in FORMATOS_DATA_PLANILHA:
+            pendentes = datas.isna() & textos.notna()
+            if not pendentes.any():
+                break
+            datas[pendentes] = pd.to_datetime(textos[pendentes], format=formato, errors='coerce')
+    return datas.dt.date.astype(object).where(datas.notna(), None)
+
+
+def normalizar_planilha(df, mapeamento, prefixo_id='IMP', primeira_linha=2):
+    """Produz um DataFrame limpo, pronto para o ImportadorAlunos.
+
+    Todas as transformações são feitas por coluna: textos limpos, linhas sem
+    nome descartadas, valores padrão de observações/atividades, cortes pelos
+    LIMITES_CAMPOS_ALUNO e datas convertidas. A coluna 'linha' guarda o
+    número da linha na planilha (índice + primeira_linha).
+    """
+    pd = _pandas()
+    agora = datetime.now()
+    limpo = pd.DataFrame(index=df.index)
+    for campo in CAMPOS_TEXTO_PLANILHA:
+        if campo in mapeamento:
+            limpo[campo] = _limpar_texto(df[mapeamento[campo]])
+        else:
+            limpo[campo] = pd.Series(pd.NA, index=df.index, dtype='string')
+
+    limpo = limpo[limpo['nome'].notna()]
+
+    limpo['observacoes'] = limpo['observacoes'].fillna(f'Importado via planilha em {agora.strftime("%d/%m/%Y")}')
+    limpo['atividades'] = limpo['atividades'].fillna(ATIVIDADE_PADRAO_IMPORTACAO)
+    limpo['id_unico'] = f'{prefixo_id}_{agora.strftime("%Y%m%d_%H%M%S")}_' + limpo.index.astype(str)
+
+    for campo, limite in LIMITES_CAMPOS_ALUNO.items():
+        if campo not in limpo:
+            continue
+        excedentes = int((limpo[campo].str.len() > limite).sum())
+        if excedentes:
+            limpo[campo] = limpo[campo].str.slice(0, limite)
+            print(f"⚠️  Campo '{campo}' truncado para {limite} caracteres em {excedentes} linha(s)")
+
+    if 'data_nascimento' in mapeamento:
+        limpo['data_nascimento'] = _converter_datas(df.loc[limpo.index, mapeamento['data_nascimento']])
+    else:
+        limpo['data_nascimento'] = None
+
+    limpo['linha'] = limpo.index + primeira_linha
+    return limpo
+
+
+def _valor_texto(valor):
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    return None if texto in ('', 'nan') else texto
+
+
+def _converter_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    texto = _valor_texto(valor)
+    for formato in FORMATOS_DATA_PLANILHA if texto else ():
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def normalizar_linhas(linhas, colunas, mapeamento, indices=None):
+    """Equivalente a normalizar_planilha() + linhas_normalizadas() sem pandas.
+
+    `linhas` são sequências de valores na ordem de `colunas`; `indices` são
+    as posições de cada uma entre as linhas de dados (como o índice do
+    DataFrame), por padrão 0, 1, 2...
+    """
+    agora = datetime.now()
+    observacao_padrao = f'Importado via planilha em {agora.strftime("%d/%m/%Y")}'
+    prefixo_id = f'IMP_{agora.strftime("%Y%m%d_%H%M%S")}_'
+    posicoes = {campo: colunas.index(coluna) for campo, coluna in mapeamento.items()}
+    posicao_data = posicoes.get('data_nascimento')
+
+    resultado = []
+    for indice, valores in zip(indices if indices is not None else range(len(linhas)), linhas):
+        dados = {campo: _valor_texto(valores[posicoes[campo]]) if campo in posicoes and posicoes[campo] < len(valores) else None
+                 for campo in CAMPOS_TEXTO_PLANILHA}
+        if not dados['nome']:
+            continue
+        dados['observacoes'] = dados['observacoes'] or observacao_padrao
+        dados['atividades'] = dados['atividades'] or ATIVIDADE_PADRAO_IMPORTACAO
+        dados['id_unico'] = f'{prefixo_id}{indice}'
+        for campo, limite in LIMITES_CAMPOS_ALUNO.items():
+            if dados.get(campo) and len(dados[campo]) > limite:
+                dados[campo] = dados[campo][:limite]
+        dados['data_nascimento'] = (_converter_data(valores[posicao_data])
+                                    if posicao_data is not None and posicao_data < len(valores) else None)
+        dados['linha'] = indice + 2
+        resultado.append(dados)
+    return resultado
+
+
+def linhas_normalizadas(limpo):
+    """Converte o DataFrame normalizado nas linhas (dicionários) do ImportadorAlunos"""
+    registros = limpo.astype(object).where(limpo.notna(), None)
+    colunas = list(registros.columns)
+    valores = [registros[coluna].tolist() for coluna in colunas]
+    return [dict(zip(colunas, linha)) for linha in zip(*valores)]
+
+
+class ImportadorAlunos:
+    """Grava linhas de planilha no banco em lotes e acumula o resumo da importação.
+
+    Cada linha é um dicionário com 'linha' (número na planilha), 'nome' e os
+    campos opcionais telefone, email, endereco, observacoes, titulo_eleitor,
+    data_nascimento, id_unico e 'atividades' (texto com os nomes separados).
+    Um aluno já existente (mesmo nome ou telefone) é atualizado; os demais são
+    criados.
+    """
+
+    def __init__(self, criado_por='admin', tamanho_lote=TAMANHO_LOTE_IMPORTACAO, ao_progresso=None):
+        self.criado_por = criado_por
+        self.tamanho_lote = max(1, int(tamanho_lote))
+        self.ao_progresso = ao_progresso
+        self.linhas_lidas = 0
+        self.alunos_processados = 0
+        self.novos_cadastros = 0
+        self.atualizados = 0
+        self.alunos_erros = 0
+        self.erros_detalhes = []
+        self._atividades = {}
+        self._atividade_padrao_id = None
+
+    # ------------------------------------------------------------------
+    # Atividades
+    # ------------------------------------------------------------------
+    def _obter_atividade_id(self, nome_atividade, descricao):
+        """Busca (ou cria) a atividade uma única vez por nome"""
+        chave = nome_atividade.casefold()
+        if chave in self._atividades:
+            return self._atividades[chave]
+
+        atividade_obj = AtividadeDAO.buscar_por_nome(nome_atividade)
+        if not atividade_obj:
+            nova_atividade = {
+                'nome': nome_atividade,
+                'descricao': descricao,
+                'ativa': True,
+                'criado_por': self.criado_por
+            }
+            novo_id = AtividadeDAO.criar(nova_atividade)
+            if novo_id:
+                print(f"[PROCESSAR_PLANILHA] Nova atividade criada: {nome_atividade}")
+                atividade_obj = AtividadeDAO.buscar_por_id(novo_id)
+            else:
+                print(f"[PROCESSAR_PLANILHA] Erro ao criar atividade {nome_atividade}")
+
+        atividade_id = atividade_obj.get('_id') if atividade_obj else None
+        self._atividades[chave] = atividade_id
+        return atividade_id
+
+    def resolver_atividades(self, atividades_str):
+        """Lista de IDs das atividades da linha (atividade padrão se nenhuma)"""
+        atividades_ids = []
+        for nome_atividade in separar_atividades(atividades_str):
+            atividade_id = self._obter_atividade_id(
+                nome_atividade, 'Atividade criada automaticamente via importação de planilha')
+            if atividade_id is not None:
+                atividades_ids.append(atividade_id)
+
+        if not atividades_ids:
+            if self._atividade_padrao_id is None:
+                self._atividade_padrao_id = self._obter_atividade_id(
+                    ATIVIDADE_PADRAO_IMPORTACAO,
+                    'Atividade padrão para cadastros gerais importados via planilha')
+            if self._atividade_padrao_id is not None:
+                atividades_ids = [self._atividade_padrao_id]
+        return atividades_ids
+
+    # ------------------------------------------------------------------
+    # Processamento
+    # ------------------------------------------------------------------
+    def registrar_erro(self, linha, mensagem, quantidade=1):
+        """Contabiliza linha(s) com erro"""
+        self.alunos_erros += quantidade
+        erro_msg = f'Linha {linha}: {mensagem}' if linha is not None else mensagem
+        print(f"[PROCESSAR_PLANILHA] ERRO: {erro_msg}")
+        self.erros_detalhes.append(erro_msg)
+
+    def processar(self, linhas):
+        """Consome um iterável de linhas gravando a cada `tamanho_lote`"""
+        lote = []
+        for dados in linhas:
+            lote.append(dados)
+            if len(lote) >= self.tamanho_lote:
+                self._gravar_e_notificar(lote)
+                lote = []
+        if lote:
+            self._gravar_e_notificar(lote)
+        return self.resumo()
+
+    def _gravar_e_notificar(self, lote):
+        self.gravar_lote(lote)
+        self.linhas_lidas += len(lote)
+        if self.ao_progresso:
+            self.ao_progresso(self)
+
+    def gravar_lote(self, lote):
+        """Resolve os existentes do lote numa consulta e grava tudo num bulk_write"""
+        existentes = AlunoDAO.buscar_existentes_lote(
+            [dados['nome'] for dados in lote],
+            [dados.get('telefone') for dados in lote]
+        )
+        # Destino de cada nome/telefone: ('existente', _id) ou ('novo', índice em novos)
+        por_nome = {}
+        por_telefone = {}
+        telefone_atual = {}
+        for aluno in existentes:
+            destino = ('existente', aluno['_id'])
+            por_nome.setdefault((aluno.get('nome') or '').casefold(), destino)
+            if aluno.get('telefone'):
+                por_telefone.setdefault(aluno['telefone'], destino)
+                telefone_atual[destino] = aluno['telefone']
+
+        novos = []
+        linhas_novos = []          # por novo: [linha que cria, linhas que atualizam...]
+        atualizacoes = {}
+        linhas_atualizacoes = {}
+
+        for dados in lote:
+            dados = dict(dados)
+            linha = dados.pop('linha', None)
+            try:
+                dados['atividades_ids'] = self.resolver_atividades(dados.pop('atividades', None))
+                dados['ativo'] = True
+                nome_chave = dados['nome'].casefold()
+                telefone = dados.get('telefone')
+
+                destino = por_nome.get(nome_chave)
+                if destino is None and telefone:
+                    destino = por_telefone.get(telefone)
+
+                if destino is None:
+                    destino = ('novo', len(novos))
+                    por_nome[nome_chave] = destino
+                    if telefone:
+                        por_telefone.setdefault(telefone, destino)
+                        telefone_atual[destino] = telefone
+                    dados['data_cadastro'] = datetime.now().date()
+                    novos.append(dados)
+                    linhas_novos.append([linha])
+                    continue
+
+                # Atualização preserva o nome e os dados existentes quando o novo valor é vazio
+                campos = {campo: valor for campo, valor in dados.items()
+                          if valor is not None and campo not in ('id_unico', 'nome')}
+                if telefone and telefone_atual.get(destino) != telefone:
+                    # Linhas seguintes do lote devem enxergar o telefone novo
+                    if por_telefone.get(telefone_atual.get(destino)) == destino:
+                        del por_telefone[telefone_atual[destino]]
+                    por_telefone.setdefault(telefone, destino)
+                    telefone_atual[destino] = telefone
+
+                tipo, chave = destino
+                if tipo == 'novo':
+                    novos[chave].update(campos)
+                    linhas_novos[chave].append(linha)
+                else:
+                    atualizacoes.setdefault(chave, {}).update(campos)
+                    linhas_atualizacoes.setdefault(chave, []).append(linha)
+            except Exception as e:
+                self.registrar_erro(linha, str(e))
+
+        if not novos and not atualizacoes:
+            return
+
+        resultado = AlunoDAO.gravar_lote(novos, atualizacoes)
+        linhas_por_operacao = linhas_novos + list(linhas_atualizacoes.values())
+
+        erros = {}
+        for indice, mensagem in resultado['erros']:
+            if indice is None:
+                # Falha do lote inteiro
+                total = sum(len(linhas) for linhas in linhas_por_operacao)
+                self.registrar_erro(None, f'Erro ao gravar lote de {total} linhas: {mensagem}', total)
+                return
+            erros[indice] = mensagem
+
+        for indice, linhas in enumerate(linhas_por_operacao):
+            if indice in erros:
+                for linha in linhas:
+                    self.registrar_erro(linha, erros[indice])
+                continue
+            self.alunos_processados += len(linhas)
+            if indice < len(linhas_novos):
+                self.novos_cadastros += 1
+                self.atualizados += len(linhas) - 1
+            else:
+                self.atualizados += len(linhas)
+
+    def resumo(self):
+        """Contadores da importação no formato retornado por /processar_planilha"""
+        return {
+            'total_processados': self.alunos_processados,
+            'novos_cadastros': self.novos_cadastros,
+            'atualizados': self.atualizados,
+            'alunos_erros': self.alunos_erros,
+            'erros_detalhes': self.erros_detalhes[:MAX_ERROS_DETALHADOS]
+        }
+
+
+# ----------------------------------------------------------------------
+# Leitura de arquivos
+# ----------------------------------------------------------------------
+TAMANHO_AMOSTRA_CSV = 64 * 1024
+DELIMITADORES_CSV = ',;\t|'
+
+
+def detectar_codificacao(amostra):
+    """Codificação do arquivo pela marca BOM ou pela validade da amostra em UTF-8"""
+    if amostra.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if amostra.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        # final=False: a amostra pode cortar um caractere multibyte no fim
+        codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        amostra.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def detectar_formato_csv(filepath, tamanho_amostra=TAMANHO_AMOSTRA_CSV):
+    """Detecta (codificação, delimitador, aspas) lendo só o início do arquivo"""
+    with open(filepath, 'rb') as f:
+        amostra = f.read(tamanho_amostra)
+    codificacao = detectar_codificacao(amostra)
+    texto = amostra.decode(codificacao, errors='ignore')
+    if len(amostra) == tamanho_amostra and '\n' in texto:
+        # Descartar a última linha, possivelmente incompleta
+        texto = texto[:texto.rindex('\n')]
+
+    try:
+        dialeto = csv.Sniffer().sniff(texto, delimiters=DELIMITADORES_CSV)
+        delimitador, aspas = dialeto.delimiter, dialeto.quotechar or '"'
+    except csv.Error:
+        cabecalho = texto.split('\n', 1)[0]
+        delimitador = max(DELIMITADORES_CSV, key=cabecalho.count)
+        aspas = '"'
+    return codificacao, delimitador, aspas
+
+
+def _nomes_colunas(cabecalho):
+    """Nomes de coluna únicos, como o pandas faz (vazias e repetidas)"""
+    colunas = []
+    vistos = {}
+    for posicao, nome in enumerate(cabecalho):
+        nome = nome.strip() or f'Unnamed: {posicao}'
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f'{nome}.{vistos[nome]}'
+        else:
+            vistos[nome] = 0
+        colunas.append(nome)
+    return colunas
+
+
+class LeitorEmLotes:
+    """Base dos leitores de planilha em lotes de linhas com memória constante.
+
+    Uso: ``with LeitorCSV(caminho) as leitor: leitor.colunas;
+    for dados in leitor.linhas_normalizadas(mapeamento): ...``
+
+    As subclasses definem colunas em __enter__ e implementam _linhas_brutas()
+    (sequências de valores na ordem de colunas) e fracao_lida().
+    """
+
+    def __init__(self, filepath, tamanho_lote=TAMANHO_LOTE_IMPORTACAO):
+        self.filepath = filepath
+        self.tamanho_lote = max(1, int(tamanho_lote))
+        self.linhas_lidas = 0
+        self.colunas = []
+
+    def _linhas_brutas(self):
+        raise NotImplementedError
+
+    def lotes(self):
+        """Gera (índices, linhas) com até `tamanho_lote` linhas não vazias.
+
+        O índice conta também as linhas vazias, para que 'linha' aponte a
+        linha real da planilha nas mensagens de erro.
+        """
+        total_colunas = len(self.colunas)
+        indices, lote = [], []
+        for valores in self._linhas_brutas():
+            self.linhas_lidas += 1
+            if not any(valor is not None and str(valor).strip() for valor in valores):
+                continue  # linha vazia
+            valores = list(valores[:total_colunas])
+            if len(valores) < total_colunas:
+                valores.extend([None] * (total_colunas - len(valores)))
+            indices.append(self.linhas_lidas - 1)
+            lote.append(valores)
+            if len(lote) >= self.tamanho_lote:
+                yield indices, lote
+                indices, lote = [], []
+        if lote:
+            yield indices, lote
+
+    def linhas_normalizadas(self, mapeamento):
+        """Gera as linhas prontas para o ImportadorAlunos, lote a lote"""
+        for indices, lote in self.lotes():
+            if PANDAS_AVAILABLE:
+                df = _pandas().DataFrame(lote, columns=self.colunas, dtype=object, index=indices)
+                yield from linhas_normalizadas(normalizar_planilha(df, mapeamento))
+            else:
+                yield from normalizar_linhas(lote, self.colunas, mapeamento, indices)
+
+
+class LeitorCSV(LeitorEmLotes):
+    """CSV lido em lotes; cada byte é decodificado uma única vez"""
+
+    def __init__(self, filepath, tamanho_lote=TAMANHO_LOTE_IMPORTACAO):
+        super().__init__(filepath, tamanho_lote)
+        self.bytes_total = os.path.getsize(filepath)
+        self._arquivo = None
+        self._leitor = None
+
+    def __enter__(self):
+        codificacao, delimitador, aspas = detectar_formato_csv(self.filepath)
+        print(f"✅ CSV detectado: encoding={codificacao}, delimiter='{delimitador}'")
+        # errors='replace': bytes inválidos após a amostra não interrompem a importação
+        self._arquivo = open(self.filepath, 'r', encoding=codificacao, errors='replace', newline='')
+        self._leitor = csv.reader(self._arquivo, delimiter=delimitador, quotechar=aspas,
+                                  skipinitialspace=True)
+        cabecalho = next(self._leitor, [])
+        self.colunas = _nomes_colunas(cabecalho)
+        return self
+
+    def __exit__(self, *exc):
+        if self._arquivo:
+            self._arquivo.close()
+        return False
+
+    def fracao_lida(self):
+        """Fração do arquivo já lida (0 a 1), para progresso e ETA"""
+        if not self.bytes_total or not self._arquivo or self._arquivo.closed:
+            return 1.0
+        return min(1.0, self._arquivo.buffer.tell() / self.bytes_total)
+
+    def _linhas_brutas(self):
+        return self._leitor
+
+
+class LeitorExcel(LeitorEmLotes):
+    """Planilha .xlsx percorrida com openpyxl (read_only/iter_rows).
+
+    Lê a primeira aba, como o pd.read_excel fazia; as linhas começam a ir
+    para o banco após o primeiro lote, sem montar a planilha inteira.
+    """
+
+    def __init__(self, filepath, tamanho_lote=TAMANHO_LOTE_IMPORTACAO):
+        super().__init__(filepath, tamanho_lote)
+        self.total_estimado = None
+        self._workbook = None
+        self._linhas = None
+
+    def __enter__(self):
+        try:
+            self._workbook = _openpyxl().load_workbook(self.filepath, read_only=True, data_only=True)
+            aba = self._workbook.worksheets[0]
+            self._linhas = aba.iter_rows(values_only=True)
+            cabecalho = next(self._linhas, ())
+        except Exception as e:
+            self.__exit__()
+            raise ValueError(f'Erro ao ler arquivo: {str(e)}')
+        self.colunas = _nomes_colunas(['' if valor is None else str(valor) for valor in cabecalho])
+        # max_row vem da dimensão gravada no arquivo (pode faltar)
+        self.total_estimado = aba.max_row - 1 if aba.max_row else None
+        return self
+
+    def __exit__(self, *exc):
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+        return False
+
+    def fracao_lida(self):
+        if not self.total_estimado:
+            return 0.0
+        return min(1.0, self.linhas_lidas / self.total_estimado)
+
+    def _linhas_brutas(self):
+        return self._linhas
+
+
+class LeitorDataFrame:
+    """Planilha .xls (formato antigo, fora do alcance do openpyxl) lida inteira pelo pandas"""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.linhas_lidas = 0
+        self.colunas = []
+        self._df = None
+        self._fracao = 0.0
+
+    def __enter__(self):
+        if not PANDAS_AVAILABLE:
+            raise ValueError('Biblioteca pandas não instalada. Para Excel: pip install pandas openpyxl.')
+        try:
+            self._df = _pandas().read_excel(self.filepath)
+        except Exception as e:
+            raise ValueError(f'Erro ao ler arquivo: {str(e)}')
+        self.colunas = list(self._df.columns)
+        return self
+
+    def __exit__(self, *exc):
+        self._df = None
+        return False
+
+    def fracao_lida(self):
+        return self._fracao
+
+    def linhas_normalizadas(self, mapeamento):
+        self.linhas_lidas = len(self._df)
+        self._fracao = 1.0
+        yield from linhas_normalizadas(normalizar_planilha(self._df, mapeamento))
+
+
+def leitura_disponivel(filename):
+    """Indica se há biblioteca instalada para ler esse tipo de arquivo"""
+    nome = filename.lower()
+    return nome.endswith('.csv') or (nome.endswith('.xlsx') and OPENPYXL_AVAILABLE) or PANDAS_AVAILABLE
+
+
+def abrir_planilha(filepath, tamanho_lote=TAMANHO_LOTE_IMPORTACAO):
+    """Leitor adequado à extensão do arquivo (usar com `with`)"""
+    if filepath.lower().endswith('.csv'):
+        return LeitorCSV(filepath, tamanho_lote)
+    if filepath.lower().endswith('.xlsx') and OPENPYXL_AVAILABLE:
+        return LeitorExcel(filepath, tamanho_lote)
+    return LeitorDataFrame(filepath)
+
+
+# ----------------------------------------------------------------------
+# Jobs em segundo plano
+# ----------------------------------------------------------------------
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _obter_executor():
+    """Pool de threads do processo atual (recriado após fork do gunicorn)"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=IMPORTACAO_WORKERS, thread_name_prefix='importacao')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _iniciar_heartbeat(job_id):
+    """Mantém atualizado_em do job recente até o evento retornado ser acionado"""
+    parar = threading.Event()
+
+    def heartbeat():
+        # Cobre a espera na fila do pool e etapas longas (leitura, lotes lentos)
+        while not parar.wait(IMPORTACAO_HEARTBEAT_INTERVALO):
+            ImportacaoDAO.atualizar(job_id, {'atualizado_em': datetime.now().isoformat()})
+
+    threading.Thread(target=heartbeat, daemon=True, name=f'importacao-heartbeat-{job_id[:8]}').start()
+    return parar
+
+
+def iniciar_importacao(filepath, nome_arquivo, criado_por='admin'):
+    """Registra o job e agenda a importação; retorna o job_id (None se falhar)"""
+    agora = datetime.now().isoformat()
+    job_id = ImportacaoDAO.criar({
+        '_id': uuid.uuid4().hex,
+        'status': 'pendente',
+        'etapa': 'Aguardando processamento',
+        'arquivo': nome_arquivo,
+        'criado_por': criado_por,
+        'criado_em': agora,
+        'atualizado_em': agora,
+        'total_linhas': None,
+        'linhas_processadas': 0,
+        'novos_cadastros': 0,
+        'atualizados': 0,
+        'alunos_erros': 0,
+        'erros_detalhes': []
+    })
+    if job_id:
+        # O heartbeat começa já na submissão: com o pool ocupado o job pode
+        # ficar 'pendente' mais que IMPORTACAO_HEARTBEAT_MAXIMO
+        parar_heartbeat = _iniciar_heartbeat(job_id)
+        try:
+            _obter_executor().submit(executar_importacao, job_id, filepath, criado_por, parar_heartbeat)
+        except Exception:
+            parar_heartbeat.set()
+            raise
+    return job_id
+
+
+def executar_importacao(job_id, filepath, criado_por='admin', parar_heartbeat=None):
+    """Corpo do job: lê, normaliza e grava a planilha atualizando o progresso"""
+    inicio = time.time()
+    if parar_heartbeat is None:
+        parar_heartbeat = _iniciar_heartbeat(job_id)
+
+    def atualizar(**campos):
+        campos['atualizado_em'] = datetime.now().isoformat()
+        ImportacaoDAO.atualizar(job_id, campos)
+
+    leitor = None
+
+    def ao_progresso(importador):
+        atualizar(linhas_processadas=importador.linhas_lidas,
+                  fracao_lida=round(leitor.fracao_lida(), 4),
+                  segundos_decorridos=round(time.time() - inicio, 1),
+                  **importador.resumo())
+
+    try:
+        atualizar(status='processando', etapa='Lendo arquivo', iniciado_em=datetime.now().isoformat())
+        with abrir_planilha(filepath) as leitor:
+            colunas = leitor.colunas
+            mapeamento = mapear_colunas(colunas)
+            colunas_ignoradas = [str(col) for col in colunas if col not in mapeamento.values()]
+            print(f"[PROCESSAR_PLANILHA] Colunas encontradas no arquivo: {list(colunas)}")
+            print(f"[PROCESSAR_PLANILHA] Colunas mapeadas: {mapeamento}")
+            print(f"[PROCESSAR_PLANILHA] Colunas ignoradas: {colunas_ignoradas}")
+
+            if 'nome' not in mapeamento:
+                print("[PROCESSAR_PLANILHA] ERRO: Campo 'nome' não encontrado")
+                atualizar(status='erro', etapa='Finalizado',
+                          error='Campo obrigatório "nome" não encontrado na planilha',
+                          colunas_encontradas=[str(col) for col in colunas],
+                          colunas_esperadas=COLUNAS_PLANILHA['nome'],
+                          concluido_em=datetime.now().isoformat())
+                return
+
+            atualizar(etapa='Atualizando banco de dados', colunas_encontradas=list(mapeamento.keys()),
+                      colunas_ignoradas=colunas_ignoradas)
+            importador = ImportadorAlunos(criado_por=criado_por, ao_progresso=ao_progresso)
+            resumo = importador.processar(leitor.linhas_normalizadas(mapeamento))
+            total_linhas = leitor.linhas_lidas
+
+        print(f"[PROCESSAR_PLANILHA] SUCESSO: {resumo['total_processados']} processados, {resumo['novos_cadastros']} novos, {resumo['atualizados']} atualizados, {resumo['alunos_erros']} erros")
+        atualizar(status='concluido', etapa='Finalizado',
+                  message=f"Planilha processada com sucesso! {resumo['novos_cadastros']} novos cadastros, {resumo['atualizados']} atualizações",
+                  total_linhas=total_linhas,
+                  total_validas=importador.linhas_lidas,
+                  linhas_processadas=importador.linhas_lidas,
+                  fracao_lida=1.0,
+                  segundos_decorridos=round(time.time() - inicio, 1),
+                  concluido_em=datetime.now().isoformat(),
+                  **resumo)
+    except Exception as e:
+        print(f"[PROCESSAR_PLANILHA] ERRO GERAL: {str(e)}")
+        atualizar(status='erro', etapa='Finalizado', error=f'Erro ao processar planilha: {str(e)}',
+                  concluido_em=datetime.now().isoformat())
+    finally:
+        parar_heartbeat.set()
+        # Limpar arquivo temporário
+        if filepath and os.path.exists(filepath):
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+
+
+def obter_status_importacao(job_id):
+    """Estado do job com percentual e previsão de término (ETA)"""
+    job = ImportacaoDAO.buscar_por_id(job_id)
+    if not job:
+        return None
+
+    job = dict(job)
+    job['job_id'] = str(job.pop('_id'))
+    fracao = job.get('fracao_lida') or 0
+    decorridos = job.get('segundos_decorridos') or 0
+
+    if job.get('status') == 'concluido':
+        job['percentual'] = 100
+        job['eta_segundos'] = 0
+    elif fracao:
+        # Progresso medido pela parte do arquivo já lida
+        job['percentual'] = min(99, int(fracao * 100))
+        job['eta_segundos'] = round(decorridos / fracao * (1 - fracao), 1)
+    else:
+        job['percentual'] = 0
+        job['eta_segundos'] = None
+
+    if job.get('status') in ('pendente', 'processando'):
+        try:
+            parado_ha = (datetime.now() - datetime.fromisoformat(job['atualizado_em'])).total_seconds()
+        except (KeyError, TypeError, ValueError):
+            parado_ha = 0
+        if parado_ha > IMPORTACAO_HEARTBEAT_MAXIMO:
+            job['status'] = 'interrompido'
+            job['error'] = f'Importação sem progresso há {int(parado_ha)} segundos (processo reiniciado?)'
+    return job
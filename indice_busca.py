@@ -0,0 +1,183 @@
+"""Índice de busca em memória para a lista de alunos (/buscar_alunos)
+
+Mantém um índice invertido de n-gramas sobre os campos pesquisáveis
+(nome, telefone, endereço e atividade), normalizados em minúsculas e sem
+acentos. Uma busca intersecta as listas de n-gramas do termo e só confere
+o texto dos candidatos, sem percorrer todos os alunos.
+"""
+
+import threading
+import unicodedata
+
+CAMPOS_BUSCA = ('nome', 'telefone', 'endereco', 'atividade')
+TAMANHO_NGRAMA = 3
+
+
+def normalizar_texto(texto):
+    """Converte para minúsculas e remove acentos ("João" -> "joao")"""
+    if texto is None:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', str(texto).lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def gerar_ngramas(texto, tamanho=TAMANHO_NGRAMA):
+    """Retorna o conjunto de n-gramas de um texto já normalizado"""
+    return {texto[i:i + tamanho] for i in range(len(texto) - tamanho + 1)}
+
+
+class IndiceBuscaAlunos:
+    """Índice invertido de n-gramas sobre as projeções de alunos.
+
+    É construído sob demanda a partir da lista completa (cache_alunos) e
+    depois mantido incrementalmente pelos eventos do AlunoDAO
+    (criar/atualizar/excluir). Um evento 'recarregar' marca o índice para
+    reconstrução na próxima busca.
+    """
+
+    def __init__(self, projetor=None):
+        self.projetor = projetor or (lambda aluno: dict(aluno))
+        self.sincronizado = False
+        self.reconstrucoes = 0
+        self._registros = {}
+        self._textos = {}
+        self._ordem = {}
+        self._postings = {}
+        self._proxima_ordem = 0
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Manutenção
+    # ------------------------------------------------------------------
+    def construir(self, alunos):
+        """Reconstrói o índice a partir de uma lista de alunos já projetados"""
+        with self._lock:
+            self._registros = {}
+            self._textos = {}
+            self._ordem = {}
+            self._postings = {}
+            self._proxima_ordem = 0
+            for aluno in alunos:
+                self._indexar(str(aluno.get('id', '')), aluno)
+            self.sincronizado = True
+            self.reconstrucoes += 1
+
+    def _indexar(self, chave, aluno):
+        textos = tuple(normalizar_texto(aluno.get(campo, '')) for campo in CAMPOS_BUSCA)
+        self._registros[chave] = aluno
+        self._textos[chave] = textos
+        if chave not in self._ordem:
+            self._ordem[chave] = self._proxima_ordem
+            self._proxima_ordem += 1
+        for texto in textos:
+            for ngrama in gerar_ngramas(texto):
+                self._postings.setdefault(ngrama, set()).add(chave)
+
+    def _desindexar(self, chave, manter_ordem=False):
+        textos = self._textos.pop(chave, None)
+        self._registros.pop(chave, None)
+        if not manter_ordem:
+            self._ordem.pop(chave, None)
+        if not textos:
+            return
+        for texto in textos:
+            for ngrama in gerar_ngramas(texto):
+                ids = self._postings.get(ngrama)
+                if ids is not None:
+                    ids.discard(chave)
+                    if not ids:
+                        del self._postings[ngrama]
+
+    def adicionar(self, aluno):
+        """Inclui um aluno (documento do banco) no final da ordem de listagem"""
+        with self._lock:
+            registro = self.projetor(aluno)
+            chave = str(registro.get('id', ''))
+            self._desindexar(chave)
+            self._indexar(chave, registro)
+
+    def atualizar(self, aluno_id, campos):
+        """Aplica uma atualização parcial mantendo a posição do aluno na listagem"""
+        with self._lock:
+            chave = str(aluno_id)
+            registro = self._registros.get(chave)
+            if registro is None:
+                # Aluno fora do índice (ex.: reativado após exclusão lógica): a
+                # atualização parcial não basta para indexá-lo, reconstruir
+                if campos.get('ativo') is not False:
+                    self.sincronizado = False
+                return
+            if campos.get('ativo') is False:
+                self._desindexar(chave)
+                return
+            novo_registro = dict(registro)
+            novo_registro.update({k: v for k, v in campos.items() if k in registro and k != 'id'})
+            self._desindexar(chave, manter_ordem=True)
+            self._indexar(chave, novo_registro)
+
+    def remover(self, aluno_id):
+        """Remove um aluno do índice"""
+        with self._lock:
+            self._desindexar(str(aluno_id))
+
+    def aplicar_evento(self, evento, aluno_id=None, dados=None):
+        """Ouvinte do cache_alunos: aplica escritas do AlunoDAO ao índice"""
+        if evento == 'recarregar' or evento is None:
+            self.sincronizado = False
+            return
+        if not self.sincronizado:
+            # Índice ainda não construído: será montado na próxima busca
+            return
+        try:
+            if evento == 'criar':
+                if dados and dados.get('ativo', True):
+                    self.adicionar(dados)
+            elif evento == 'atualizar':
+                self.atualizar(aluno_id, dados or {})
+            elif evento == 'excluir':
+                self.remover(aluno_id)
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar índice de busca ({evento}): {e}")
+            self.sincronizado = False
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def buscar(self, termo, carregar_alunos):
+        """Retorna os alunos cujo nome, telefone, endereço ou atividade contém `termo`.
+
+        `carregar_alunos` fornece a lista completa caso o índice precise ser
+        (re)construído. A ordem do resultado é a mesma da listagem.
+        """
+        if not self.sincronizado:
+            self.construir(carregar_alunos())
+
+        termo_normalizado = normalizar_texto(termo)
+        with self._lock:
+            if len(termo_normalizado) >= TAMANHO_NGRAMA:
+                listas = []
+                for ngrama in gerar_ngramas(termo_normalizado):
+                    ids = self._postings.get(ngrama)
+                    if not ids:
+                        return []
+                    listas.append(ids)
+                listas.sort(key=len)
+                candidatos = set(listas[0]).intersection(*listas[1:])
+            else:
+                # Termos curtos: conferir os textos já normalizados
+                candidatos = self._textos.keys()
+
+            encontrados = [chave for chave in candidatos
+                           if any(termo_normalizado in texto for texto in self._textos[chave])]
+            encontrados.sort(key=self._ordem.__getitem__)
+            return [self._registros[chave] for chave in encontrados]
+
+    def get_status(self):
+        """Retorna informações do índice para monitoramento"""
+        with self._lock:
+            return {
+                'sincronizado': self.sincronizado,
+                'alunos_indexados': len(self._registros),
+                'ngramas': len(self._postings),
+                'reconstrucoes': self.reconstrucoes
+            }
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Migração dos antigos arquivos de presença (presencas_manuais.csv e
+presencas_detalhadas.csv) para a coleção presencas do MongoDB
+
+O Sistema Academia já faz essa migração ao iniciar; este script permite
+rodá-la antes do deploy e conferir o resultado. É seguro repetir: cada
+arquivo migrado é renomeado para <arquivo>.migrado e as linhas são gravadas
+com upsert por uma chave derivada da própria linha.
+
+Uso: python migrar_presencas_csv.py [arquivo.csv ...]
+"""
+
+import sys
+
+from database_integration_robusto import ARQUIVOS_PRESENCA_CSV, get_db_integration
+
+
+def main():
+    arquivos = tuple(sys.argv[1:]) or ARQUIVOS_PRESENCA_CSV
+
+    print("📁 MIGRAÇÃO DAS PRESENÇAS EM CSV PARA O MONGODB")
+    print("=" * 60)
+
+    db_integration = get_db_integration()
+    if db_integration._usando_memoria():
+        sys.exit("❌ MongoDB indisponível: nada foi migrado")
+
+    resultado = db_integration.migrar_presencas_csv(arquivos, completar_antigos=True)
+    print(f"📄 Arquivos migrados: {resultado['arquivos']}")
+    print(f"✅ Presenças gravadas: {resultado['migrados']}")
+    print(f"🔁 Já existentes no banco (ignoradas): {resultado['ja_existentes']}")
+    print(f"⚠️ Sem aluno correspondente (gravadas só com o nome): {resultado['sem_aluno']}")
+    print(f"❌ Linhas inválidas: {resultado['invalidos']}")
+    print(f"📝 Registros antigos completados com nome/atividade: {resultado['completados']}")
+
+
+if __name__ == '__main__':
+    main()
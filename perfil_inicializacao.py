@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfil de inicialização de um worker (tempo de importação e memória)
+
+Executa `python -X importtime -c "import app"` num processo separado, sem o
+aquecimento em segundo plano do Sistema Academia, e mostra o tempo total de
+importação, o pico de memória (RSS) e os módulos mais caros pelo tempo
+cumulativo. Serve para acompanhar regressões de boot, como um import pesado
+(pandas, numpy, openpyxl) voltando para o topo do app.
+
+Uso: python perfil_inicializacao.py [--top N] [--modulo app] [--limite-ms MS]
+
+Com --limite-ms o script termina com código 1 se a importação passar do
+limite ou se algum dos módulos pesados for carregado na importação.
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+
+MODULOS_PESADOS = ('pandas', 'numpy', 'openpyxl')
+
+
+def medir_importacao(modulo):
+    """Importa `modulo` num subprocesso; retorna (linhas do importtime, pico de RSS em MB)"""
+    ambiente = dict(os.environ, AQUECIMENTO_EM_SEGUNDO_PLANO='0')
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    if processo.returncode != 0:
+        print(processo.stderr[-2000:])
+        sys.exit(f"❌ Falha ao importar {modulo}")
+
+    linhas = []
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, cumulativo, nome = linha.split(':', 1)[1].split('|')
+        nome = nome[1:]  # espaço após o separador; o restante é a indentação
+        profundidade = (len(nome) - len(nome.lstrip())) // 2
+        linhas.append((nome.strip(), int(proprio), int(cumulativo), profundidade))
+    pico_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return linhas, pico_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modulo', default='app', help='módulo a importar (padrão: app)')
+    parser.add_argument('--top', type=int, default=20, help='quantos módulos listar (padrão: 20)')
+    parser.add_argument('--limite-ms', type=float, help='falhar se a importação passar deste tempo')
+    args = parser.parse_args()
+
+    linhas, pico_mb = medir_importacao(args.modulo)
+    total_ms = next((cumulativo for nome, _, cumulativo, _ in linhas if nome == args.modulo), 0) / 1000
+    pesados = [nome for nome in MODULOS_PESADOS if any(linha[0] == nome for linha in linhas)]
+
+    print(f"⏱️ Importação de '{args.modulo}': {total_ms:.0f} ms")
+    print(f"💾 Pico de memória do processo: {pico_mb:.1f} MB")
+    print(f"📦 Módulos pesados carregados na importação: {', '.join(pesados) or 'nenhum'}")
+    print(f"\n{'cumulativo (ms)':>16} | {'próprio (ms)':>12} | módulo")
+    for nome, proprio, cumulativo, profundidade in sorted(linhas, key=lambda l: l[2], reverse=True)[:args.top]:
+        print(f"{cumulativo / 1000:>16.1f} | {proprio / 1000:>12.1f} | {'  ' * profundidade}{nome}")
+
+    if args.limite_ms is not None:
+        if total_ms > args.limite_ms:
+            print(f"\n❌ Importação acima do limite de {args.limite_ms:.0f} ms")
+            sys.exit(1)
+        if pesados:
+            print(f"\n❌ Módulos pesados importados no boot: {', '.join(pesados)}")
+            sys.exit(1)
+        print("\n✅ Dentro do limite")
+
+
+if __name__ == '__main__':
+    main()
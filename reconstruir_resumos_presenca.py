@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reconstrução offline dos resumos mensais de presença (coleção resumos_presenca)
+
+Os resumos usados por /relatorio_mes são mantidos com $inc a cada presença
+gravada, editada ou excluída. Este script os recalcula a partir da coleção
+presencas: depois de correções feitas direto no banco, de uma importação em
+massa ou para conferir os totais. Sem argumentos reconstrói todos os meses.
+
+Uso: python reconstruir_resumos_presenca.py [ano [mes]]
+"""
+
+import sys
+
+from database_integration_robusto import get_db_integration
+
+
+def main():
+    try:
+        ano = int(sys.argv[1]) if len(sys.argv) > 1 else None
+        mes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    except ValueError:
+        sys.exit(__doc__.strip().splitlines()[-1])
+    if mes is not None and not 1 <= mes <= 12:
+        sys.exit("❌ Mês inválido (1 a 12)")
+
+    escopo = f"{mes:02d}/{ano}" if mes else (str(ano) if ano else "todos os meses")
+    print(f"📊 RECONSTRUÇÃO DOS RESUMOS DE PRESENÇA ({escopo})")
+    print("=" * 60)
+
+    db_integration = get_db_integration()
+    if db_integration._usando_memoria():
+        sys.exit("❌ MongoDB indisponível: nada foi reconstruído")
+
+    resultado = db_integration.resumo_presenca_dao.reconciliar(ano, mes)
+    if not resultado.get('success'):
+        sys.exit(f"❌ Falha na reconstrução: {resultado.get('message')}")
+    print(f"✅ {resultado['total_resumos']} resumo(s) gravado(s)")
+
+
+if __name__ == '__main__':
+    main()
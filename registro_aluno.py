@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro compacto de aluno para o cadastro em memória do SistemaAcademia
+
+Cada worker do gunicorn mantém a lista completa de alunos (alunos_reais).
+Com um dict de 11 chaves por aluno, e as mesmas strings ('A definir',
+'Sem dados de presença', nomes de atividades e turmas) repetidas em cada
+documento vindo do MongoDB, o custo por aluno passa facilmente de 1 KB.
+
+RegistroAluno guarda os campos fixos em __slots__ e interna os campos
+categóricos, de modo que todos os alunos da mesma atividade/turma/status
+apontam para a mesma string. A interface é a de um dict (aluno['nome'],
+aluno.get('turma'), aluno['atividade'] = ..., update, items, dict(aluno)),
+então as rotas e os índices do SistemaAcademia não mudam. Chaves fora dos
+campos fixos (ex.: id_unico) ficam num dict auxiliar criado só quando usado.
+
+Medição: python benchmark_memoria_alunos.py
+"""
+
+import sys
+from collections.abc import MutableMapping
+
+CAMPOS_ALUNO = ('id', 'nome', 'telefone', 'endereco', 'email', 'data_nascimento',
+                'data_cadastro', 'atividade', 'turma', 'status_frequencia', 'observacoes')
+
+_CAMPOS_FIXOS = frozenset(CAMPOS_ALUNO)
+
+# Campos com poucos valores distintos: uma única cópia de cada string por processo
+CAMPOS_CATEGORICOS = frozenset(('data_nascimento', 'data_cadastro', 'atividade', 'turma', 'status_frequencia'))
+
+
+def _internar(valor):
+    return sys.intern(valor) if type(valor) is str else valor
+
+
+class RegistroAluno(MutableMapping):
+    """Aluno do cadastro em memória com interface de dict"""
+
+    __slots__ = CAMPOS_ALUNO + ('_extras',)
+
+    def __init__(self, dados=(), **campos):
+        self._extras = None
+        self.update(dados, **campos)
+
+    def __getitem__(self, chave):
+        if chave in _CAMPOS_FIXOS:
+            try:
+                return getattr(self, chave)
+            except AttributeError:
+                raise KeyError(chave) from None
+        if self._extras is None:
+            raise KeyError(chave)
+        return self._extras[chave]
+
+    def __setitem__(self, chave, valor):
+        if chave in _CAMPOS_FIXOS:
+            object.__setattr__(self, chave, _internar(valor) if chave in CAMPOS_CATEGORICOS else valor)
+        else:
+            if self._extras is None:
+                self._extras = {}
+            self._extras[chave] = valor
+
+    def __delitem__(self, chave):
+        if chave in _CAMPOS_FIXOS:
+            try:
+                delattr(self, chave)
+            except AttributeError:
+                raise KeyError(chave) from None
+        elif self._extras is not None and chave in self._extras:
+            del self._extras[chave]
+        else:
+            raise KeyError(chave)
+
+    def __iter__(self):
+        for campo in CAMPOS_ALUNO:
+            if hasattr(self, campo):
+                yield campo
+        if self._extras:
+            yield from self._extras
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, chave):
+        if chave in _CAMPOS_FIXOS:
+            return hasattr(self, chave)
+        return self._extras is not None and chave in self._extras
+
+    def __getattr__(self, nome):
+        # Só chamado quando o slot não foi preenchido: em templates Jinja,
+        # aluno.campo ausente vira Undefined, como acontecia com o dict
+        if nome in _CAMPOS_FIXOS or nome == '_extras':
+            raise AttributeError(nome)
+        if self._extras is not None and nome in self._extras:
+            return self._extras[nome]
+        raise AttributeError(nome)
+
+    def __setattr__(self, nome, valor):
+        if nome == '_extras':
+            object.__setattr__(self, nome, valor)
+        else:
+            self[nome] = valor
+
+    def get(self, chave, padrao=None):
+        try:
+            return self[chave]
+        except KeyError:
+            return padrao
+
+    def copy(self):
+        return self.to_dict()
+
+    def to_dict(self):
+        """dict comum, para serialização (jsonify, json.dump, respostas da API)"""
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"RegistroAluno({self.to_dict()!r})"
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, estado):
+        self._extras = None
+        self.update(estado)
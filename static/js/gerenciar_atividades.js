@@ -244,13 +244,30 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+// A rota é paginada: percorre todas as páginas para que "Selecionar Todos"
+// alcance todos os alunos da atividade
+function buscarTodosAlunosAtividade(atividade, pagina = 1, alunos = []) {
+    const url = `/listar_alunos_atividade/${encodeURIComponent(atividade)}?pagina=${pagina}&por_pagina=500`;
+    return fetch(url)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                return data;
+            }
+            alunos = alunos.concat(data.alunos);
+            if (pagina < data.total_paginas) {
+                return buscarTodosAlunosAtividade(atividade, pagina + 1, alunos);
+            }
+            return Object.assign(data, { alunos: alunos });
+        });
+}
+
 function carregarAlunosAtividade(atividade) {
     const syncListaAlunos = document.getElementById('sync_lista_alunos');
     
     syncListaAlunos.innerHTML = '<div class="text-center"><i class="fas fa-spinner fa-spin"></i> Carregando alunos...</div>';
     
-    fetch(`/listar_alunos_atividade/${encodeURIComponent(atividade)}`)
-        .then(response => response.json())
+    buscarTodosAlunosAtividade(atividade)
         .then(data => {
             if (data.success && data.alunos.length > 0) {
                 let html = '';
@@ -0,0 +1,126 @@
+"""Testes do circuit breaker e da política de retry (database_integration_robusto)
+
+Rodar da raiz do projeto: python -m unittest discover tests
+"""
+
+import time
+import unittest
+
+from database_integration_robusto import CircuitBreaker, PoliticaRetry
+
+
+class CircuitBreakerTeste(unittest.TestCase):
+
+    def _circuito(self, limite_falhas=3, tempo_aberto=60):
+        # Sem sonda: as transições dependem só das operações do teste
+        return CircuitBreaker(limite_falhas=limite_falhas, tempo_aberto=tempo_aberto, sonda=None)
+
+    def _reabrir_ja_expirado(self, circuito):
+        circuito.aberto_em = time.monotonic() - circuito.tempo_aberto - 1
+
+    def test_abre_somente_ao_atingir_o_limite_de_falhas(self):
+        circuito = self._circuito(limite_falhas=3)
+        circuito.registrar_falha(ConnectionError('1'))
+        circuito.registrar_falha(ConnectionError('2'))
+        self.assertEqual(circuito.estado, CircuitBreaker.FECHADO)
+        self.assertTrue(circuito.permitir())
+
+        circuito.registrar_falha(ConnectionError('3'))
+        self.assertEqual(circuito.estado, CircuitBreaker.ABERTO)
+        self.assertEqual(circuito.total_aberturas, 1)
+        self.assertFalse(circuito.permitir())
+        self.assertEqual(circuito.rejeitadas, 1)
+
+    def test_sucesso_zera_as_falhas_consecutivas(self):
+        circuito = self._circuito(limite_falhas=3)
+        circuito.registrar_falha()
+        circuito.registrar_falha()
+        circuito.registrar_sucesso()
+        self.assertEqual(circuito.falhas_consecutivas, 0)
+        circuito.registrar_falha()
+        circuito.registrar_falha()
+        self.assertEqual(circuito.estado, CircuitBreaker.FECHADO)
+
+    def test_falha_com_circuito_aberto_adia_o_meio_aberto(self):
+        circuito = self._circuito(limite_falhas=1)
+        circuito.registrar_falha()
+        self._reabrir_ja_expirado(circuito)
+        circuito.registrar_falha()
+        self.assertEqual(circuito.estado, CircuitBreaker.ABERTO)
+        self.assertFalse(circuito.permitir())
+
+    def test_meio_aberto_libera_uma_unica_operacao_de_teste(self):
+        circuito = self._circuito(limite_falhas=1)
+        circuito.registrar_falha()
+        self.assertFalse(circuito.permitir())
+
+        self._reabrir_ja_expirado(circuito)
+        self.assertTrue(circuito.permitir())
+        self.assertEqual(circuito.estado, CircuitBreaker.MEIO_ABERTO)
+        # Enquanto o teste não termina, as demais operações continuam no fallback
+        self.assertFalse(circuito.permitir())
+        self.assertFalse(circuito.permitir())
+
+    def test_sucesso_no_meio_aberto_fecha_e_chama_callbacks(self):
+        circuito = self._circuito(limite_falhas=1)
+        chamadas = []
+        circuito.ao_fechar.append(lambda: chamadas.append('fechou'))
+        circuito.registrar_falha()
+        self._reabrir_ja_expirado(circuito)
+        self.assertTrue(circuito.permitir())
+
+        circuito.registrar_sucesso()
+        self.assertEqual(circuito.estado, CircuitBreaker.FECHADO)
+        self.assertIsNone(circuito.aberto_em)
+        self.assertEqual(chamadas, ['fechou'])
+        self.assertTrue(circuito.permitir())
+        # Sucessos com o circuito já fechado não repetem os callbacks
+        circuito.registrar_sucesso()
+        self.assertEqual(chamadas, ['fechou'])
+
+    def test_falha_no_meio_aberto_reabre(self):
+        circuito = self._circuito(limite_falhas=3)
+        for _ in range(3):
+            circuito.registrar_falha()
+        self._reabrir_ja_expirado(circuito)
+        self.assertTrue(circuito.permitir())
+
+        # Uma única falha da operação de teste basta para reabrir
+        circuito.registrar_falha(ConnectionError('ainda fora'))
+        self.assertEqual(circuito.estado, CircuitBreaker.ABERTO)
+        self.assertEqual(circuito.total_aberturas, 2)
+        self.assertFalse(circuito.permitir())
+
+    def test_forcar_abertura(self):
+        circuito = self._circuito(limite_falhas=3)
+        circuito.forcar_abertura('driver sem servidor')
+        self.assertEqual(circuito.estado, CircuitBreaker.ABERTO)
+        self.assertEqual(circuito.ultimo_erro, 'driver sem servidor')
+        circuito.forcar_abertura('de novo')
+        self.assertEqual(circuito.total_aberturas, 1)
+
+
+class PoliticaRetryTeste(unittest.TestCase):
+
+    def test_atraso_exponencial_com_teto(self):
+        politica = PoliticaRetry(atraso_base=0.2, atraso_maximo=1.0, jitter=False)
+        self.assertEqual([politica.atraso(n) for n in range(5)], [0.0, 0.2, 0.4, 0.8, 1.0])
+
+    def test_jitter_fica_entre_zero_e_o_teto(self):
+        politica = PoliticaRetry(atraso_base=0.2, atraso_maximo=1.0)
+        for tentativa in range(1, 6):
+            teto = min(1.0, 0.2 * 2 ** (tentativa - 1))
+            for _ in range(50):
+                self.assertTrue(0 <= politica.atraso(tentativa) <= teto)
+
+    def test_pode_repetir_respeita_tentativas_e_prazo(self):
+        politica = PoliticaRetry(max_tentativas=3, prazo_total=5.0)
+        self.assertTrue(politica.pode_repetir(1, decorrido=0.0, atraso=0.1))
+        self.assertTrue(politica.pode_repetir(2, decorrido=0.0, atraso=0.1))
+        self.assertFalse(politica.pode_repetir(3, decorrido=0.0, atraso=0.1))
+        # Não começa uma tentativa que terminaria depois do prazo total
+        self.assertFalse(politica.pode_repetir(1, decorrido=4.5, atraso=0.6))
+
+
+if __name__ == '__main__':
+    unittest.main()
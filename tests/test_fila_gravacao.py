@@ -0,0 +1,150 @@
+"""Testes da fila de gravação durável (fila_gravacao.FilaGravacao)
+
+Rodar da raiz do projeto: python -m unittest discover tests
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from fila_gravacao import FilaGravacao
+
+
+class AplicadorTeste:
+    """Aplicador que registra as entradas recebidas e pode falhar sob demanda"""
+
+    def __init__(self):
+        self.aplicadas = []
+        self.falhas_restantes = 0
+
+    def __call__(self, entradas):
+        if self.falhas_restantes:
+            self.falhas_restantes -= 1
+            raise ConnectionError('banco fora')
+        self.aplicadas.extend(entrada['dados']['n'] for entrada in entradas)
+
+
+class FilaGravacaoTeste(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp(prefix='fila_teste_')
+        self.fila = FilaGravacao(self.diretorio)
+
+    def tearDown(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def _checkpoint(self):
+        with open(os.path.join(self.diretorio, 'checkpoint.json'), encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        return checkpoint['segmento'], checkpoint['offset']
+
+    def test_drenar_retoma_apos_falha_sem_avancar_checkpoint(self):
+        aluno, presenca = AplicadorTeste(), AplicadorTeste()
+        self.fila.registrar_lote('aluno', [{'n': 1}, {'n': 2}])
+        self.fila.registrar_lote('presenca', [{'n': 3}, {'n': 4}])
+        self.fila.registrar('aluno', {'n': 5})
+
+        presenca.falhas_restantes = 1
+        resultado = self.fila.drenar({'aluno': aluno, 'presenca': presenca})
+        self.assertEqual(resultado['processed'], 2)
+        self.assertEqual(len(resultado['errors']), 1)
+        self.assertEqual(resultado['remaining'], 3)
+        self.assertEqual(aluno.aplicadas, [1, 2])
+        # O checkpoint parou no fim do grupo aplicado, antes das presenças
+        segmento, offset = self._checkpoint()
+        with open(self.fila._caminho_segmento(segmento), 'rb') as f:
+            linhas = f.readlines()
+        self.assertEqual(offset, len(linhas[0]) + len(linhas[1]))
+        self.assertEqual(self.fila.contar_pendentes(), 3)
+
+        resultado = self.fila.drenar({'aluno': aluno, 'presenca': presenca})
+        self.assertEqual(resultado['processed'], 3)
+        self.assertEqual(resultado['errors'], [])
+        self.assertEqual(aluno.aplicadas, [1, 2, 5])
+        self.assertEqual(presenca.aplicadas, [3, 4])
+        self.assertGreater(self._checkpoint(), (segmento, offset))
+        self.assertFalse(self.fila.tem_pendentes())
+
+    def test_falha_no_primeiro_grupo_nao_grava_checkpoint(self):
+        aluno = AplicadorTeste()
+        aluno.falhas_restantes = 1
+        self.fila.registrar_lote('aluno', [{'n': 1}, {'n': 2}])
+
+        resultado = self.fila.drenar({'aluno': aluno})
+        self.assertEqual(resultado['processed'], 0)
+        self.assertEqual(resultado['remaining'], 2)
+        self.assertFalse(os.path.exists(os.path.join(self.diretorio, 'checkpoint.json')))
+
+        self.fila.drenar({'aluno': aluno})
+        self.assertEqual(aluno.aplicadas, [1, 2])
+
+    def test_ultima_linha_truncada_e_escrita_em_andamento(self):
+        aluno = AplicadorTeste()
+        self.fila.registrar_lote('aluno', [{'n': 1}, {'n': 2}])
+        segmento = self.fila._caminho_segmento(self.fila._segmentos()[-1])
+        with open(segmento, 'ab') as f:
+            f.write(b'{"id": "x", "tipo": "aluno", "da')
+
+        self.assertEqual(self.fila.contar_pendentes(), 2)
+        resultado = self.fila.drenar({'aluno': aluno})
+        self.assertEqual(resultado['processed'], 2)
+        self.assertEqual(aluno.aplicadas, [1, 2])
+        # A drenagem não passa da linha incompleta
+        self.assertLess(self._checkpoint()[1], os.path.getsize(segmento))
+
+        # A próxima escrita fecha a linha truncada, que é descartada na leitura
+        self.fila.registrar('aluno', {'n': 3})
+        self.assertEqual(self.fila.contar_pendentes(), 1)
+        resultado = self.fila.drenar({'aluno': aluno})
+        self.assertEqual(resultado['processed'], 1)
+        self.assertEqual(aluno.aplicadas, [1, 2, 3])
+        self.assertFalse(self.fila.tem_pendentes())
+
+    def test_linha_truncada_em_segmento_antigo_e_descartada(self):
+        fila = FilaGravacao(self.diretorio, tamanho_segmento=1)
+        aluno = AplicadorTeste()
+        fila.registrar('aluno', {'n': 1})
+        with open(fila._caminho_segmento(1), 'ab') as f:
+            f.write(b'{"id": "x", "tipo": "al')
+        fila.registrar('aluno', {'n': 2})
+        self.assertEqual(fila._segmentos(), [1, 2])
+
+        self.assertEqual(fila.contar_pendentes(), 2)
+        resultado = fila.drenar({'aluno': aluno})
+        self.assertEqual(resultado['processed'], 2)
+        self.assertEqual(aluno.aplicadas, [1, 2])
+
+    def test_segmentos_removidos_somente_depois_de_consumidos(self):
+        fila = FilaGravacao(self.diretorio, tamanho_segmento=1)
+        aluno, presenca = AplicadorTeste(), AplicadorTeste()
+        fila.registrar('aluno', {'n': 1})
+        fila.registrar('presenca', {'n': 2})
+        fila.registrar('aluno', {'n': 3})
+        self.assertEqual(fila._segmentos(), [1, 2, 3])
+
+        presenca.falhas_restantes = 1
+        resultado = fila.drenar({'aluno': aluno, 'presenca': presenca})
+        self.assertEqual(resultado['processed'], 1)
+        # Nenhum segmento com entradas pendentes foi apagado
+        self.assertEqual(fila._segmentos(), [1, 2, 3])
+        self.assertEqual(fila.contar_pendentes(), 2)
+
+        resultado = fila.drenar({'aluno': aluno, 'presenca': presenca})
+        self.assertEqual(resultado['processed'], 2)
+        self.assertEqual(aluno.aplicadas, [1, 3])
+        self.assertEqual(presenca.aplicadas, [2])
+        # O último segmento fica (é o de escrita); os anteriores foram apagados
+        self.assertEqual(fila._segmentos(), [3])
+        self.assertEqual(self._checkpoint(), (3, os.path.getsize(fila._caminho_segmento(3))))
+
+        fila.registrar('aluno', {'n': 4})
+        fila.drenar({'aluno': aluno, 'presenca': presenca})
+        self.assertEqual(aluno.aplicadas, [1, 3, 4])
+        self.assertEqual(fila._segmentos(), [4])
+        self.assertFalse(fila.tem_pendentes())
+
+
+if __name__ == '__main__':
+    unittest.main()
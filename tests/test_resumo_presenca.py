@@ -0,0 +1,108 @@
+"""Testes dos resumos mensais de presença (models.ResumoPresencaDAO)
+
+Rodam no modo memória (memory_db), sem MongoDB.
+Rodar da raiz do projeto: python -m unittest discover tests
+"""
+
+import unittest
+from datetime import datetime
+
+import models
+from models import PresencaDAO, ResumoPresencaDAO
+
+
+def presenca(dia, status='P', atividade='Dança', turma='Manhã', aluno_id='10', nome_aluno='Ana'):
+    return {'aluno_id': aluno_id, 'nome_aluno': nome_aluno, 'atividade': atividade, 'turma': turma,
+            'data_presenca': datetime(2025, 3, dia), 'status': status}
+
+
+class ResumoPresencaTeste(unittest.TestCase):
+
+    def setUp(self):
+        self._modo_memoria = models.USE_MEMORY_FALLBACK
+        self._presencas = models.memory_db['presencas']
+        self._resumos = models.memory_db['resumos_presenca']
+        models.USE_MEMORY_FALLBACK = True
+        models.memory_db['presencas'] = {}
+        models.memory_db['resumos_presenca'] = {}
+
+    def tearDown(self):
+        models.USE_MEMORY_FALLBACK = self._modo_memoria
+        models.memory_db['presencas'] = self._presencas
+        models.memory_db['resumos_presenca'] = self._resumos
+
+    def _resumo(self, chave):
+        return models.memory_db['resumos_presenca'][chave]
+
+    def _contagens(self):
+        """Resumos sem os contadores zerados (o $inc deixa zeros; a reconstrução não)"""
+        def limpar(valor):
+            if isinstance(valor, dict):
+                limpo = {chave: limpar(item) for chave, item in valor.items()}
+                return {chave: item for chave, item in limpo.items() if item not in (0, {})}
+            return valor
+        return {chave: limpar(resumo) for chave, resumo in models.memory_db['resumos_presenca'].items()
+                if any(resumo.get(status) for status in ResumoPresencaDAO.STATUS) or limpar(resumo.get('total'))}
+
+    def test_mudanca_de_dia_se_anula_nos_totais(self):
+        antes = presenca(3)
+        ResumoPresencaDAO.registrar_mudanca(depois=[antes])
+        ResumoPresencaDAO.registrar_mudanca(antes=[antes], depois=[dict(antes, data_presenca=datetime(2025, 3, 5))])
+
+        turma = self._resumo('turma:2025-03:Dança:Manhã')
+        self.assertEqual(turma['total'], {'P': 1})
+        self.assertEqual(turma['dias']['3'], {'P': 0})
+        self.assertEqual(turma['dias']['5'], {'P': 1})
+        self.assertEqual(self._resumo('aluno:2025-03:10')['P'], 1)
+
+    def test_mudanca_de_status_move_a_contagem(self):
+        antes = presenca(3, status='P')
+        ResumoPresencaDAO.registrar_mudanca(depois=[antes])
+        ResumoPresencaDAO.registrar_mudanca(antes=[antes], depois=[dict(antes, status='F')])
+
+        turma = self._resumo('turma:2025-03:Dança:Manhã')
+        self.assertEqual(turma['total'], {'P': 0, 'F': 1})
+        self.assertEqual(turma['dias']['3'], {'P': 0, 'F': 1})
+        aluno = self._resumo('aluno:2025-03:10')
+        self.assertEqual((aluno['P'], aluno['F']), (0, 1))
+
+    def test_mudanca_entre_meses_e_atividades(self):
+        antes = presenca(31, atividade='Dança')
+        depois = dict(antes, data_presenca=datetime(2025, 4, 1), atividade='Funcional')
+        ResumoPresencaDAO.registrar_mudanca(depois=[antes])
+        ResumoPresencaDAO.registrar_mudanca(antes=[antes], depois=[depois])
+
+        self.assertEqual(self._resumo('turma:2025-03:Dança:Manhã')['total'], {'P': 0})
+        self.assertEqual(self._resumo('aluno:2025-03:10')['P'], 0)
+        self.assertEqual(self._resumo('turma:2025-04:Funcional:Manhã')['total'], {'P': 1})
+        self.assertEqual(self._resumo('aluno:2025-04:10')['P'], 1)
+
+    def test_registro_sem_mudanca_nao_altera_resumos(self):
+        atual = presenca(3)
+        ResumoPresencaDAO.registrar_mudanca(depois=[atual])
+        copia = {chave: dict(resumo) for chave, resumo in models.memory_db['resumos_presenca'].items()}
+        ResumoPresencaDAO.registrar_mudanca(antes=[atual], depois=[dict(atual, observacoes='editada')])
+        self.assertEqual(models.memory_db['resumos_presenca'], copia)
+
+    def test_incremental_igual_a_reconstrucao(self):
+        ids = [PresencaDAO.registrar(presenca(dia, status, aluno_id=aluno, nome_aluno=f'Aluno {aluno}'))
+               for dia, status, aluno in [(3, 'P', '1'), (3, 'F', '2'), (4, 'P', '1'), (4, 'J', '2'), (10, 'P', '3')]]
+        PresencaDAO.atualizar_registro(datetime(2025, 3, 3), {'status': 'P'}, aluno_id='2')
+        PresencaDAO.atualizar_registro(datetime(2025, 3, 4), {'data_presenca': datetime(2025, 3, 6)}, aluno_id='1')
+        PresencaDAO.excluir(ids[-1])
+        incremental = self._contagens()
+        resumo_incremental = ResumoPresencaDAO.obter_mes(2025, 3)
+
+        ResumoPresencaDAO.reconciliar()
+        self.assertEqual(incremental, self._contagens())
+
+        resumo = ResumoPresencaDAO.obter_mes(2025, 3)
+        self.assertEqual((resumo['total_presencas'], resumo['total_faltas']), (3, 1))
+        self.assertEqual(resumo['registros_por_dia'], {3: 2, 4: 1, 6: 1})
+        self.assertEqual(resumo['dias_com_aula'], 3)
+        for campo in ('total_presencas', 'total_faltas', 'dias_com_aula'):
+            self.assertEqual(resumo_incremental[campo], resumo[campo])
+
+
+if __name__ == '__main__':
+    unittest.main()